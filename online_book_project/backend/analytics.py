@@ -0,0 +1,182 @@
+"""
+Analytics Module - Column-wise aggregates over the catalog
+
+The catalog is copied once into flat columns (parsed years, author and
+category codes) and every aggregate is a counting pass over those columns:
+NumPy's bincount/unique/partition when NumPy is installed, otherwise
+Counter over array('q')/array('I') columns from the standard library. Both
+paths give identical results. Books without a valid year (year 0) are
+counted as undated and left out of the year-based figures.
+"""
+import math
+from array import array
+from collections import Counter
+from heapq import nlargest
+
+from backend.indexes import _hashable
+from storage.compact import CompactCatalog
+from storage.sqlite_storage import year_of
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+PERCENTILES = (10, 25, 50, 75, 90)
+
+
+def _factorize(values):
+    """(codes, labels): labels in first-seen order, codes indexing into them"""
+    code_of = {}
+    codes = array("I", [code_of.setdefault(value, len(code_of)) for value in values])
+    return codes, list(code_of)
+
+
+class CatalogAnalytics:
+    """Aggregates over a snapshot of the catalog, each computed once on first request
+
+    Construction only copies the book list (or, for a CompactCatalog, its
+    column arrays, without decoding a single book), so it is cheap enough
+    for the GUI thread; the columns are built by the first aggregate asked
+    for, which can then run on a worker thread while the catalog keeps
+    changing.
+    """
+
+    def __init__(self, books):
+        self._snapshot = books.frozen() if isinstance(books, CompactCatalog) else list(books)
+        self._columns = None
+        self._results = {}
+
+    def decade_histogram(self):
+        """{decade: number of books}, decades ascending"""
+        if "decades" not in self._results:
+            years = self._dated_years()
+            if np is not None:
+                decades, counts = np.unique(years // 10 * 10, return_counts=True)
+                histogram = dict(zip(decades.tolist(), counts.tolist()))
+            else:
+                histogram = dict(sorted(Counter(year // 10 * 10 for year in years).items()))
+            self._results["decades"] = histogram
+        return dict(self._results["decades"])
+
+    def books_per_author(self):
+        """{author: number of books}"""
+        counts, authors = self._author_counts()
+        return dict(zip(authors, counts))
+
+    def top_authors(self, n=10):
+        """The n most prolific (author, count) pairs; ties keep catalog order of first appearance"""
+        counts, authors = self._author_counts()
+        best = nlargest(n, range(len(authors)), key=counts.__getitem__)
+        return [(authors[code], counts[code]) for code in best]
+
+    def category_by_decade(self):
+        """{category: {decade: number of books}} for dated, categorized books"""
+        if "crosstab" not in self._results:
+            columns = self._build()
+            dated = self._dated_mask()
+            categories = columns["category_labels"]
+            if np is not None:
+                decades, decade_codes = np.unique(columns["years"][dated] // 10 * 10, return_inverse=True)
+                category_codes = columns["category_codes"][dated].astype(np.int64)
+                cells = np.bincount(category_codes * len(decades) + decade_codes,
+                                    minlength=len(categories) * len(decades))
+                table = cells.reshape(len(categories), len(decades))
+                decades = decades.tolist()
+                crosstab = {}
+                for code, row in enumerate(table.tolist()):
+                    crosstab[categories[code]] = {decade: count for decade, count in zip(decades, row) if count}
+            else:
+                cells = Counter((code, year // 10 * 10)
+                                for code, year in zip(columns["category_codes"], columns["years"]) if year)
+                crosstab = {category: {} for category in categories}
+                for (code, decade), count in sorted(cells.items(), key=lambda item: item[0][1]):
+                    crosstab[categories[code]][decade] = count
+            self._results["crosstab"] = {category: row for category, row in crosstab.items()
+                                         if row and category is not None}
+        return {category: dict(row) for category, row in self._results["crosstab"].items()}
+
+    def year_percentile(self, p):
+        """Publication year at percentile p (nearest rank over dated books), None if there are none"""
+        years = self._dated_years()
+        if not len(years):
+            return None
+        k = min(len(years) - 1, max(0, math.ceil(p / 100 * len(years)) - 1))
+        if np is not None:
+            return int(np.partition(years, k)[k])
+        if "sorted_years" not in self._results:
+            self._results["sorted_years"] = sorted(years)
+        return self._results["sorted_years"][k]
+
+    def median_year(self):
+        return self.year_percentile(50)
+
+    def summary(self, top=10):
+        """Every aggregate in one dict (what the GUI's statistics window shows)"""
+        columns = self._build()
+        dated = len(self._dated_years())
+        return {
+            "total": columns["total"],
+            "undated": columns["total"] - dated,
+            "decades": self.decade_histogram(),
+            "category_by_decade": self.category_by_decade(),
+            "median_year": self.median_year(),
+            "percentiles": {p: self.year_percentile(p) for p in PERCENTILES},
+            "authors": len(columns["author_labels"]),
+            "top_authors": self.top_authors(top),
+        }
+
+    def _build(self):
+        """Columns of the snapshot, built on first use"""
+        if self._columns is None:
+            books = self._snapshot
+            if isinstance(books, CompactCatalog):
+                # Read the encoded columns; the catalog already holds every parsed year
+                years = array("q", books.years)
+                author_codes, authors = _factorize(map(_hashable, books.column("author")))
+                category_codes, categories = _factorize(map(_hashable, books.column("category")))
+            else:
+                years = array("q", map(year_of, books))
+                author_codes, authors = _factorize(_hashable(book.get("author")) for book in books)
+                category_codes, categories = _factorize(_hashable(book.get("category")) for book in books)
+            if np is not None:
+                years = np.frombuffer(years, dtype=np.int64)
+                author_codes = np.frombuffer(author_codes, dtype=np.uint32)
+                category_codes = np.frombuffer(category_codes, dtype=np.uint32)
+            self._columns = {
+                "total": len(books),
+                "years": years,
+                "author_codes": author_codes,
+                "author_labels": authors,
+                "category_codes": category_codes,
+                "category_labels": categories,
+            }
+            # The columns hold everything the aggregates need
+            self._snapshot = None
+        return self._columns
+
+    def _dated_mask(self):
+        return self._build()["years"] != 0
+
+    def _dated_years(self):
+        """Years of the books that have one"""
+        if "dated" not in self._results:
+            years = self._build()["years"]
+            if np is not None:
+                self._results["dated"] = years[years != 0]
+            else:
+                self._results["dated"] = array("q", filter(None, years))
+        return self._results["dated"]
+
+    def _author_counts(self):
+        """(books per author code, author labels)"""
+        if "authors" not in self._results:
+            columns = self._build()
+            authors = columns["author_labels"]
+            if np is not None:
+                counts = np.bincount(columns["author_codes"], minlength=len(authors)).tolist()
+            else:
+                tally = Counter(columns["author_codes"])
+                counts = [tally[code] for code in range(len(authors))]
+            self._results["authors"] = counts
+        return self._results["authors"], self._build()["author_labels"]
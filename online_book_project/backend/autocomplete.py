@@ -0,0 +1,233 @@
+"""
+Autocomplete Module - Radix trie of casefolded titles or authors for prefix completion
+
+Every node caches the TOP_K most popular keys of its subtree (popularity =
+number of books carrying the key; ties alphabetical), so completing a
+prefix is a walk down at most len(prefix) characters followed by reading a
+cached list. A change to a key only invalidates the caches on its own path;
+they are recomputed, from the children's caches, by the next completion
+that passes through.
+"""
+from bisect import bisect_left
+from heapq import nsmallest
+from itertools import chain
+
+# Completions cached per node; longer requests walk the subtree
+TOP_K = 10
+
+
+def _fold(value):
+    """Casefolded key with whitespace collapsed (None for non-strings and blanks)"""
+    if not isinstance(value, str):
+        return None
+    return " ".join(value.casefold().split()) or None
+
+
+class _Node:
+    __slots__ = ("label", "children", "key", "count", "spellings", "top")
+
+    def __init__(self, label):
+        # Edge label leading into this node
+        self.label = label
+        # First character of a child's label -> child
+        self.children = {}
+        # Full key when books carry it (count > 0)
+        self.key = None
+        self.count = 0
+        self.spellings = None
+        # Cached [(-count, key, display)] of the subtree, None when stale
+        self.top = None
+
+    def entry(self):
+        spellings = self.spellings
+        # Most used spelling; ties go to the smallest string, whatever order the books arrived in
+        return -self.count, self.key, min(spellings, key=lambda value: (-spellings[value], value))
+
+
+class PrefixIndex:
+    """Radix trie over one field, speaking the rebuild/add/remove index protocol
+
+    Like the other costly indexes it is filled by the first completion and
+    maintained incrementally from then on.
+    """
+
+    def __init__(self, field="name"):
+        self.field = field
+        self.built = False
+        self._root = _Node("")
+
+    def rebuild(self, books):
+        self.built = False
+        self._root = _Node("")
+
+    def build(self, books):
+        """Fill the trie from every book now, in one pass over the sorted distinct keys"""
+        field = self.field
+        spellings = {}
+        for book in books:
+            value = book.get(field)
+            key = _fold(value)
+            if key is None:
+                continue
+            bucket = spellings.get(key)
+            if bucket is None:
+                bucket = spellings[key] = {}
+            bucket[value] = bucket.get(value, 0) + 1
+        self._root = _Node("")
+        self._fill(self._root, sorted(spellings), 0, len(spellings), 0, spellings)
+        self.built = True
+
+    def add(self, pos, book):
+        if self.built:
+            self._insert(book.get(self.field))
+
+    def remove(self, pos, book):
+        if not self.built:
+            return
+        value = book.get(self.field)
+        key = _fold(value)
+        if key is None:
+            return
+        path = self._path(key)
+        node = path[-1]
+        for visited in path:
+            visited.top = None
+        node.count -= 1
+        node.spellings[value] -= 1
+        if not node.spellings[value]:
+            del node.spellings[value]
+        if node.count:
+            return
+        node.key = None
+        node.spellings = None
+        # Prune the emptied node and re-compress what is left around it
+        if not node.children and len(path) > 1:
+            parent = path[-2]
+            del parent.children[node.label[0]]
+            node = parent
+            path.pop()
+        if node is not self._root and node.count == 0 and len(node.children) == 1:
+            (child,) = node.children.values()
+            child.label = node.label + child.label
+            path[-2].children[child.label[0]] = child
+
+    def complete(self, prefix, limit=TOP_K):
+        """[(display, count)] of the most popular keys starting with the folded prefix"""
+        node = self._find(_fold(prefix) or "")
+        if node is None or limit <= 0:
+            return []
+        if limit <= TOP_K:
+            entries = self._top(node)[:limit]
+        else:
+            entries = nsmallest(limit, self._entries(node))
+        return [(display, -negative) for negative, _, display in entries]
+
+    def _fill(self, node, keys, lo, hi, depth, spellings):
+        """Hang keys[lo:hi], which share their first depth characters, below node"""
+        if lo < hi and len(keys[lo]) == depth:
+            # The key spelled by the path itself sorts first
+            key = keys[lo]
+            node.key = key
+            node.spellings = spellings[key]
+            node.count = sum(node.spellings.values())
+            lo += 1
+        while lo < hi:
+            first = keys[lo]
+            char = first[depth]
+            if ord(char) == 0x10FFFF:
+                end = hi
+            else:
+                end = bisect_left(keys, first[:depth] + chr(ord(char) + 1), lo, hi)
+            if end - lo == 1:
+                common = len(first)
+            else:
+                # The longest prefix shared by a sorted run is the one its ends share
+                last = keys[end - 1]
+                common = depth + 1
+                limit = min(len(first), len(last))
+                while common < limit and first[common] == last[common]:
+                    common += 1
+            child = _Node(first[depth:common])
+            node.children[char] = child
+            self._fill(child, keys, lo, end, common, spellings)
+            lo = end
+
+    def _insert(self, value):
+        key = _fold(value)
+        if key is None:
+            return
+        node = self._root
+        node.top = None
+        i = 0
+        while i < len(key):
+            child = node.children.get(key[i])
+            if child is None:
+                child = _Node(key[i:])
+                node.children[key[i]] = child
+                node = child
+                break
+            label = child.label
+            common = 1
+            limit = min(len(label), len(key) - i)
+            while common < limit and label[common] == key[i + common]:
+                common += 1
+            if common < len(label):
+                # Split the edge; the lower half keeps its (still valid) cache
+                middle = _Node(label[:common])
+                child.label = label[common:]
+                middle.children[child.label[0]] = child
+                node.children[key[i]] = middle
+                child = middle
+            node = child
+            node.top = None
+            i += common
+        node.top = None
+        if node.count == 0:
+            node.key = key
+            node.spellings = {}
+        node.count += 1
+        node.spellings[value] = node.spellings.get(value, 0) + 1
+
+    def _path(self, key):
+        """Nodes from the root to the node holding key"""
+        node = self._root
+        path = [node]
+        i = 0
+        while i < len(key):
+            node = node.children[key[i]]
+            i += len(node.label)
+            path.append(node)
+        return path
+
+    def _find(self, prefix):
+        """Node whose subtree holds exactly the keys starting with prefix, or None"""
+        node = self._root
+        i = 0
+        while i < len(prefix):
+            node = node.children.get(prefix[i])
+            if node is None:
+                return None
+            label = node.label
+            rest = prefix[i:i + len(label)]
+            if not label.startswith(rest):
+                return None
+            i += len(label)
+        return node
+
+    def _top(self, node):
+        """The node's cached completions, recomputed from its children's if stale"""
+        if node.top is None:
+            tops = [self._top(child) for child in node.children.values()]
+            if node.count:
+                tops.append([node.entry()])
+            node.top = nsmallest(TOP_K, chain.from_iterable(tops))
+        return node.top
+
+    def _entries(self, node):
+        """Every key in the subtree"""
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node.count:
+                yield node.entry()
+            stack.extend(node.children.values())
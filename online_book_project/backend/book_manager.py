@@ -1,115 +1,773 @@
 """
 Backend Module - Business logic for book management
 """
+import functools
+from contextlib import contextmanager
+from heapq import nsmallest
+
+from backend.analytics import CatalogAnalytics
+from backend.autocomplete import PrefixIndex
+from backend.cache import LRUCache
+from backend.duplicates import DuplicateIndex
+from backend.fulltext import FullTextIndex
+from backend.fuzzy import fuzzy_matches
+from backend.indexes import AuthorIndex, CategoryIndex, NameIndex, TrigramIndex, YearIndex
+from backend.parallel import PARALLEL_THRESHOLD, ParallelScanner
+from backend.persistent import VersionIndex
+from backend.query import ORDERINGS, QueryPlanner, decode_cursor, encode_cursor
+from storage.export import export_books
+from storage.sqlite_storage import BOOK_FIELDS
+
+# Undo steps BookManager keeps (each holds only the records its edits touched)
+UNDO_LIMIT = 100
+
+
+def _memoized(method):
+    """Serve a query method from the result cache, keyed by its arguments and the catalog version
+
+    Results are cached and returned as tuples, so every caller can share one
+    without copying it. A method answering with the whole catalog (the
+    storage's own list, e.g. for category "All") gets a tuple copy of it
+    that is not cached: caching it would only pin a second copy of the
+    catalog. get_all_books() hands out the live catalog itself.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        key = (method.__name__, args, tuple(sorted(kwargs.items())), self._cache_version())
+        try:
+            result = self._cache.get(key)
+        except TypeError:
+            # Unhashable argument: nothing to key on
+            return method(self, *args, **kwargs)
+        if result is None:
+            result = method(self, *args, **kwargs)
+            if result is getattr(self.storage, "books", None):
+                return tuple(result)
+            result = tuple(result)
+            self._cache.put(key, result)
+        return result
+    return wrapper
+
+
+def _undoable(method):
+    """Make a mutation method one undo step (calls nested inside it merge into it)"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._undo_step():
+            return method(self, *args, **kwargs)
+    return wrapper
 
 
 class BookManager:
     """Handle book operations: filter, search, sort, add, delete, edit"""
     
-    def __init__(self, storage):
-        """Initialize with storage object"""
+    def __init__(self, storage, cache_size=128, cache_rows=2000000, scan_threshold=PARALLEL_THRESHOLD,
+                 scan_workers=None):
+        """Initialize with storage object
+
+        cache_size/cache_rows bound the result cache; scan() uses scan_workers
+        processes (default: one per CPU) once the catalog has scan_threshold books.
+        """
         self.storage = storage
+        # Storages with a query engine (e.g. SQLiteBookStorage) get filters pushed down
+        self._select = getattr(storage, "select_books", None)
+        self._page_select = getattr(storage, "page_books", None)
+        # Secondary indexes, maintained incrementally by the mutation helpers below
+        self._names = NameIndex()
+        self._trigrams = TrigramIndex()
+        self._author_grams = TrigramIndex("author", shared=True)
+        self._categories = CategoryIndex()
+        self._authors = AuthorIndex()
+        self._years = YearIndex()
+        # Built on first full_text_search(), or loaded from its file next to the data
+        self._fulltext = FullTextIndex()
+        # Radix tries for search-box completion, built on the first suggest()
+        self._title_prefixes = PrefixIndex("name")
+        self._author_prefixes = PrefixIndex("author")
+        # MinHash/LSH buckets, built on the first duplicate check
+        self._duplicates = DuplicateIndex()
+        # Persistent copy of the catalog backing snapshots and views, built by the first of them
+        self._versions = VersionIndex()
+        # Shared-memory copy of the catalog for multi-process scans, packed on the first large scan()
+        self._scanner = ParallelScanner(scan_threshold, scan_workers)
+        self._indexes = [self._names, self._trigrams, self._author_grams, self._categories, self._authors,
+                         self._years, self._fulltext, self._title_prefixes, self._author_prefixes,
+                         self._duplicates, self._versions, self._scanner]
+        # Built by the first call that needs each (see _ready) rather than on every (re)load
+        self._lazy = (self._names, self._trigrams, self._author_grams, self._categories, self._authors,
+                      self._years)
+        # The indexes mutations keep in step: the lazy ones only once built
+        self._live = []
+        # Undo/redo steps: lists of (op, position, old book, new book) edits
+        self._undo = []
+        self._redo = []
+        # Edits of the step in progress (None outside one)
+        self._recording = None
+        self._snapshots = {}
+        self._step_depth = 0
+        self._planner = QueryPlanner(self._trigrams, self._categories, self._years)
+        # (storage generation, book count) the indexes were built for
+        self._synced = None
+        # Bumped by every mutation; part of every result cache key
+        self.version = 0
+        self._cache = LRUCache(cache_size, max_weight=cache_rows)
+        # (catalog version, CatalogAnalytics) for the latest analytics() call
+        self._analytics = None
     
     def get_all_books(self):
         """Return all books"""
         return self.storage.get_books()
     
+    @_memoized
     def filter_by_category(self, category):
         """Filter books by category"""
-        books = self.storage.get_books()
         if category == "All":
-            return books
-        return [b for b in books if b.get("category") == category]
+            return self.storage.get_books()
+        if self._select:
+            return self._select(category=category)
+        books = self._ready(self._categories)
+        return [books[pos] for pos in self._categories.positions(category)]
     
+    @_memoized
     def search_by_name(self, search_term):
         """Search books by name"""
-        books = self.storage.get_books()
         if not search_term:
-            return books
-        search_lower = search_term.lower()
-        return [b for b in books if search_lower in b["name"].lower()]
+            return self.storage.get_books()
+        if self._select:
+            return self._select(text=search_term)
+        books = self._ready(self._trigrams)
+        return [books[pos] for pos in self._trigrams.search(search_term)]
+    
+    @_memoized
+    def books_by_author(self, name):
+        """Books by author name in catalog order (case and extra spaces ignored)"""
+        books = self._ready(self._authors)
+        return [books[pos] for pos in self._authors.positions(name)]
     
+    def authors_with_prefix(self, prefix, limit=10):
+        """Up to limit (author, number of books) pairs whose name starts with prefix, alphabetically"""
+        self._ready(self._authors)
+        return self._authors.with_prefix(prefix, limit)
+    
+    def suggest(self, prefix, limit=8):
+        """Completions for the search box: [(text, "title" or "author", number of books)]
+
+        Titles and authors starting with prefix (case and extra spaces
+        ignored), those carried by the most books first.
+        """
+        if not prefix or not prefix.strip():
+            return []
+        books = self._books()
+        for trie in (self._title_prefixes, self._author_prefixes):
+            if not trie.built:
+                trie.build(books)
+        found = [(text, "title", count) for text, count in self._title_prefixes.complete(prefix, limit)]
+        found += [(text, "author", count) for text, count in self._author_prefixes.complete(prefix, limit)]
+        return nsmallest(limit, found, key=lambda item: (-item[2], item[0].casefold(), item[1]))
+    
+    @_memoized
+    def fuzzy_search(self, term, max_distance=2, limit=20):
+        """Books whose title or author is within max_distance typos of term, closest first
+
+        Distance is the case-insensitive edit (Levenshtein) distance to the
+        whole title or author; ties keep catalog order.
+        """
+        if not term:
+            return []
+        books = self._ready(self._trigrams, self._author_grams)
+        term = term.lower()
+        ranked = fuzzy_matches(self._trigrams, term, max_distance, limit)
+        for pos, distance in fuzzy_matches(self._author_grams, term, max_distance, limit).items():
+            if distance < ranked.get(pos, max_distance + 1):
+                ranked[pos] = distance
+        best = nsmallest(limit, ranked.items(), key=lambda item: (item[1], item[0]))
+        return [books[pos] for pos, _ in best]
+    
+    def scan(self, predicate, limit=None):
+        """Books matching a backend.parallel predicate, in catalog order (the first limit of them)
+
+        For conditions no index answers, e.g. All(Contains("name", "war"),
+        YearBetween(None, 1899)) or Matches("author", "^Tol"). Large catalogs
+        are scanned by a pool of worker processes.
+        """
+        books = self._books()
+        return [books[pos] for pos in self._scanner.scan(books, predicate, limit)]
+    
+    @_memoized
+    def full_text_search(self, query, limit=20):
+        """Books best matching the words of query in title, author or category, best first
+
+        Words are matched whole, ignoring case and accents; any word may match
+        and books are ranked by BM25 (ties keep catalog order).
+        """
+        if not query:
+            return []
+        books = self._books()
+        self._ensure_fulltext(books)
+        return [books[pos] for pos in self._fulltext.search(query, limit)]
+    
+    def save_search_index(self):
+        """Write the full-text index next to the data file, if built and storage is flushed"""
+        # Syncing first drops an index left over from before a storage reload
+        self._books()
+        path, token = self._fulltext_file()
+        if not self._fulltext.built or token is None:
+            return False
+        return self._fulltext.save(path, token)
+    
+    @_memoized
     def sort_by_date(self, descending=True):
         """Sort books by date (year)"""
-        books = self.storage.get_books()
-        # Handle years stored as strings; fall back to 0 for invalid/missing
-        def year_key(x):
-            try:
-                return int(x.get("date") or 0)
-            except Exception:
-                return 0
-        return sorted(books, key=year_key, reverse=descending)
-    
-    def add_book(self, book):
-        """Add a new book"""
+        if self._select:
+            return self._select(descending=descending)
+        books = self._ready(self._years)
+        # The year index is already ordered; invalid/missing years count as 0
+        order = self._years.descending() if descending else self._years.ascending()
+        return list(map(books.__getitem__, order))
+    
+    @_memoized
+    def books_between(self, year_from, year_to):
+        """Books published from year_from to year_to inclusive, oldest first"""
+        if self._select:
+            return self._select(descending=False, year_from=year_from, year_to=year_to)
+        books = self._ready(self._years)
+        return [books[pos] for pos in self._years.between(year_from, year_to)]
+    
+    @_memoized
+    def newest(self, k):
+        """The k most recent books (same order as sort_by_date(True)[:k])"""
+        if self._select:
+            return self._select(descending=True, limit=k)
+        books = self._ready(self._years)
+        return [books[pos] for pos in self._years.newest(k)]
+    
+    @_memoized
+    def oldest(self, k):
+        """The k oldest books (same order as sort_by_date(False)[:k])"""
+        if self._select:
+            return self._select(descending=False, limit=k)
+        books = self._ready(self._years)
+        return [books[pos] for pos in self._years.oldest(k)]
+    
+    @_memoized
+    def query(self, category=None, text=None, year_range=None, order_by=None, limit=None, offset=0):
+        """Books matching every given filter, ordered and paged in one call
+
+        category is an exact match ("All" means any), text a case-insensitive
+        substring of the title, year_range an inclusive (from, to) pair.
+        order_by is None (catalog order), "year", "-year", "name" or "-name";
+        ties keep catalog order.
+        """
+        if category == "All":
+            category = None
+        if self._select:
+            year_from, year_to = year_range if year_range is not None else (None, None)
+            return self._select(category=category, text=text, year_from=year_from, year_to=year_to,
+                                order_by=order_by, limit=limit, offset=offset)
+        books = self._ready_for(category, text, year_range, order_by)
+        plan = self._planner.plan(len(books), category, text, year_range, order_by, limit, offset)
+        return [books[pos] for pos in self._planner.run(plan, books, offset, limit)]
+    
+    def iter_query(self, category=None, text=None, year_range=None, order_by=None):
+        """The books query() would return, yielded one at a time
+
+        Nothing is copied: only the matching positions are collected (and
+        sorted when order_by asks for it), and on SQLite rows come straight
+        off the cursor. Do not change the catalog while iterating.
+        """
+        if category == "All":
+            category = None
+        if self._select:
+            year_from, year_to = year_range if year_range is not None else (None, None)
+            yield from self.storage.iter_select(category=category, text=text, year_from=year_from,
+                                                year_to=year_to, order_by=order_by)
+            return
+        books = self._ready_for(category, text, year_range, order_by)
+        plan = self._planner.plan(len(books), category, text, year_range, order_by)
+        if plan.source == "scan" and order_by is None:
+            yield from books
+            return
+        for pos in self._planner.run(plan, books):
+            yield books[pos]
+    
+    def export(self, path, fmt=None, compress=None, fields=BOOK_FIELDS, category=None, text=None,
+               year_range=None, order_by=None):
+        """Stream the books matching a query to a CSV, JSONL or JSON file; returns the number written
+
+        fmt ("csv", "jsonl" or "json") defaults to the file extension and
+        compress (gzip) to whether path ends in ".gz"; fields are the CSV
+        columns. Raises ValueError for an unknown format and OSError if the
+        file cannot be written.
+        """
+        if order_by not in ORDERINGS:
+            raise ValueError("order_by must be one of {}".format(ORDERINGS))
+        books = self.iter_query(category, text, year_range, order_by)
+        return export_books(books, path, fmt, compress, fields)
+    
+    def page(self, query=None, cursor=None, size=200):
+        """One page of results plus a cursor for the next page (None after the last page)
+
+        query is a dict of query() filters: category, text, year_range and
+        order_by. The cursor remembers the sort key of the last row handed out
+        rather than an offset, so books added between calls are not skipped or
+        repeated; pass it back with the same query to continue.
+        """
+        query = dict(query or {})
+        unknown = set(query) - {"category", "text", "year_range", "order_by"}
+        if unknown:
+            raise TypeError("unknown query fields: {}".format(", ".join(sorted(unknown))))
+        category = query.get("category")
+        if category == "All":
+            category = None
+        text = query.get("text") or None
+        year_range = tuple(query["year_range"]) if query.get("year_range") is not None else None
+        order_by = query.get("order_by")
+        key = (category, text, year_range, order_by)
+        after = decode_cursor(key, cursor) if cursor is not None else None
+        if self._page_select:
+            # Keyset (sort value, row id): each page is a LIMIT query in the database
+            year_from, year_to = year_range if year_range is not None else (None, None)
+            books, after = self._page_select(category, text, year_from, year_to, order_by, after, size)
+            return books, (encode_cursor(key, after) if after else None)
+        books = self._ready_for(category, text, year_range, order_by)
+        plan = self._planner.plan(len(books), category, text, year_range, order_by, limit=size)
+        limit = None
+        if text is not None and category is None and year_range is None and order_by is None:
+            # In catalog order at most after + 1 matches precede the page, so a short
+            # search term only has to be found that many times (plus the page) over
+            limit = (after[0] + 1 if after else 0) + size + 1
+        positions, after = self._planner.page(plan, books, after, size,
+                                              lambda: self._filtered(category, text, year_range, limit))
+        return [books[pos] for pos in positions], (encode_cursor(key, after) if after else None)
+    
+    @_memoized
+    def _filtered(self, category, text, year_range, limit=None):
+        """Positions passing the filters, in catalog order (the rows page() cuts its pages from)
+
+        With a limit only the first limit of them.
+        """
+        books = self._ready_for(category, text, year_range, None)
+        plan = self._planner.plan(len(books), category, text, year_range)
+        return self._planner.run(plan, books, limit=limit)
+    
+    def explain(self, category=None, text=None, year_range=None, order_by=None, limit=None, offset=0):
+        """The QueryPlan query() would use for these arguments"""
+        if category == "All":
+            category = None
+        books = self._ready_for(category, text, year_range, order_by)
+        return self._planner.plan(len(books), category, text, year_range, order_by, limit, offset)
+    
+    @_undoable
+    def add_book(self, book, allow_duplicate=True, warn_similar=False):
+        """Add a new book (with allow_duplicate=False, refuse a title already present)
+
+        warn_similar=True prints a warning for each likely near-duplicate
+        already in the catalog (see similar_books); the book is still added.
+        """
         if book and "name" in book and "author" in book and "date" in book:
-            books = self.storage.get_books()
-            books.append(book)
-            self.storage.set_books(books)
-            # Persist immediately
-            try:
-                self.storage.save_data()
-            except Exception:
-                pass
-            return True
+            self._books()
+            if not allow_duplicate and self.has_book(book["name"]):
+                return False
+            if warn_similar:
+                for other, similarity in self.similar_books(book):
+                    print(f"Warning: '{book['name']}' looks like a duplicate of '{other['name']}' "
+                          f"({similarity:.0%} similar)")
+            # Storage persists the append (journal record or full save)
+            return self._append(book)
         return False
     
+    def similar_books(self, book, threshold=0.8):
+        """[(book, similarity)] of catalog books likely to duplicate book, most similar first
+
+        Similarity is the Jaccard similarity of title word trigrams plus
+        author words, so word order, case, accents and punctuation do not
+        matter; candidates come from MinHash/LSH buckets (backend.duplicates),
+        which are built by the first call.
+        """
+        books = self._books()
+        self._ensure_duplicates(books)
+        return [(books[pos], similarity) for pos, similarity in self._duplicates.similar(books, book, threshold)]
+    
+    @_memoized
+    def find_duplicates(self, threshold=0.8):
+        """Report every pair of books at least threshold similar (see similar_books), most similar first
+
+        Entries are {"book", "duplicate", "similarity"}; "book" is the one
+        earlier in the catalog.
+        """
+        books = self._books()
+        self._ensure_duplicates(books)
+        return [{"book": books[a], "duplicate": books[b], "similarity": similarity}
+                for a, b, similarity in self._duplicates.pairs(books, threshold)]
+    
+    def has_book(self, book_name):
+        """Whether a book with this exact title exists (O(1))"""
+        self._ready(self._names)
+        return book_name in self._names
+    
+    @_undoable
     def delete_book(self, book_name):
         """Delete a book by name"""
-        books = self.storage.get_books()
-        initial_count = len(books)
-        filtered_books = [b for b in books if b["name"] != book_name]
-        self.storage.set_books(filtered_books)
-        # Persist immediately
-        try:
-            self.storage.save_data()
-        except Exception:
-            pass
-        return len(filtered_books) < initial_count
+        self._ready(self._names)
+        positions = sorted(self._names.positions(book_name), reverse=True)
+        # Highest first: each swap-remove only moves books from behind the rest
+        for pos in positions:
+            if not self._remove(pos):
+                return False
+        return len(positions) > 0
     
     def find_book(self, book_name):
         """Find a book by name"""
-        books = self.storage.get_books()
-        for book in books:
-            if book["name"] == book_name:
-                return book
-        return None
+        if self._select:
+            found = self._select(name=book_name)
+            return found[0] if found else None
+        books = self._ready(self._names)
+        positions = self._names.positions(book_name)
+        if not positions:
+            return None
+        return books[min(positions)]
     
+    @_undoable
     def update_book(self, book_name, updated_book):
         """Update a book by name"""
-        books = self.storage.get_books()
-        for i, book in enumerate(books):
-            if book["name"] == book_name:
-                # If name changed, delete old entry and add new one to avoid duplicates
-                if book_name != updated_book.get("name"):
-                    # Remove old by name
-                    books = [b for b in books if b["name"] != book_name]
-                    # Add updated
-                    books.append(updated_book)
-                else:
-                    # Name same, just update in place
-                    books[i] = updated_book
-                
-                self.storage.set_books(books)
-                # Persist immediately
-                try:
-                    self.storage.save_data()
-                except Exception:
-                    pass
-                return True
-        return False
+        self._ready(self._names)
+        positions = sorted(self._names.positions(book_name))
+        if not positions:
+            return False
+        # Update the first copy in place; a rename also drops the other copies of the old title
+        if book_name != updated_book.get("name"):
+            for pos in reversed(positions[1:]):
+                if not self._remove(pos):
+                    return False
+        return self._replace(positions[0], updated_book)
+    
+    @contextmanager
+    def batch(self):
+        """Apply every mutation in the block in memory and persist them once at the end
+
+        If the block raises (or the final write fails) all of its changes are
+        undone and the data file is left untouched. The block is one undo step.
+        """
+        with self._undo_step(), self.storage.batch():
+            yield
+    
+    @_undoable
+    def add_books(self, books, allow_duplicate=True, warn_similar=False):
+        """Add many books with a single write; returns one report entry per record
+
+        With warn_similar=True each entry also lists under "similar" the names
+        of likely near-duplicates already present (earlier records included).
+        """
+        report = []
+        with self.batch():
+            for book in books:
+                error = self._invalid(book)
+                if error is None and not allow_duplicate and self.has_book(book["name"]):
+                    error = "duplicate title"
+                entry = self._report_entry(book, error)
+                if error is None:
+                    if warn_similar:
+                        entry["similar"] = [other["name"] for other, _ in self.similar_books(book)]
+                    if not self._append(book):
+                        entry = self._report_entry(book, "could not save")
+                report.append(entry)
+        return report
+    
+    @_undoable
+    def delete_books(self, book_names):
+        """Delete many books by name with a single write; returns one report entry per name"""
+        report = []
+        with self.batch():
+            for name in book_names:
+                found = self.delete_book(name)
+                report.append({"name": name, "ok": found, "error": None if found else "not found"})
+        return report
+    
+    @_undoable
+    def update_books(self, updates):
+        """Apply {old name: updated book} with a single write; returns one report entry per name"""
+        report = []
+        with self.batch():
+            for name, updated_book in updates.items():
+                error = self._invalid(updated_book)
+                if error is None and not self.update_book(name, updated_book):
+                    error = "not found"
+                report.append({"name": name, "ok": error is None, "error": error})
+        return report
+    
+    def undo(self):
+        """Revert the last add/update/delete call or batch; False if there is nothing to undo"""
+        self._books()
+        if not self._undo:
+            return False
+        inverse = self._revert(self._undo.pop())
+        if inverse is None:
+            return False
+        self._redo.append(inverse)
+        return True
+    
+    def redo(self):
+        """Reapply the last undone step; False if there is nothing to redo"""
+        self._books()
+        if not self._redo:
+            return False
+        inverse = self._revert(self._redo.pop())
+        if inverse is None:
+            return False
+        self._undo.append(inverse)
+        return True
+    
+    def snapshot(self, name):
+        """Remember the catalog as it is now under name (sharing memory with the live catalog)"""
+        self._ensure_versions(self._books())
+        self._snapshots[name] = self._versions.current
+    
+    def restore(self, name):
+        """Bring the catalog back to snapshot name, as one undoable step; False if there is no such snapshot"""
+        target = self._snapshots.get(name)
+        if target is None:
+            return False
+        with self._undo_step():
+            return self._restore(target)
+    
+    def view(self):
+        """The catalog as an immutable PersistentVector
+
+        Later mutations produce new versions and leave this one alone, so a
+        reader can keep using it while writes go on.
+        """
+        self._ensure_versions(self._books())
+        return self._versions.current
+    
+    def cache_stats(self):
+        """Result cache counters (hits, misses, evictions, size, weight)"""
+        return self._cache.stats()
     
     def get_statistics(self):
-        """Get book statistics"""
-        books = self.storage.get_books()
-        total = len(books)
-        novels = len([b for b in books if b.get("category") == "Novel"])
-        philosophy = len([b for b in books if b.get("category") == "Philosophy"])
-        poetry = len([b for b in books if b.get("category") == "Poetry"])
-        
+        """Get book statistics (total, the three built-in categories, and every category's count)"""
+        if hasattr(self.storage, "count_by_category"):
+            total = self.storage.count_books()
+            categories = self.storage.count_by_category()
+        else:
+            total = len(self._ready(self._categories))
+            categories = self._categories.counts()
         return {
             "total": total,
-            "novels": novels,
-            "philosophy": philosophy,
-            "poetry": poetry
+            "novels": categories.get("Novel", 0),
+            "philosophy": categories.get("Philosophy", 0),
+            "poetry": categories.get("Poetry", 0),
+            "categories": categories
         }
+    
+    def analytics(self):
+        """Decade, author and category aggregates over the catalog as it is now
+
+        Returns a CatalogAnalytics snapshot, reused until the catalog changes.
+        Taking it is cheap; its aggregates may then be computed off the GUI
+        thread.
+        """
+        books = self._books()
+        key = self._cache_version()
+        if self._analytics is None or self._analytics[0] != key:
+            self._analytics = (key, CatalogAnalytics(books))
+        return self._analytics[1]
+    
+    @staticmethod
+    def _invalid(book):
+        """Why a record cannot be stored as a book (None if it can)"""
+        if not isinstance(book, dict):
+            return "not a book record"
+        missing = [field for field in ("name", "author", "date") if field not in book]
+        if missing:
+            return "missing " + ", ".join(missing)
+        return None
+    
+    @staticmethod
+    def _report_entry(book, error):
+        name = book.get("name") if isinstance(book, dict) else None
+        return {"name": name, "ok": error is None, "error": error}
+    
+    def _books(self):
+        """Current book list, resetting the indexes if storage replaced it"""
+        books = self.storage.get_books()
+        token = (getattr(self.storage, "generation", None), len(books))
+        if token != self._synced:
+            # The lazy indexes are emptied here and built again by the next call needing them
+            self._live = [index for index in self._indexes if index not in self._lazy]
+            for index in self._indexes:
+                index.rebuild(books if index in self._live else ())
+            self._synced = token
+            self.version += 1
+            # Steps recorded against the old list cannot be replayed onto a reloaded one
+            self._undo = []
+            self._redo = []
+        return books
+    
+    def _ready(self, *indexes):
+        """Current book list, with the given lazy indexes built"""
+        books = self._books()
+        for index in indexes:
+            if index not in self._live:
+                index.rebuild(books)
+                self._live.append(index)
+        return books
+    
+    def _ready_for(self, category, text, year_range, order_by):
+        """Current book list, with the indexes the planner may use for these filters built"""
+        indexes = []
+        if category is not None:
+            indexes.append(self._categories)
+        if text or order_by in ("name", "-name"):
+            indexes.append(self._trigrams)
+        if year_range is not None or order_by in ("year", "-year"):
+            indexes.append(self._years)
+        return self._ready(*indexes)
+    
+    def _fulltext_file(self):
+        """(path of the saved full-text index, storage state token or None)"""
+        state_token = getattr(self.storage, "state_token", None)
+        return self.storage.data_file + ".fts", state_token() if state_token else None
+    
+    def _ensure_fulltext(self, books):
+        """Load the saved full-text index if it matches the catalog on disk, else build and save it"""
+        if self._fulltext.built:
+            return
+        path, token = self._fulltext_file()
+        if token is not None and self._fulltext.load(path, token):
+            if len(self._fulltext) == len(books):
+                return
+        self._fulltext.build(books)
+        if token is not None:
+            self._fulltext.save(path, token)
+    
+    def _ensure_duplicates(self, books):
+        if not self._duplicates.built:
+            self._duplicates.build(books)
+    
+    def _ensure_versions(self, books):
+        if not self._versions.built:
+            self._versions.build(books)
+    
+    @contextmanager
+    def _undo_step(self):
+        """Record the edits of the outermost step as one undo step, if it made any"""
+        if self._step_depth == 0:
+            self._books()
+            self._recording = []
+        self._step_depth += 1
+        try:
+            yield
+        finally:
+            self._step_depth -= 1
+            step = None
+            if self._step_depth == 0:
+                step, self._recording = self._recording, None
+        if step:
+            self._undo.append(step)
+            del self._undo[:-UNDO_LIMIT]
+            self._redo = []
+    
+    def _revert(self, step):
+        """Apply the inverse of step's edits, newest first, persisted once
+
+        Returns the edits made, which revert this revert (None if it failed).
+        """
+        outer, self._recording = self._recording, []
+        try:
+            with self.storage.batch():
+                for op, pos, old, new in reversed(step):
+                    if op == "append":
+                        saved = self._remove(pos)
+                    elif op == "replace":
+                        saved = self._replace(pos, old)
+                    elif new is not None:
+                        # Undo a swap-remove: put the moved book back last, then the victim in its slot
+                        saved = self._append(new) and self._replace(pos, old)
+                    else:
+                        saved = self._append(old)
+                    if not saved:
+                        raise OSError("could not save book")
+        except OSError as e:
+            print(f"Error restoring catalog version: {e}")
+            return None
+        finally:
+            inverse, self._recording = self._recording, outer
+        return inverse
+    
+    def _record(self, op, pos, old, new):
+        """Add an edit to the step in progress"""
+        if self._recording is not None:
+            self._recording.append((op, pos, old, new))
+    
+    def _restore(self, target):
+        """Turn the catalog into the target version with positional writes, persisted once"""
+        self._ensure_versions(self._books())
+        try:
+            with self.storage.batch():
+                # Only slots outside the versions' shared subtrees are visited
+                saved = True
+                for pos in self._versions.current.changed(target):
+                    saved = saved and self._replace(pos, target[pos])
+                while saved and len(self.storage.get_books()) > len(target):
+                    saved = self._remove(len(self.storage.get_books()) - 1)
+                for pos in range(len(self.storage.get_books()), len(target)):
+                    saved = saved and self._append(target[pos])
+                if not saved:
+                    raise OSError("could not save book")
+        except OSError as e:
+            print(f"Error restoring catalog version: {e}")
+            return False
+        # Same books as target; adopt its nodes so the versions keep sharing memory
+        self._versions.current = target
+        return True
+    
+    def _cache_version(self):
+        """Catalog version for cache keys, noticing storage reloads first"""
+        if not self._select:
+            self._books()
+        return getattr(self.storage, "generation", None), self.version
+    
+    def _mutated(self):
+        """Bump the catalog version; the indexes already match storage after our own mutation"""
+        self.version += 1
+        self._synced = (getattr(self.storage, "generation", None), len(self.storage.get_books()))
+    
+    def _append(self, book):
+        """Append through storage and index the new position; False (nothing changed) if the write fails"""
+        pos = len(self._books())
+        if not self.storage.append_book(book):
+            return False
+        for index in self._live:
+            index.add(pos, book)
+        self._record("append", pos, None, book)
+        self._mutated()
+        return True
+    
+    def _replace(self, pos, book):
+        """Overwrite the book at pos through storage and reindex it; False if the write fails"""
+        old = self.storage.get_books()[pos]
+        if not self.storage.replace_at(pos, book):
+            return False
+        for index in self._live:
+            index.remove(pos, old)
+            index.add(pos, book)
+        self._record("replace", pos, old, book)
+        self._mutated()
+        return True
+    
+    def _remove(self, pos):
+        """Swap-remove the book at pos through storage (O(1)) and reindex the moved book; False if the write fails"""
+        books = self.storage.get_books()
+        last = len(books) - 1
+        victim = books[pos]
+        moved = books[last] if pos != last else None
+        if not self.storage.swap_remove(pos):
+            return False
+        for index in self._live:
+            index.remove(pos, victim)
+            if moved is not None:
+                index.remove(last, moved)
+                index.add(pos, moved)
+        self._record("remove", pos, victim, moved)
+        self._mutated()
+        return True
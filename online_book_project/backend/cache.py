@@ -0,0 +1,72 @@
+"""
+Cache Module - Bounded LRU cache for query results
+"""
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Least-recently-used cache bounded by entry count and total weight
+
+    weigh(value) gives an entry's weight (by default its length, i.e. the
+    number of books in a result list); values heavier than max_weight on
+    their own are not cached. hits/misses/evictions count lookups and drops.
+    """
+
+    def __init__(self, maxsize=128, max_weight=None, weigh=len):
+        self.maxsize = maxsize
+        self.max_weight = max_weight
+        self.weigh = weigh
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.weight = 0
+        self._entries = OrderedDict()
+
+    def get(self, key, default=None):
+        """Cached value for key (marking it most recently used), else default"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, value):
+        """Cache value under key, evicting least recently used entries to fit"""
+        weight = self.weigh(value)
+        if self.max_weight is not None and weight > self.max_weight:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.weight -= old[1]
+        self._entries[key] = (value, weight)
+        self.weight += weight
+        while len(self._entries) > self.maxsize or \
+                (self.max_weight is not None and self.weight > self.max_weight):
+            _, (_, dropped) = self._entries.popitem(last=False)
+            self.weight -= dropped
+            self.evictions += 1
+
+    def clear(self):
+        """Drop every entry (counters are kept)"""
+        self._entries.clear()
+        self.weight = 0
+
+    def stats(self):
+        """Counters and current size, for tuning maxsize/max_weight"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+            "weight": self.weight,
+            "maxsize": self.maxsize,
+            "max_weight": self.max_weight
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
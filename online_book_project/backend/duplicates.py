@@ -0,0 +1,169 @@
+"""
+Duplicates Module - Near-duplicate detection with MinHash and LSH buckets
+
+A book is reduced to a set of shingles: the character trigrams of each title
+word (articles and "and" left out) plus the author's words, so "The
+Republic", "Republic, The" and "Republic" share all of theirs. The Jaccard
+similarity of two such sets is estimated by MinHash signatures, and
+locality-sensitive hashing puts books in the same bucket when one band of
+their signatures agrees. Only books sharing a bucket
+are ever compared, and every candidate is confirmed with the exact Jaccard
+similarity before it is reported.
+
+With 8 bands of 4 rows, pairs at 0.8 similarity become candidates about
+98.5% of the time and pairs below 0.3 about 6% of the time.
+"""
+import functools
+import hashlib
+import struct
+
+from backend.fulltext import tokenize
+
+BANDS = 8
+ROWS = 4
+_ROW_VALUES = struct.Struct("<{}I".format(BANDS * ROWS))
+# Title words that say nothing about which book it is ("War & Peace" has no "and")
+STOP_WORDS = frozenset(("a", "an", "and", "the"))
+
+
+def shingles(book):
+    """Set of title word trigrams and author words describing a book"""
+    grams = set()
+    title = book.get("name")
+    if isinstance(title, str):
+        for word in tokenize(title):
+            if word in STOP_WORDS:
+                continue
+            padded = " " + word + " "
+            grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    author = book.get("author")
+    if isinstance(author, str):
+        grams.update("@" + word for word in tokenize(author))
+    return grams
+
+
+def jaccard(a, b):
+    """Exact Jaccard similarity of two shingle sets"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def _gram_hashes(gram):
+    """One 32-bit hash of gram per signature row, all cut from a single SHAKE digest"""
+    return _ROW_VALUES.unpack(hashlib.shake_128(gram.encode("utf-8")).digest(_ROW_VALUES.size))
+
+
+def signature(grams):
+    """MinHash signature of a non-empty shingle set (BANDS * ROWS values)"""
+    rows = list(map(_gram_hashes, grams))
+    if len(rows) == 1:
+        return list(rows[0])
+    # Column-wise minimum over every shingle's hashes, in C
+    return list(map(min, *rows))
+
+
+def _band_keys(grams):
+    """One bucket key per band (empty for a book with no shingles)"""
+    if not grams:
+        return []
+    values = signature(grams)
+    return [hash(tuple(values[band * ROWS:(band + 1) * ROWS])) for band in range(BANDS)]
+
+
+class DuplicateIndex:
+    """LSH buckets over MinHash signatures, for BookManager's duplicate checks
+
+    Follows the rebuild/add/remove index protocol. Signing every book is
+    costly on a large catalog, so the buckets are only built by the first
+    check and kept in step from then on. A bucket holds a bare position
+    while it has a single book (the common case) and a list beyond that.
+    """
+
+    def __init__(self):
+        self.built = False
+        self._buckets = [{} for _ in range(BANDS)]
+
+    def rebuild(self, books):
+        self.built = False
+        self._buckets = [{} for _ in range(BANDS)]
+
+    def build(self, books):
+        """Sign and bucket every book now"""
+        self._buckets = [{} for _ in range(BANDS)]
+        self.built = True
+        for pos, book in enumerate(books):
+            self._insert(pos, _band_keys(shingles(book)))
+
+    def add(self, pos, book):
+        if self.built:
+            self._insert(pos, _band_keys(shingles(book)))
+
+    def remove(self, pos, book):
+        if not self.built:
+            return
+        for buckets, key in zip(self._buckets, _band_keys(shingles(book))):
+            members = buckets[key]
+            if not isinstance(members, list) or len(members) == 1:
+                del buckets[key]
+            else:
+                members.remove(pos)
+
+    def similar(self, books, book, threshold=0.8):
+        """[(position, similarity)] of indexed books at least threshold similar to book, best first"""
+        grams = shingles(book)
+        found = []
+        for pos in self._candidates(_band_keys(grams)):
+            similarity = jaccard(grams, shingles(books[pos]))
+            if similarity >= threshold:
+                found.append((pos, similarity))
+        found.sort(key=lambda item: (-item[1], item[0]))
+        return found
+
+    def pairs(self, books, threshold=0.8):
+        """[(pos, other, similarity)] for every pair of books at least threshold similar, best first"""
+        candidates = set()
+        for buckets in self._buckets:
+            for members in buckets.values():
+                if isinstance(members, list):
+                    candidates.update((a, b) if a < b else (b, a)
+                                      for i, a in enumerate(members) for b in members[i + 1:])
+        cached = {}
+
+        def grams_at(pos):
+            grams = cached.get(pos)
+            if grams is None:
+                grams = cached[pos] = shingles(books[pos])
+            return grams
+
+        found = []
+        for a, b in candidates:
+            similarity = jaccard(grams_at(a), grams_at(b))
+            if similarity >= threshold:
+                found.append((a, b, similarity))
+        found.sort(key=lambda item: (-item[2], item[0], item[1]))
+        return found
+
+    def _insert(self, pos, keys):
+        for buckets, key in zip(self._buckets, keys):
+            members = buckets.get(key)
+            if members is None:
+                buckets[key] = pos
+            elif isinstance(members, list):
+                members.append(pos)
+            else:
+                buckets[key] = [members, pos]
+
+    def _candidates(self, keys):
+        """Positions sharing at least one bucket with the given band keys"""
+        found = set()
+        for buckets, key in zip(self._buckets, keys):
+            members = buckets.get(key)
+            if members is None:
+                continue
+            if isinstance(members, list):
+                found.update(members)
+            else:
+                found.add(members)
+        return found
@@ -0,0 +1,213 @@
+"""
+Full-Text Module - BM25-ranked search over title, author and category
+
+Terms are casefolded, accent-stripped word tokens. Each term keeps a posting
+of (position, term frequency) pairs as two parallel arrays sorted by
+position, so a million books stay compact and an edit finds its slot by
+binary search. The index speaks the same rebuild/add/remove protocol as
+backend.indexes, but builds lazily: nothing is tokenized until the first
+search, and a saved copy next to the data file is reused when it still
+matches the catalog on disk.
+"""
+import json
+import math
+import os
+import re
+import sys
+import unicodedata
+from array import array
+from bisect import bisect_left
+from heapq import nlargest
+
+FIELDS = ("name", "author", "category")
+MAGIC = b"BKFTS002\n"
+_WORD = re.compile(r"\w+")
+
+
+def tokenize(text):
+    """Lowercase, accent-free word tokens of text"""
+    text = text.casefold()
+    if not text.isascii():
+        text = "".join(ch for ch in unicodedata.normalize("NFKD", text)
+                       if not unicodedata.combining(ch))
+    return _WORD.findall(text)
+
+
+def _terms(book):
+    """{term: frequency} over the indexed fields of a book"""
+    counts = {}
+    for field in FIELDS:
+        value = book.get(field)
+        if isinstance(value, str):
+            for term in tokenize(value):
+                counts[term] = counts.get(term, 0) + 1
+    return counts
+
+
+class FullTextIndex:
+    """Inverted index with term frequencies, ranked with Okapi BM25"""
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.built = False
+        # term -> (positions, frequencies)
+        self._postings = {}
+        # Token count per position, and their sum for the average
+        self._lengths = array("I")
+        self._total_length = 0
+
+    def rebuild(self, books):
+        # Tokenizing the whole catalog is the expensive part; defer it to build()
+        self.built = False
+        self._postings = {}
+        self._lengths = array("I")
+        self._total_length = 0
+
+    def build(self, books):
+        """Tokenize every book now"""
+        positions, frequencies = {}, {}
+        lengths = array("I")
+        total = 0
+        for pos, book in enumerate(books):
+            counts = _terms(book)
+            length = sum(counts.values())
+            lengths.append(length)
+            total += length
+            for term, count in counts.items():
+                bucket = positions.get(term)
+                if bucket is None:
+                    bucket = positions[term] = []
+                    frequencies[term] = []
+                bucket.append(pos)
+                frequencies[term].append(min(count, 0xFFFF))
+        self._postings = {term: (array("I", bucket), array("H", frequencies[term]))
+                          for term, bucket in positions.items()}
+        self._lengths = lengths
+        self._total_length = total
+        self.built = True
+
+    def add(self, pos, book):
+        if not self.built:
+            return
+        counts = _terms(book)
+        length = sum(counts.values())
+        if pos == len(self._lengths):
+            self._lengths.append(length)
+        else:
+            self._lengths[pos] = length
+        self._total_length += length
+        for term, count in counts.items():
+            posting = self._postings.get(term)
+            if posting is None:
+                posting = self._postings[term] = (array("I"), array("H"))
+            positions, frequencies = posting
+            count = min(count, 0xFFFF)
+            if not positions or positions[-1] < pos:
+                positions.append(pos)
+                frequencies.append(count)
+            else:
+                # A swap-remove refills a slot in the middle
+                i = bisect_left(positions, pos)
+                positions.insert(i, pos)
+                frequencies.insert(i, count)
+
+    def remove(self, pos, book):
+        if not self.built:
+            return
+        for term in _terms(book):
+            positions, frequencies = self._postings[term]
+            i = bisect_left(positions, pos)
+            del positions[i]
+            del frequencies[i]
+            if not positions:
+                del self._postings[term]
+        self._total_length -= self._lengths[pos]
+        if pos == len(self._lengths) - 1:
+            self._lengths.pop()
+        else:
+            self._lengths[pos] = 0
+
+    def search(self, query, limit=20):
+        """Positions of the limit best BM25 matches for query (any term may match)"""
+        n = len(self._lengths)
+        if not n:
+            return []
+        average = self._total_length / n or 1.0
+        k1, b = self.k1, self.b
+        scores = {}
+        for term in set(tokenize(query)):
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            positions, frequencies = posting
+            df = len(positions)
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            lengths = self._lengths
+            for pos, tf in zip(positions, frequencies):
+                norm = k1 * (1 - b + b * lengths[pos] / average)
+                scores[pos] = scores.get(pos, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+        # Top-k by heap; equal scores keep catalog order
+        best = nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
+        return [pos for pos, _ in best]
+
+    def __len__(self):
+        return len(self._lengths)
+
+    def save(self, path, token):
+        """Write the built index to path, tagged with the catalog's state token"""
+        if not self.built:
+            return False
+        terms = list(self._postings)
+        header = {
+            "token": token,
+            "byteorder": sys.byteorder,
+            "docs": len(self._lengths),
+            "total_length": self._total_length,
+            "terms": [[term, len(self._postings[term][0])] for term in terms],
+        }
+        tmp_path = path + ".tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(MAGIC)
+                f.write(json.dumps(header, ensure_ascii=False).encode("utf-8") + b"\n")
+                self._lengths.tofile(f)
+                for term in terms:
+                    positions, frequencies = self._postings[term]
+                    positions.tofile(f)
+                    frequencies.tofile(f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+            return True
+        except Exception as e:
+            print(f"Error saving search index: {e}")
+            return False
+
+    def load(self, path, token):
+        """Load an index saved for the same catalog state; False if missing or stale"""
+        try:
+            with open(path, "rb") as f:
+                if f.readline() != MAGIC:
+                    return False
+                header = json.loads(f.readline().decode("utf-8"))
+                # JSON turns tuples into lists; compare like with like
+                if header["token"] != json.loads(json.dumps(token)) or header["byteorder"] != sys.byteorder:
+                    return False
+                lengths = array("I")
+                lengths.fromfile(f, header["docs"])
+                postings = {}
+                for term, count in header["terms"]:
+                    positions, frequencies = array("I"), array("H")
+                    positions.fromfile(f, count)
+                    frequencies.fromfile(f, count)
+                    postings[term] = (positions, frequencies)
+        except (OSError, ValueError, KeyError, EOFError) as e:
+            if not isinstance(e, FileNotFoundError):
+                print(f"Ignoring unreadable search index: {e}")
+            return False
+        self._postings = postings
+        self._lengths = lengths
+        self._total_length = header["total_length"]
+        self.built = True
+        return True
@@ -0,0 +1,102 @@
+"""
+Fuzzy Module - Typo-tolerant matching on top of the trigram indexes
+
+A string within k edits of the query must contain at least one of k + 1
+disjoint pieces of the query unchanged (each edit can break only one piece),
+so the candidates come from exact substring lookups of those pieces. Each
+edit also destroys at most three of the query's trigrams, so a candidate
+must still contain all but 3k of them (the q-gram count filter). The
+survivors are grouped by value and get a (banded) edit distance computation
+in order of that lower bound, at most MAX_VERIFIED distinct values per query.
+"""
+from heapq import nsmallest
+
+# Distinct values a query computes an edit distance for (lowest bound first)
+MAX_VERIFIED = 2000
+
+
+def levenshtein(a, b, max_distance):
+    """Edit distance between a and b, or None if it is larger than max_distance"""
+    if abs(len(a) - len(b)) > max_distance:
+        return None
+    if a == b:
+        return 0
+    if len(a) > len(b):
+        a, b = b, a
+    # Only cells within max_distance of the diagonal can stay under the limit
+    over = max_distance + 1
+    previous = [j if j <= max_distance else over for j in range(len(b) + 1)]
+    for i, char in enumerate(a, 1):
+        low = max(1, i - max_distance)
+        high = min(len(b), i + max_distance)
+        current = [over] * (len(b) + 1)
+        current[0] = i if i <= max_distance else over
+        for j in range(low, high + 1):
+            cost = 0 if char == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+        if min(current[low - 1:high + 1]) > max_distance:
+            return None
+        previous = current
+    distance = previous[len(b)]
+    return distance if distance <= max_distance else None
+
+
+def _pieces(term, count):
+    """Split term into count contiguous, nearly equal pieces"""
+    size, extra = divmod(len(term), count)
+    pieces, start = [], 0
+    for i in range(count):
+        end = start + size + (1 if i < extra else 0)
+        pieces.append(term[start:end])
+        start = end
+    return pieces
+
+
+def fuzzy_matches(index, term, max_distance, limit=None):
+    """{position: distance} for values in a TrigramIndex within max_distance edits of term
+
+    term must already be lowercased. Values are checked in order of the
+    fewest edits their shared trigrams and length allow; with a limit the
+    search stops once limit positions are closer than anything unchecked
+    could be, so the closest limit positions are still exact. At most
+    MAX_VERIFIED distinct values are checked.
+    """
+    length = len(term)
+    pieces = _pieces(term, max_distance + 1)
+    # value -> positions holding it, so a repeated value (an author) is checked once
+    values = {}
+    if min(len(piece) for piece in pieces) >= 3:
+        # Unverified postings: the filters below reject values missing every piece anyway
+        candidates = set()
+        for piece in pieces:
+            candidates.update(index.candidates(piece))
+    else:
+        # Query too short to split usefully: check every value of a similar length
+        candidates = index.with_length(length - max_distance, length + max_distance)
+    for pos in candidates:
+        value = index.folded(pos)
+        if abs(len(value) - length) <= max_distance:
+            values.setdefault(value, []).append(pos)
+    grams = {term[i:i + 3] for i in range(length - 2)}
+    bounds = {}
+    for value in values:
+        # Each edit destroys at most three of term's trigrams and changes the length by at most one
+        missing = len(grams) - sum(map(value.__contains__, grams))
+        bound = max(-(-missing // 3), abs(len(value) - length))
+        if bound <= max_distance:
+            bounds[value] = (bound, missing)
+    ordered = nsmallest(MAX_VERIFIED, bounds, key=bounds.__getitem__)
+    matches = {}
+    closer = [0] * (max_distance + 1)
+    for value in ordered:
+        bound = bounds[value][0]
+        if limit is not None and bound > 0 and closer[bound - 1] >= limit:
+            break
+        distance = levenshtein(term, value, max_distance)
+        if distance is not None:
+            positions = values[value]
+            for pos in positions:
+                matches[pos] = distance
+            for at_most in range(distance, max_distance + 1):
+                closer[at_most] += len(positions)
+    return matches
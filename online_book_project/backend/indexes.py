@@ -0,0 +1,558 @@
+"""
+Indexes Module - In-memory secondary indexes kept in step with the catalog
+
+Every index speaks the same small protocol so BookManager can maintain them
+all from one place:
+    rebuild(books)      build from scratch
+    add(pos, book)      a book now lives at position pos
+    remove(pos, book)   the book at position pos is gone
+A swap-remove is expressed as remove(pos, victim), remove(last, moved),
+add(pos, moved).
+"""
+from array import array
+from bisect import bisect_left, insort
+from itertools import compress, repeat
+from operator import contains
+
+from storage.sqlite_storage import clamped_year
+
+
+def _hashable(value):
+    """Hashable key for a field value (titles should be strings, but don't crash if not)"""
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return ("unhashable", repr(value))
+
+
+def _insert_sorted(posting, pos):
+    """Add pos to a sorted posting (an append in the common case of a new last book)"""
+    if not posting or posting[-1] < pos:
+        posting.append(pos)
+    else:
+        posting.insert(bisect_left(posting, pos), pos)
+
+
+def _remove_sorted(posting, pos):
+    """Drop pos from a sorted posting with a binary search instead of a linear scan"""
+    del posting[bisect_left(posting, pos)]
+
+
+class NameIndex:
+    """Exact title -> positions of the books carrying it
+
+    A title held by a single book (nearly all of them) maps to its bare
+    position; only repeated titles get a list.
+    """
+
+    def __init__(self):
+        self._positions = {}
+
+    def rebuild(self, books):
+        self._positions = {}
+        for pos, book in enumerate(books):
+            self.add(pos, book)
+
+    def add(self, pos, book):
+        name = _hashable(book["name"])
+        held = self._positions.get(name)
+        if held is None:
+            self._positions[name] = pos
+        elif isinstance(held, list):
+            held.append(pos)
+        else:
+            self._positions[name] = [held, pos]
+
+    def remove(self, pos, book):
+        name = _hashable(book["name"])
+        held = self._positions[name]
+        if not isinstance(held, list):
+            del self._positions[name]
+            return
+        held.remove(pos)
+        if len(held) == 1:
+            self._positions[name] = held[0]
+
+    def positions(self, name):
+        """Positions holding name (empty list if none), in no particular order"""
+        held = self._positions.get(_hashable(name))
+        if held is None:
+            return []
+        return list(held) if isinstance(held, list) else [held]
+
+    def __contains__(self, name):
+        return _hashable(name) in self._positions
+
+    def __len__(self):
+        return len(self._positions)
+
+# Candidate count a query verifies directly instead of scanning for more grams
+SMALL_POSTING = 4096
+# Titles per step when a limited search scans for a gram it has no posting for
+SCAN_BLOCK = 16384
+
+
+def _trigrams(text):
+    """Distinct 3-character substrings of text"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex:
+    """Gram -> positions over a lowercased text field (titles by default), for substring search
+
+    Matches BookManager's `term.lower() in name.lower()` semantics exactly:
+    a query's trigrams only narrow the candidates and every hit is verified
+    against the lowercased title (1-2 character queries use their own exact
+    posting). Postings are built per gram the first time a query needs one,
+    with a single C-level pass over the titles, and kept up to date by
+    add/remove from then on, so typing a query only ever pays for its new
+    grams and a full index over every trigram is never built up front.
+    Postings are kept sorted, so results need no sort and an edit finds its
+    position in a posting by binary search.
+    """
+
+    def __init__(self, field="name", shared=False):
+        self.field = field
+        # Lowercased field value per position ("" for non-strings and missing values)
+        self._folded = []
+        # With shared=True (fields that repeat, like authors) one folded string per distinct value
+        self._shared = {} if shared else None
+        # Cached postings: trigrams in _postings, 1-2 character grams in _short
+        self._postings = {}
+        self._short = {}
+        # Length -> positions, built on first use by with_length()
+        self._lengths = None
+
+    def rebuild(self, books):
+        if self._shared is not None:
+            self._shared = {}
+        self._folded = [self._fold(book.get(self.field)) for book in books]
+        self._postings = {}
+        self._short = {}
+        self._lengths = None
+
+    def add(self, pos, book):
+        folded = self._fold(book.get(self.field))
+        if pos == len(self._folded):
+            self._folded.append(folded)
+        else:
+            self._folded[pos] = folded
+        for posting in self._cached_postings(folded):
+            _insert_sorted(posting, pos)
+        if self._lengths is not None:
+            bucket = self._lengths.get(len(folded))
+            if bucket is None:
+                bucket = self._lengths[len(folded)] = array("I")
+            _insert_sorted(bucket, pos)
+
+    def remove(self, pos, book):
+        folded = self._folded[pos]
+        for posting in self._cached_postings(folded):
+            _remove_sorted(posting, pos)
+        if self._lengths is not None:
+            _remove_sorted(self._lengths[len(folded)], pos)
+        if pos == len(self._folded) - 1:
+            self._folded.pop()
+        else:
+            self._folded[pos] = ""
+
+    def search(self, term, limit=None):
+        """Sorted positions whose lowercased value contains term.lower() (the first limit of them)
+
+        With a limit, a 1-2 character needle that has no posting yet is
+        scanned for only until limit matches turn up, so the first page of a
+        one-letter search does not wait for a pass over the whole catalog.
+        """
+        needle = term.lower()
+        if len(needle) < 3:
+            if limit is not None and needle not in self._short:
+                return self._scan(needle, limit).tolist()
+            positions = self.candidates(needle)
+            return positions.tolist() if limit is None else positions[:limit].tolist()
+        # Verifying the rarest posting is cheaper than intersecting the rest
+        folded = self._folded
+        found = []
+        for pos in self.candidates(needle):
+            if needle in folded[pos]:
+                found.append(pos)
+                if limit is not None and len(found) >= limit:
+                    break
+        return found
+
+    def estimate(self, term):
+        """Number of matches for term: exact when the candidates are few, else an upper bound
+
+        A 1-2 character term with no posting yet is estimated from the first
+        SCAN_BLOCK titles, so planning a limited search does not build it.
+        """
+        needle = term.lower()
+        if len(needle) < 3 and needle not in self._short and len(self._folded) > SCAN_BLOCK:
+            sample = self._folded[:SCAN_BLOCK]
+            found = sum(map(contains, sample, repeat(needle)))
+            return found * len(self._folded) // SCAN_BLOCK
+        candidates = self.candidates(needle)
+        if len(needle) < 3 or len(candidates) > SMALL_POSTING:
+            return len(candidates)
+        folded = self._folded
+        return sum(1 for pos in candidates if needle in folded[pos])
+
+    def folded(self, pos):
+        """Lowercased value at pos"""
+        return self._folded[pos]
+
+    def with_length(self, low, high):
+        """Positions whose lowercased value is low to high characters long"""
+        if self._lengths is None:
+            lengths = {}
+            for pos, value in enumerate(self._folded):
+                bucket = lengths.get(len(value))
+                if bucket is None:
+                    bucket = lengths[len(value)] = array("I")
+                bucket.append(pos)
+            self._lengths = lengths
+        positions = []
+        for length in range(max(low, 0), high + 1):
+            positions.extend(self._lengths.get(length, ()))
+        return positions
+
+    def __len__(self):
+        return len(self._folded)
+
+    def candidates(self, needle):
+        """Positions that may contain an already lowercased needle
+
+        The exact posting for a 1-2 character needle, otherwise the posting of
+        its rarest trigram (callers verify).
+        """
+        if len(needle) < 3:
+            posting = self._short.get(needle)
+            if posting is None:
+                posting = self._short[needle] = self._scan(needle)
+            return posting
+        grams = _trigrams(needle)
+        smallest = None
+        for gram in grams:
+            posting = self._postings.get(gram)
+            if posting is not None and (smallest is None or len(posting) < len(smallest)):
+                smallest = posting
+        # Only scan for new grams while the candidates are still too many to verify
+        for gram in grams:
+            if smallest is not None and len(smallest) <= SMALL_POSTING:
+                break
+            if gram not in self._postings:
+                posting = self._postings[gram] = self._scan(gram)
+                if smallest is None or len(posting) < len(smallest):
+                    smallest = posting
+        return smallest
+
+    def _scan(self, gram, limit=None):
+        """Posting for one gram, found with a single pass over the titles (or until limit matches)"""
+        folded = self._folded
+        if limit is None:
+            return array("I", compress(range(len(folded)), map(contains, folded, repeat(gram))))
+        found = array("I")
+        for start in range(0, len(folded), SCAN_BLOCK):
+            block = folded[start:start + SCAN_BLOCK]
+            found.extend(compress(range(start, start + len(block)), map(contains, block, repeat(gram))))
+            if len(found) >= limit:
+                del found[limit:]
+                break
+        return found
+
+    def _fold(self, value):
+        """Lowercased value ("" for non-strings), shared between equal values if asked"""
+        if not isinstance(value, str):
+            return ""
+        folded = value.lower()
+        if self._shared is not None:
+            folded = self._shared.setdefault(folded, folded)
+        return folded
+
+    def _cached_postings(self, folded):
+        """The cached postings a title belongs to"""
+        if self._postings:
+            for gram in _trigrams(folded):
+                posting = self._postings.get(gram)
+                if posting is not None:
+                    yield posting
+        for gram, posting in self._short.items():
+            if gram in folded:
+                yield posting
+
+
+class CategoryIndex:
+    """Category -> sorted positions, so counts are O(1) and filters scale with the result"""
+
+    def __init__(self):
+        self._positions = {}
+
+    def rebuild(self, books):
+        if hasattr(books, "category_ids"):
+            self._positions = self._from_ids(books)
+            return
+        positions = {}
+        for pos, book in enumerate(books):
+            category = _hashable(book.get("category"))
+            bucket = positions.get(category)
+            if bucket is None:
+                bucket = positions[category] = array("I")
+            bucket.append(pos)
+        self._positions = positions
+
+    @staticmethod
+    def _from_ids(books):
+        """Group a mapped snapshot's category id column without building any rows"""
+        by_id = {}
+        for pos, category_id in enumerate(books.category_ids):
+            bucket = by_id.get(category_id)
+            if bucket is None:
+                bucket = by_id[category_id] = array("I")
+            bucket.append(pos)
+        positions = {}
+        for category_id, bucket in by_id.items():
+            category = _hashable(books.category_value(category_id))
+            if category in positions:
+                # A missing category and an explicit null (or 1 and True) share a key
+                bucket = array("I", sorted(positions[category] + bucket))
+            positions[category] = bucket
+        return positions
+
+    def add(self, pos, book):
+        category = _hashable(book.get("category"))
+        bucket = self._positions.get(category)
+        if bucket is None:
+            bucket = self._positions[category] = array("I")
+        _insert_sorted(bucket, pos)
+
+    def remove(self, pos, book):
+        category = _hashable(book.get("category"))
+        bucket = self._positions[category]
+        _remove_sorted(bucket, pos)
+        if not bucket:
+            del self._positions[category]
+
+    def positions(self, category):
+        """Sorted positions of the books in category"""
+        bucket = self._positions.get(_hashable(category))
+        return bucket.tolist() if bucket is not None else []
+
+    def count(self, category):
+        return len(self._positions.get(_hashable(category), ()))
+
+    def counts(self):
+        """{category: number of books} for every category present (uncategorized books excluded)"""
+        return {category: len(bucket) for category, bucket in self._positions.items()
+                if category is not None}
+
+
+def author_key(value):
+    """Normalized author for lookups: casefolded, whitespace collapsed (None for non-strings)"""
+    if not isinstance(value, str):
+        return None
+    return " ".join(value.casefold().split()) or None
+
+
+class AuthorIndex:
+    """Normalized author -> sorted positions, plus the sorted author keys for prefix scans
+
+    Each key also remembers how its spellings are used, so listings show an
+    author the way the catalog writes them rather than in folded form.
+    """
+
+    def __init__(self):
+        self._positions = {}
+        self._spellings = {}
+        self._keys = []
+
+    def rebuild(self, books):
+        positions, spellings = {}, {}
+        for pos, book in enumerate(books):
+            value = book.get("author")
+            key = author_key(value)
+            if key is None:
+                continue
+            bucket = positions.get(key)
+            if bucket is None:
+                bucket = positions[key] = array("I")
+                spellings[key] = {}
+            bucket.append(pos)
+            spelling = spellings[key]
+            spelling[value] = spelling.get(value, 0) + 1
+        self._positions = positions
+        self._spellings = spellings
+        self._keys = sorted(positions)
+
+    def add(self, pos, book):
+        value = book.get("author")
+        key = author_key(value)
+        if key is None:
+            return
+        bucket = self._positions.get(key)
+        if bucket is None:
+            bucket = self._positions[key] = array("I")
+            self._spellings[key] = {}
+            insort(self._keys, key)
+        _insert_sorted(bucket, pos)
+        spelling = self._spellings[key]
+        spelling[value] = spelling.get(value, 0) + 1
+
+    def remove(self, pos, book):
+        value = book.get("author")
+        key = author_key(value)
+        if key is None:
+            return
+        bucket = self._positions[key]
+        _remove_sorted(bucket, pos)
+        if not bucket:
+            del self._positions[key]
+            del self._spellings[key]
+            del self._keys[bisect_left(self._keys, key)]
+            return
+        spelling = self._spellings[key]
+        spelling[value] -= 1
+        if not spelling[value]:
+            del spelling[value]
+
+    def positions(self, author):
+        """Sorted positions of the books by author (compared normalized)"""
+        bucket = self._positions.get(author_key(author))
+        return bucket.tolist() if bucket is not None else []
+
+    def with_prefix(self, prefix, limit=10):
+        """Up to limit (author, number of books) pairs whose normalized name starts with prefix, by name"""
+        prefix = author_key(prefix) or ""
+        keys = self._keys
+        found = []
+        for i in range(bisect_left(keys, prefix), len(keys)):
+            key = keys[i]
+            if len(found) >= limit or not key.startswith(prefix):
+                break
+            found.append((self.spelling(key), len(self._positions[key])))
+        return found
+
+    def spelling(self, key):
+        """The most used spelling of a normalized author (the smallest string on ties)"""
+        spellings = self._spellings[key]
+        return min(spellings, key=lambda value: (-spellings[value], value))
+
+    def __len__(self):
+        return len(self._keys)
+
+
+# Low 32 bits of a YearIndex key hold the position
+POSITION_MASK = 0xFFFFFFFF
+
+
+def _year_key(book, pos):
+    """(year << 32) + pos, with the year clamped so the key fits an int64"""
+    return (clamped_year(book) << 32) + pos
+
+
+class YearIndex:
+    """Books ordered by parsed year, as one sorted array of packed keys
+
+    A key is (year << 32) + position, so ties keep catalog order exactly like
+    the stable sorted() BookManager.sort_by_date used to run. Years are parsed
+    once, when a book is indexed (invalid or missing dates count as 0), and
+    the keys live in an array('q') at 8 bytes per book. Added keys wait in a
+    buffer until the next read merges them, so a bulk import does not pay an
+    O(n) insort per book.
+    """
+
+    def __init__(self):
+        self._keys = array("q")
+        self._pending = []
+
+    def rebuild(self, books):
+        self._keys = array("q", sorted(map(_year_key, books, range(len(books)))))
+        self._pending = []
+
+    def add(self, pos, book):
+        self._pending.append(_year_key(book, pos))
+
+    def remove(self, pos, book):
+        keys = self._merged()
+        del keys[bisect_left(keys, _year_key(book, pos))]
+
+    def _merged(self):
+        """The sorted keys, with any buffered additions merged in"""
+        pending = self._pending
+        if pending:
+            if len(pending) <= 8:
+                for key in pending:
+                    insort(self._keys, key)
+            else:
+                # Two sorted runs: timsort merges them in linear time
+                keys = self._keys.tolist()
+                keys += pending
+                keys.sort()
+                self._keys = array("q", keys)
+            self._pending = []
+        return self._keys
+
+    def ascending(self):
+        """Positions from oldest to newest"""
+        return [key & POSITION_MASK for key in self._merged()]
+
+    def descending(self):
+        """Positions from newest to oldest (books sharing a year stay in catalog order)"""
+        keys = self._merged()
+        positions = []
+        end = len(keys)
+        while end:
+            start = bisect_left(keys, (keys[end - 1] >> 32) << 32, 0, end)
+            positions.extend([key & POSITION_MASK for key in keys[start:end]])
+            end = start
+        return positions
+
+    def ordered(self, descending=False, start_year=None):
+        """Lazily yield positions in year order, for walks that may stop early
+
+        With start_year, the walk begins at that year's books (oldest-first
+        walks skip earlier years, newest-first walks skip later ones).
+        """
+        keys = self._merged()
+        if not descending:
+            start = 0 if start_year is None else bisect_left(keys, start_year << 32)
+            for i in range(start, len(keys)):
+                yield keys[i] & POSITION_MASK
+            return
+        end = len(keys) if start_year is None else bisect_left(keys, (start_year + 1) << 32)
+        while end:
+            start = bisect_left(keys, (keys[end - 1] >> 32) << 32, 0, end)
+            for key in keys[start:end]:
+                yield key & POSITION_MASK
+            end = start
+
+    def count_between(self, year_from, year_to):
+        """Number of books with year_from <= year <= year_to (None leaves that end open)"""
+        start, end = self._range(year_from, year_to)
+        return max(0, end - start)
+
+    def between(self, year_from, year_to):
+        """Positions with year_from <= year <= year_to, oldest first (None leaves that end open)"""
+        start, end = self._range(year_from, year_to)
+        return [key & POSITION_MASK for key in self._keys[start:end]]
+
+    def _range(self, year_from, year_to):
+        """Slice of the merged keys holding years year_from..year_to"""
+        keys = self._merged()
+        start = 0 if year_from is None else bisect_left(keys, year_from << 32)
+        end = len(keys) if year_to is None else bisect_left(keys, (year_to + 1) << 32)
+        return start, end
+
+    def newest(self, k):
+        keys = self._merged()
+        positions = []
+        end = len(keys)
+        while end and len(positions) < k:
+            start = bisect_left(keys, (keys[end - 1] >> 32) << 32, 0, end)
+            # Only the head of the last year group is needed
+            stop = min(end, start + k - len(positions))
+            positions.extend([key & POSITION_MASK for key in keys[start:stop]])
+            end = start
+        return positions
+
+    def oldest(self, k):
+        return [key & POSITION_MASK for key in self._merged()[:k]]
@@ -0,0 +1,376 @@
+"""
+Parallel Module - Multi-process scans for predicates no index can answer
+
+The catalog is packed once into a block of shared memory: per field, the
+UTF-8 bytes of every value back to back with an offsets array, plus the
+parsed years as int64. Worker processes attach to the block by name and
+each evaluates the predicate over its own range of rows, decoding only the
+fields the predicate reads, so a scan sends nothing but the predicate and
+the matching positions between processes. Results are merged in catalog
+order.
+
+Predicates are small picklable objects (Contains, Matches, Equals,
+YearBetween, combined with All / Any / Not; Where wraps a module-level
+function). Catalogs below the threshold, or machines with a single CPU,
+are scanned in-process by the same code, so small libraries never pay for
+starting workers.
+"""
+import json
+import os
+import re
+import struct
+import weakref
+from abc import ABC, abstractmethod
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from storage.sqlite_storage import BOOK_FIELDS, year_of
+
+# Catalogs smaller than this are scanned in-process
+PARALLEL_THRESHOLD = 200000
+# Rows per task handed to a worker
+CHUNK_ROWS = 50000
+
+# Per-value kind: missing/None, a string, anything else (stored as JSON)
+_NONE, _STR, _OTHER = 0, 1, 2
+_WORD = struct.calcsize("q")
+
+
+class Predicate(ABC):
+    """A condition on books, evaluated a chunk of rows at a time"""
+
+    @abstractmethod
+    def select(self, chunk, rows):
+        """The subset of rows (ascending indexes into the chunk) whose books match
+
+        chunk[field] is the list of that field's values over the chunk and
+        chunk["year"] the parsed years.
+        """
+
+
+class Contains(Predicate):
+    """field contains text, ignoring case (like search_by_name)"""
+
+    def __init__(self, field, text):
+        self.field = field
+        self.text = text.lower()
+
+    def select(self, chunk, rows):
+        values, text = chunk[self.field], self.text
+        return [row for row in rows if isinstance(values[row], str) and text in values[row].lower()]
+
+
+class Matches(Predicate):
+    """field is a string matching a regular expression (re.search)"""
+
+    def __init__(self, field, pattern, flags=0):
+        self.field = field
+        self.pattern = re.compile(pattern, flags)
+
+    def select(self, chunk, rows):
+        values, search = chunk[self.field], self.pattern.search
+        return [row for row in rows if isinstance(values[row], str) and search(values[row])]
+
+
+class Equals(Predicate):
+    """field equals value exactly"""
+
+    def __init__(self, field, value):
+        self.field = field
+        self.value = value
+
+    def select(self, chunk, rows):
+        values, value = chunk[self.field], self.value
+        return [row for row in rows if values[row] == value]
+
+
+class YearBetween(Predicate):
+    """Parsed year (0 when the date is not a number) within [low, high]; None leaves a side open"""
+
+    def __init__(self, low=None, high=None):
+        self.low = low
+        self.high = high
+
+    def select(self, chunk, rows):
+        years = chunk["year"]
+        low = self.low if self.low is not None else float("-inf")
+        high = self.high if self.high is not None else float("inf")
+        return [row for row in rows if low <= years[row] <= high]
+
+
+class All(Predicate):
+    """Every predicate matches; each one only looks at the rows the previous ones kept"""
+
+    def __init__(self, *predicates):
+        self.predicates = predicates
+
+    def select(self, chunk, rows):
+        for predicate in self.predicates:
+            if not rows:
+                break
+            rows = predicate.select(chunk, rows)
+        return rows
+
+
+class Any(Predicate):
+    """At least one predicate matches"""
+
+    def __init__(self, *predicates):
+        self.predicates = predicates
+
+    def select(self, chunk, rows):
+        found = set()
+        remaining = rows
+        for predicate in self.predicates:
+            found.update(predicate.select(chunk, remaining))
+            remaining = [row for row in remaining if row not in found]
+        return [row for row in rows if row in found]
+
+
+class Not(Predicate):
+    """The predicate does not match"""
+
+    def __init__(self, predicate):
+        self.predicate = predicate
+
+    def select(self, chunk, rows):
+        excluded = set(self.predicate.select(chunk, rows))
+        return [row for row in rows if row not in excluded]
+
+
+class Where(Predicate):
+    """function(fields) is true, fields being a dict of the named book fields plus "year"
+
+    function must be defined at module level so it can be sent to the workers.
+    """
+
+    def __init__(self, function, *fields):
+        self.function = function
+        self.fields = fields or BOOK_FIELDS + ("year",)
+
+    def select(self, chunk, rows):
+        columns = [(field, chunk[field]) for field in self.fields]
+        function = self.function
+        return [row for row in rows if function({field: values[row] for field, values in columns})]
+
+
+class _Chunk:
+    """Rows lo..hi of a catalog, each field decoded on first use"""
+
+    def __init__(self, size, load):
+        self.size = size
+        self._load = load
+        self._columns = {}
+
+    def __getitem__(self, field):
+        values = self._columns.get(field)
+        if values is None:
+            values = self._columns[field] = self._load(field)
+        return values
+
+
+def _books_chunk(books, lo, hi):
+    """_Chunk over a slice of an in-memory book list"""
+    def load(field):
+        if field == "year":
+            return [year_of(books[pos]) for pos in range(lo, hi)]
+        return [books[pos].get(field) for pos in range(lo, hi)]
+    return _Chunk(hi - lo, load)
+
+
+def _packed_chunk(buf, layout, lo, hi):
+    """_Chunk over rows lo..hi of a block laid out by pack()"""
+    count = layout["count"]
+    extras = []
+
+    def load(field):
+        if field == "year":
+            start = layout["years"]
+            return buf[start:start + count * _WORD].cast("q")[lo:hi].tolist()
+        if field not in layout["fields"]:
+            if not extras:
+                extras.append(load(None))
+            return [extra.get(field) if extra else None for extra in extras[0]]
+        offsets_at, kinds_at, blob_at = layout["fields"][field]
+        offsets = buf[offsets_at:offsets_at + (count + 1) * _WORD].cast("q")[lo:hi + 1].tolist()
+        kinds = bytes(buf[kinds_at + lo:kinds_at + hi])
+        base = offsets[0]
+        blob = bytes(buf[blob_at + base:blob_at + offsets[-1]])
+        values = []
+        for i, kind in enumerate(kinds):
+            if kind == _NONE:
+                values.append(None)
+                continue
+            value = blob[offsets[i] - base:offsets[i + 1] - base].decode("utf-8", "surrogatepass")
+            values.append(value if kind == _STR else json.loads(value))
+        return values
+    return _Chunk(hi - lo, load)
+
+
+def pack(books, fields=BOOK_FIELDS):
+    """(SharedMemory, layout) holding fields and parsed years of every book
+
+    Keys outside fields are packed together, as one JSON object per book,
+    under the layout key None.
+    """
+    count = len(books)
+    parts = []
+    layout = {"count": count, "fields": {}}
+    size = 0
+    for field in fields + (None,):
+        kinds = bytearray(count)
+        offsets = array("q", [0]) * (count + 1)
+        encoded = []
+        total = 0
+        for pos, book in enumerate(books):
+            if field is not None:
+                value = book.get(field)
+            elif len(book) > len(fields) or any(key not in fields for key in book):
+                value = {key: item for key, item in book.items() if key not in fields} or None
+            else:
+                value = None
+            if value is not None:
+                if isinstance(value, str):
+                    kinds[pos] = _STR
+                else:
+                    kinds[pos] = _OTHER
+                    value = json.dumps(value, ensure_ascii=False)
+                data = value.encode("utf-8", "surrogatepass")
+                encoded.append(data)
+                total += len(data)
+            offsets[pos + 1] = total
+        layout["fields"][field] = (size, size + len(offsets) * _WORD, size + len(offsets) * _WORD + count)
+        parts.extend((offsets, kinds, b"".join(encoded)))
+        # Keep every array 8-byte aligned so it can be cast in place
+        size += len(offsets) * _WORD + count + total
+        padding = -size % _WORD
+        parts.append(bytes(padding))
+        size += padding
+    layout["years"] = size
+    years = array("q", map(year_of, books))
+    parts.append(years)
+    size += len(years) * _WORD
+
+    block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    at = 0
+    for part in parts:
+        data = memoryview(part).cast("B")
+        block.buf[at:at + len(data)] = data
+        at += len(data)
+    return block, layout
+
+
+# Worker side: the block attached by this process, kept across tasks
+_attached = {}
+
+
+def _attach(name):
+    block = _attached.get(name)
+    if block is None:
+        for old in _attached.values():
+            old.close()
+        _attached.clear()
+        block = _attached[name] = shared_memory.SharedMemory(name=name)
+    return block
+
+
+def _scan_range(name, layout, predicate, lo, hi):
+    """Positions in lo..hi matching predicate (run in a worker)"""
+    chunk = _packed_chunk(_attach(name).buf, layout, lo, hi)
+    return array("q", [lo + row for row in predicate.select(chunk, range(hi - lo))])
+
+
+def _release(block, pool):
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+    if block is not None:
+        block.close()
+        block.unlink()
+
+
+class ParallelScanner:
+    """Scans the catalog with a Predicate, across processes when it is large
+
+    Speaks the rebuild/add/remove index protocol: any change to the catalog
+    drops the packed copy, which the next large scan packs again. The worker
+    pool is started by the first parallel scan and reused after that.
+    """
+
+    def __init__(self, threshold=PARALLEL_THRESHOLD, workers=None, chunk_rows=CHUNK_ROWS):
+        self.threshold = threshold
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_rows = chunk_rows
+        self._block = None
+        self._layout = None
+        self._pool = None
+        self._finalizer = None
+
+    def rebuild(self, books):
+        self._drop_block()
+
+    def add(self, pos, book):
+        self._drop_block()
+
+    def remove(self, pos, book):
+        self._drop_block()
+
+    def parallel(self, books):
+        """Whether a scan of books would use the worker processes"""
+        return self.workers > 1 and len(books) >= self.threshold
+
+    def scan(self, books, predicate, limit=None):
+        """Positions of books matching predicate, in catalog order (the first limit of them)"""
+        if not self.parallel(books):
+            return self._scan_local(books, predicate, limit)
+        if self._block is None:
+            self._block, self._layout = pack(books)
+            self._track()
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            self._track()
+        name = self._block.name
+        futures = [self._pool.submit(_scan_range, name, self._layout, predicate, lo,
+                                     min(lo + self.chunk_rows, len(books)))
+                   for lo in range(0, len(books), self.chunk_rows)]
+        found = []
+        try:
+            for future in futures:
+                found.extend(future.result())
+                if limit is not None and len(found) >= limit:
+                    break
+        finally:
+            for future in futures:
+                future.cancel()
+        return found if limit is None else found[:limit]
+
+    def close(self):
+        """Stop the workers and free the shared memory"""
+        if self._finalizer is not None:
+            self._finalizer()
+            self._finalizer = None
+        self._block = None
+        self._layout = None
+        self._pool = None
+
+    def _scan_local(self, books, predicate, limit):
+        found = []
+        step = self.chunk_rows if limit is not None else max(len(books), 1)
+        for lo in range(0, len(books), step):
+            hi = min(lo + step, len(books))
+            found.extend(lo + row for row in predicate.select(_books_chunk(books, lo, hi), range(hi - lo)))
+            if limit is not None and len(found) >= limit:
+                return found[:limit]
+        return found
+
+    def _drop_block(self):
+        if self._block is not None:
+            block, self._block, self._layout = self._block, None, None
+            self._track()
+            _release(block, None)
+
+    def _track(self):
+        """(Re)register cleanup of the current block and pool for when the scanner is collected"""
+        if self._finalizer is not None:
+            self._finalizer.detach()
+        self._finalizer = weakref.finalize(self, _release, self._block, self._pool)
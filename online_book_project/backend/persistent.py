@@ -0,0 +1,182 @@
+"""
+Persistent Module - Immutable, structure-sharing catalog versions
+
+PersistentVector is a 32-way trie of tuples. set/append/pop return a new
+vector that copies only the path to the changed slot (O(log32 n) tuples of
+at most 32 entries) and shares every other node with the old one, so
+keeping many versions of a million-book catalog costs little more than
+keeping one. Old versions never change, which makes them safe to read while
+the catalog moves on.
+"""
+BITS = 5
+WIDTH = 1 << BITS
+MASK = WIDTH - 1
+
+
+class PersistentVector:
+    """Immutable sequence with O(log n) updates that share structure with the original"""
+
+    __slots__ = ("_root", "_size", "_shift")
+
+    def __init__(self, items=()):
+        nodes = list(items)
+        size = len(nodes)
+        shift = 0
+        nodes = [tuple(nodes[i:i + WIDTH]) for i in range(0, size, WIDTH)] or [()]
+        while len(nodes) > 1:
+            nodes = [tuple(nodes[i:i + WIDTH]) for i in range(0, len(nodes), WIDTH)]
+            shift += BITS
+        self._root = nodes[0]
+        self._size = size
+        self._shift = shift
+
+    @classmethod
+    def _make(cls, root, size, shift):
+        vector = cls.__new__(cls)
+        vector._root = root
+        vector._size = size
+        vector._shift = shift
+        return vector
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("PersistentVector index out of range")
+        node = self._root
+        for shift in range(self._shift, 0, -BITS):
+            node = node[(index >> shift) & MASK]
+        return node[index & MASK]
+
+    def __iter__(self):
+        def walk(node, shift):
+            if shift == 0:
+                yield from node
+            else:
+                for child in node:
+                    yield from walk(child, shift - BITS)
+        return walk(self._root, self._shift)
+
+    def set(self, index, value):
+        """Copy with value at index"""
+        if not 0 <= index < self._size:
+            raise IndexError("PersistentVector index out of range")
+        return PersistentVector._make(self._assoc(self._root, self._shift, index, value), self._size, self._shift)
+
+    def append(self, value):
+        """Copy with value added at the end"""
+        size, shift = self._size, self._shift
+        if size and size == WIDTH << shift:
+            # Full: the old root becomes the first child of a taller one
+            root = (self._root, self._path(shift, value))
+            return PersistentVector._make(root, size + 1, shift + BITS)
+        return PersistentVector._make(self._assoc(self._root, shift, size, value), size + 1, shift)
+
+    def pop(self):
+        """Copy without the last item"""
+        if not self._size:
+            raise IndexError("pop from empty PersistentVector")
+        size, shift = self._size - 1, self._shift
+        root = self._trim(self._root, shift, size)
+        # Drop levels that are down to a single child
+        while shift and len(root) == 1:
+            root = root[0]
+            shift -= BITS
+        return PersistentVector._make(root, size, shift)
+
+    def changed(self, other):
+        """Indexes below min(len) whose items differ (by identity) from other's
+
+        Subtrees the two versions share are skipped without being visited, so
+        comparing a version with one a few edits away costs O(edits * log n).
+        """
+        limit = min(self._size, other._size)
+        if self._shift != other._shift:
+            # Different heights share no nodes; compare item by item
+            return [i for i, (a, b) in enumerate(zip(self, other)) if a is not b]
+        found = []
+        stack = [(self._root, other._root, self._shift, 0)]
+        while stack:
+            a, b, shift, base = stack.pop()
+            if a is b:
+                continue
+            if shift == 0:
+                found.extend(base + i for i, (x, y) in enumerate(zip(a, b))
+                             if x is not y and base + i < limit)
+            else:
+                for i, (x, y) in enumerate(zip(a, b)):
+                    stack.append((x, y, shift - BITS, base + (i << shift)))
+        found.sort()
+        return found
+
+    @classmethod
+    def _assoc(cls, node, shift, index, value):
+        """node with value stored at index (one slot past the end appends)"""
+        slot = (index >> shift) & MASK
+        if shift == 0:
+            return node[:slot] + (value,) + node[slot + 1:]
+        if slot == len(node):
+            return node + (cls._path(shift - BITS, value),)
+        return node[:slot] + (cls._assoc(node[slot], shift - BITS, index, value),) + node[slot + 1:]
+
+    @staticmethod
+    def _path(shift, value):
+        """A fresh branch holding only value"""
+        node = (value,)
+        for _ in range(0, shift, BITS):
+            node = (node,)
+        return node
+
+    @classmethod
+    def _trim(cls, node, shift, index):
+        """node without the item at index, which is its last"""
+        slot = (index >> shift) & MASK
+        if shift == 0:
+            return node[:slot]
+        child = cls._trim(node[slot], shift - BITS, index)
+        if not child:
+            return node[:slot]
+        return node[:slot] + (child,)
+
+
+class VersionIndex:
+    """Index keeping `current`, a PersistentVector, equal to the catalog
+
+    Speaks the rebuild/add/remove protocol of backend.indexes; every
+    mutation leaves the previous version intact for snapshots and views.
+    Copying a large catalog into a vector is costly, so it is only built
+    by the first snapshot or view and kept in step from then on.
+    """
+
+    def __init__(self):
+        self.built = False
+        self.current = None
+
+    def rebuild(self, books):
+        self.built = False
+        self.current = None
+
+    def build(self, books):
+        """Copy the catalog into a vector now"""
+        self.current = PersistentVector(books)
+        self.built = True
+
+    def add(self, pos, book):
+        if not self.built:
+            return
+        if pos == len(self.current):
+            self.current = self.current.append(book)
+        else:
+            self.current = self.current.set(pos, book)
+
+    def remove(self, pos, book):
+        if not self.built:
+            return
+        if pos == len(self.current) - 1:
+            self.current = self.current.pop()
+        else:
+            # A swap-remove refills the slot right after
+            self.current = self.current.set(pos, None)
@@ -0,0 +1,231 @@
+"""
+Query Module - Planner for combined category / search / year / sort views
+
+A query is answered in three steps: the most selective index supplies the
+candidate positions, the remaining predicates are checked in one pass over
+those candidates, and only the survivors are sorted and paged.
+"""
+import base64
+import json
+import zlib
+from bisect import bisect_right
+from heapq import nlargest, nsmallest
+
+from storage.sqlite_storage import year_of
+
+ORDERINGS = (None, "year", "-year", "name", "-name")
+
+
+def encode_cursor(query_key, after):
+    """Opaque page cursor: the query it belongs to plus the (sort value, ties seen) keyset"""
+    payload = json.dumps([zlib.crc32(repr(query_key).encode("utf-8")), after[0], after[1]])
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(query_key, cursor):
+    """The (sort value, ties seen) keyset inside a cursor made by encode_cursor for query_key"""
+    try:
+        signature, value, skip = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, TypeError, AttributeError):
+        raise ValueError("malformed page cursor")
+    if signature != zlib.crc32(repr(query_key).encode("utf-8")):
+        raise ValueError("page cursor belongs to a different query")
+    return value, skip
+
+
+class QueryPlan:
+    """The access path chosen for a query and the predicates left to check"""
+
+    def __init__(self, source, estimate, category, needle, year_range, order_by):
+        # One of "scan", "category", "text", "year", "year-order"
+        self.source = source
+        self.estimate = estimate
+        self.category = category
+        self.needle = needle
+        self.year_range = year_range
+        self.order_by = order_by
+
+    def __repr__(self):
+        return "QueryPlan(source={!r}, estimate={})".format(self.source, self.estimate)
+
+
+class QueryPlanner:
+    """Plans and runs queries against BookManager's indexes"""
+
+    def __init__(self, trigrams, categories, years):
+        self.trigrams = trigrams
+        self.categories = categories
+        self.years = years
+
+    def plan(self, total, category=None, text=None, year_range=None, order_by=None, limit=None, offset=0):
+        """Choose the cheapest access path for a query over total books"""
+        if order_by not in ORDERINGS:
+            raise ValueError("order_by must be one of {}".format(ORDERINGS))
+        needle = text.lower() if text else None
+        paths = []
+        if category is not None:
+            paths.append(("category", self.categories.count(category)))
+        if needle is not None:
+            paths.append(("text", self.trigrams.estimate(needle)))
+        if year_range is not None:
+            paths.append(("year", self.years.count_between(*year_range)))
+        source, estimate = min(paths, key=lambda path: path[1]) if paths else ("scan", total)
+        if order_by in ("year", "-year") and source != "year":
+            # Walking the year index needs no sort and, with a limit, stops after
+            # about wanted * total / estimate rows; take it when that beats
+            # visiting every candidate
+            wanted = None if limit is None else offset + limit
+            if not paths or (wanted is not None and wanted * total < estimate * estimate):
+                source = "year-order"
+        return QueryPlan(source, estimate, category, needle, year_range, order_by)
+
+    def run(self, plan, books, offset=0, limit=None):
+        """Positions answering plan, ordered and paged"""
+        if plan.source == "year-order":
+            return self._walk_years(plan, books, offset, limit)
+        check = self._residual(plan, books)
+        if plan.source == "category":
+            candidates = self.categories.positions(plan.category)
+        elif plan.source == "text":
+            if check is None and plan.order_by is None and limit is not None:
+                # Only the first offset + limit matches can land on the page
+                return self.trigrams.search(plan.needle, offset + limit)[offset:]
+            candidates = self.trigrams.search(plan.needle)
+        elif plan.source == "year":
+            candidates = self.years.between(*plan.year_range)
+        else:
+            candidates = range(len(books))
+        survivors = [pos for pos in candidates if check(pos)] if check else list(candidates)
+
+        order_by = plan.order_by
+        if order_by == "year" and plan.source == "year":
+            # Already in (year, position) order
+            return self._page(survivors, offset, limit)
+        if plan.source == "year":
+            survivors.sort()
+        if order_by is None:
+            return self._page(survivors, offset, limit)
+        if order_by in ("year", "-year"):
+            def key(pos):
+                return year_of(books[pos])
+        else:
+            key = self.trigrams.folded
+        descending = order_by.startswith("-")
+        if limit is not None:
+            # Stable like sorted(), but only keeps the rows the page needs
+            select = nlargest if descending else nsmallest
+            return select(offset + limit, survivors, key=key)[offset:]
+        survivors.sort(key=key, reverse=descending)
+        return self._page(survivors, offset, limit)
+
+    def page(self, plan, books, after=None, size=200, filtered=None):
+        """Up to size positions following the keyset after, and the keyset to continue from
+
+        A keyset is (sort value of the last row returned, how many rows sharing
+        that value were returned); the sort value is the position itself for
+        catalog order. The returned keyset is None once the results run out.
+        Books appended between calls sort after the rows already handed out
+        among equals, so they never shift a page. filtered, if given, is
+        called for the positions passing the plan's filters in catalog order
+        (e.g. from a cache) when the page has to be cut from them.
+        """
+        value = self._sort_value(plan, books)
+        descending = plan.order_by is not None and plan.order_by.startswith("-")
+        if plan.source == "scan" and plan.order_by is None:
+            start = after[0] + 1 if after else 0
+            rows = list(range(start, min(len(books), start + size + 1)))
+        elif plan.source == "year-order":
+            check = self._residual(plan, books)
+            stream = self.years.ordered(descending, after[0] if after else None)
+            if check is not None:
+                stream = (pos for pos in stream if check(pos))
+            rows = []
+            for pos in self._after(stream, value, after, descending):
+                rows.append(pos)
+                if len(rows) > size:
+                    break
+        else:
+            if filtered is not None:
+                survivors = filtered()
+            else:
+                survivors = self.run(QueryPlan(plan.source, plan.estimate, plan.category, plan.needle,
+                                               plan.year_range, None), books)
+            if plan.order_by is None:
+                # Catalog order: positions are unique and ascending, so seek to the keyset
+                start = bisect_right(survivors, after[0]) if after else 0
+                rows = list(survivors[start:start + size + 1])
+            else:
+                remaining = self._after(survivors, value, after, descending)
+                select = nlargest if descending else nsmallest
+                rows = select(size + 1, remaining, key=value)
+        if len(rows) <= size:
+            return rows, None
+        rows = rows[:size]
+        last = value(rows[-1])
+        ties = sum(1 for pos in rows if value(pos) == last)
+        if after is not None and after[0] == last:
+            ties += after[1]
+        return rows, (last, ties)
+
+    def _sort_value(self, plan, books):
+        """Per-position sort value for the plan's ordering"""
+        if plan.order_by in ("year", "-year"):
+            return lambda pos: year_of(books[pos])
+        if plan.order_by in ("name", "-name"):
+            return self.trigrams.folded
+        return lambda pos: pos
+
+    @staticmethod
+    def _after(positions, value, after, descending):
+        """Positions (in catalog order within equal values) that sort after the keyset"""
+        if after is None:
+            yield from positions
+            return
+        last, skip = after
+        for pos in positions:
+            current = value(pos)
+            if current == last:
+                if skip:
+                    skip -= 1
+                    continue
+                yield pos
+            elif (current < last) if descending else (current > last):
+                yield pos
+
+    def _walk_years(self, plan, books, offset, limit):
+        """Follow the year index, stopping once the page is full"""
+        check = self._residual(plan, books)
+        wanted = None if limit is None else offset + limit
+        positions = []
+        for pos in self.years.ordered(plan.order_by == "-year"):
+            if check is None or check(pos):
+                positions.append(pos)
+                if wanted is not None and len(positions) >= wanted:
+                    break
+        return self._page(positions, offset, limit)
+
+    def _residual(self, plan, books):
+        """Predicate over positions for every filter the access path did not apply"""
+        checks = []
+        if plan.category is not None and plan.source != "category":
+            category = plan.category
+            checks.append(lambda pos: books[pos].get("category") == category)
+        if plan.needle is not None and plan.source != "text":
+            needle, folded = plan.needle, self.trigrams.folded
+            checks.append(lambda pos: needle in folded(pos))
+        if plan.year_range is not None and plan.source != "year":
+            year_from, year_to = plan.year_range
+            low = year_from if year_from is not None else float("-inf")
+            high = year_to if year_to is not None else float("inf")
+            checks.append(lambda pos: low <= year_of(books[pos]) <= high)
+        if not checks:
+            return None
+        if len(checks) == 1:
+            return checks[0]
+        return lambda pos: all(check(pos) for check in checks)
+
+    @staticmethod
+    def _page(positions, offset, limit):
+        if limit is None:
+            return positions[offset:] if offset else positions
+        return positions[offset:offset + limit]
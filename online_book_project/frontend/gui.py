@@ -2,9 +2,13 @@
 Frontend Module - Modern GUI for Saksham's Reading Room using Tkinter
 Professional minimalist design with sidebar and clean layout
 """
+import threading
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
 
+# Rows fetched per page; more are loaded as the table is scrolled
+PAGE_SIZE = 500
+
 
 class ModernLibraryGUI:
     """Modern professional GUI interface for Saksham's Reading Room"""
@@ -15,6 +19,11 @@ class ModernLibraryGUI:
         self.book_manager = book_manager
         self.storage = storage
         self.books = storage.get_books()
+        # Sort order picked in the sort dropdown (None until the user picks one)
+        self.view_order = None
+        # Query behind the tree and the cursor of its next unloaded page
+        self.view_query = {}
+        self.view_cursor = None
         
         # Setup window
         self.root.title("Saksham's Reading Room")
@@ -37,6 +46,12 @@ class ModernLibraryGUI:
         # Create UI
         self.create_ui()
         self.load_books()
+        
+        self.root.bind("<Control-z>", lambda event: self.undo())
+        self.root.bind("<Control-y>", lambda event: self.redo())
+        
+        # Write any debounced edits before the window goes away
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
     
     def create_ui(self):
         """Create the modern user interface"""
@@ -126,6 +141,16 @@ class ModernLibraryGUI:
         self.search_entry.bind("<FocusIn>", lambda e: self.search_entry.delete(0, tk.END) if self.search_entry.get() == "Search books..." else None)
         self.search_entry.bind("<FocusOut>", lambda e: self.search_entry.insert(0, "Search books...") if self.search_entry.get() == "" else None)
         self.search_var.trace_add("write", self.search_books)
+        
+        # Completion dropdown, shown under the search box while there are suggestions
+        self.suggestions = []
+        self.suggestion_box = tk.Listbox(self.root, font=("Arial", 10), activestyle="none",
+                                         highlightthickness=1, highlightbackground=self.colors["border"])
+        self.suggestion_box.bind("<Return>", self.apply_suggestion)
+        self.suggestion_box.bind("<Double-Button-1>", self.apply_suggestion)
+        self.suggestion_box.bind("<Escape>", lambda e: self.hide_suggestions())
+        self.search_entry.bind("<Down>", self.focus_suggestions)
+        self.search_entry.bind("<Escape>", lambda e: self.hide_suggestions())
 
         # New button (Primary action)
         new_btn = tk.Button(action_frame, text="+ New Book", font=("Arial", 10, "bold"),
@@ -228,11 +253,11 @@ class ModernLibraryGUI:
         self.tree.column("Category", width=120, anchor=tk.CENTER)
         
         # Scrollbar
-        scrollbar = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=self.tree.yview)
-        self.tree.configure(yscroll=scrollbar.set)
+        self.scrollbar = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscroll=self.on_tree_scroll)
         
         self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
         # Right-click context menu
         self.tree.bind("<Button-3>", self.show_context_menu)
@@ -257,6 +282,21 @@ class ModernLibraryGUI:
                              bg="#2ecc71", fg="white", border=0, padx=15, pady=6,
                              command=self.save_now)
         save_btn.pack(side=tk.LEFT, padx=(10, 0))
+        
+        undo_btn = tk.Button(bottom_bar, text="Undo", font=("Arial", 10),
+                             bg="#95a5a6", fg="white", border=0, padx=15, pady=6,
+                             command=self.undo)
+        undo_btn.pack(side=tk.LEFT, padx=(10, 0))
+        
+        redo_btn = tk.Button(bottom_bar, text="Redo", font=("Arial", 10),
+                             bg="#95a5a6", fg="white", border=0, padx=15, pady=6,
+                             command=self.redo)
+        redo_btn.pack(side=tk.LEFT, padx=(10, 0))
+        
+        stats_btn = tk.Button(bottom_bar, text="Statistics", font=("Arial", 10),
+                              bg="#8e44ad", fg="white", border=0, padx=15, pady=6,
+                              command=self.show_statistics)
+        stats_btn.pack(side=tk.LEFT, padx=(10, 0))
 
         # Status info
         self.status_label = tk.Label(bottom_bar, text="Ready", font=("Arial", 9),
@@ -267,14 +307,16 @@ class ModernLibraryGUI:
     
     def load_books(self):
         """Load books into the treeview"""
-        books = self.book_manager.get_all_books()
-        self.refresh_tree(books)
+        self.refresh_view()
     
     def refresh_tree(self, books_list):
         """Refresh the treeview with a list of books"""
         for item in self.tree.get_children():
             self.tree.delete(item)
-        
+        self.append_rows(books_list)
+    
+    def append_rows(self, books_list):
+        """Add books to the end of the treeview"""
         for book in books_list:
             self.tree.insert("", tk.END, values=(
                 book["name"], 
@@ -283,47 +325,99 @@ class ModernLibraryGUI:
                 book.get("category", "Novel")
             ))
     
+    def on_tree_scroll(self, first, last):
+        """Move the scrollbar and load the next page once the view nears the bottom"""
+        self.scrollbar.set(first, last)
+        if self.view_cursor is not None and float(last) > 0.9:
+            books, self.view_cursor = self.book_manager.page(self.view_query, self.view_cursor, PAGE_SIZE)
+            self.append_rows(books)
+    
+    def refresh_view(self):
+        """Show the first page of books matching the category filter, search box and sort order"""
+        category = self.category_var_filter.get() if hasattr(self, 'category_var_filter') else "All"
+        search_term = self.search_var.get()
+        if search_term == "Search books...":
+            search_term = ""
+        self.view_query = {"category": category, "text": search_term or None, "order_by": self.view_order}
+        books, self.view_cursor = self.book_manager.page(self.view_query, size=PAGE_SIZE)
+        self.refresh_tree(books)
+        return books
+    
     def filter_by_sidebar(self, category):
         """Filter books by sidebar category"""
-        if category == "All":
-            books = self.book_manager.get_all_books()
-            self.refresh_tree(books)
-        else:
-            filtered = self.book_manager.filter_by_category(category)
-            self.refresh_tree(filtered)
+        if hasattr(self, 'category_var_filter'):
+            self.category_var_filter.set(category)
+        self.refresh_view()
         self.status_label.config(text="Filtered by: {}".format(category))
     
     def search_books(self, *args):
         """Search books by name"""
         try:
             search_term = self.search_var.get()
+            filtered = self.refresh_view()
+            self.update_suggestions(search_term)
             if search_term and search_term != "Search books...":
-                filtered = self.book_manager.search_by_name(search_term)
-                self.refresh_tree(filtered)
-                self.status_label.config(text="Search: {} results".format(len(filtered)))
+                more = "+" if self.view_cursor is not None else ""
+                self.status_label.config(text="Search: {}{} results".format(len(filtered), more))
             else:
-                books = self.book_manager.get_all_books()
-                self.refresh_tree(books)
                 self.status_label.config(text="Ready")
         except tk.TclError:
             pass
     
+    def update_suggestions(self, term):
+        """Fill the dropdown under the search box with title and author completions of term"""
+        if not term or term == "Search books...":
+            self.hide_suggestions()
+            return
+        self.suggestions = self.book_manager.suggest(term)
+        if not self.suggestions:
+            self.hide_suggestions()
+            return
+        box = self.suggestion_box
+        box.delete(0, tk.END)
+        for text, kind, count in self.suggestions:
+            box.insert(tk.END, "{}  ({}, {} book{})".format(text, kind, count, "" if count == 1 else "s"))
+        box.config(height=len(self.suggestions))
+        box.place(in_=self.search_entry, relx=0, rely=1.0, relwidth=1.0, y=8)
+        box.lift()
+    
+    def hide_suggestions(self):
+        self.suggestion_box.place_forget()
+    
+    def focus_suggestions(self, event=None):
+        """Move keyboard focus from the search box into the dropdown"""
+        if self.suggestions and self.suggestion_box.winfo_ismapped():
+            self.suggestion_box.focus_set()
+            self.suggestion_box.selection_clear(0, tk.END)
+            self.suggestion_box.selection_set(0)
+            self.suggestion_box.activate(0)
+    
+    def apply_suggestion(self, event=None):
+        """Search for the chosen title, or list the chosen author's books"""
+        selection = self.suggestion_box.curselection()
+        if not selection:
+            return
+        text, kind, _ = self.suggestions[selection[0]]
+        if kind == "author":
+            books = self.book_manager.books_by_author(text)
+            self.view_cursor = None
+            self.refresh_tree(books)
+            self.status_label.config(text="Author: {} ({} books)".format(text, len(books)))
+        else:
+            self.search_var.set(text)
+        self.hide_suggestions()
+        self.search_entry.focus()
+    
     def sort_by_selection(self, event=None):
         """Sort books based on selection in sort combobox"""
         choice = self.sort_var.get()
         if choice == "Newest First":
-            sorted_books = self.book_manager.sort_by_date(descending=True)
+            self.view_order = "-year"
             self.status_label.config(text="Sorted by year (newest first)")
         else:
-            sorted_books = self.book_manager.sort_by_date(descending=False)
+            self.view_order = "year"
             self.status_label.config(text="Sorted by year (oldest first)")
-
-        cat = self.category_var_filter.get() if hasattr(self, 'category_var_filter') else "All"
-        if cat and cat != "All":
-            filtered = [b for b in sorted_books if b.get("category") == cat]
-            self.refresh_tree(filtered)
-        else:
-            self.refresh_tree(sorted_books)
+        self.refresh_view()
     
     def show_new_book_dialog(self):
         """Show dialog to add a new book using simple dialogs"""
@@ -514,10 +608,6 @@ class ModernLibraryGUI:
                         self.update_counter()
                         self.status_label.config(text="Added: {}".format(t))
                         messagebox.showinfo("Saved", "Added '{}'".format(t))
-                try:
-                    self.storage.save_data()
-                except Exception:
-                    pass
                 try:
                     self.search_var.set(t)
                     self.search_entry.focus()
@@ -668,11 +758,7 @@ class ModernLibraryGUI:
                 else:
                     messagebox.showerror("Error", "Failed to add '{}'".format(title))
 
-            # Persist to disk explicitly and focus search to show the book
-            try:
-                self.storage.save_data()
-            except Exception:
-                pass
+            # The manager already persisted the change; focus search to show the book
             try:
                 self.search_var.set(title)
                 self.search_entry.focus()
@@ -736,8 +822,80 @@ class ModernLibraryGUI:
         stats = self.book_manager.get_statistics()
         counter_text = "Total: {} | Novels: {} | Philosophy: {} | Poetry: {}".format(
             stats['total'], stats['novels'], stats['philosophy'], stats['poetry'])
+        # User-defined categories get counted too
+        for category, count in sorted(stats['categories'].items(), key=lambda item: str(item[0])):
+            if category not in ("Novel", "Philosophy", "Poetry"):
+                counter_text += " | {}: {}".format(category, count)
         self.counter_label.config(text=counter_text)
     
+    def undo(self):
+        """Revert the last change to the library"""
+        if self.book_manager.undo():
+            self.load_books()
+            self.update_counter()
+            self.status_label.config(text="Undone")
+        else:
+            self.status_label.config(text="Nothing to undo")
+    
+    def redo(self):
+        """Reapply the last undone change"""
+        if self.book_manager.redo():
+            self.load_books()
+            self.update_counter()
+            self.status_label.config(text="Redone")
+        else:
+            self.status_label.config(text="Nothing to redo")
+    
+    def show_statistics(self):
+        """Compute catalog analytics on a worker thread and open a window with them when done"""
+        analytics = self.book_manager.analytics()
+        result = {}
+        
+        def work():
+            try:
+                result["summary"] = analytics.summary()
+            except Exception as e:
+                result["error"] = e
+        
+        worker = threading.Thread(target=work, daemon=True)
+        worker.start()
+        self.status_label.config(text="Computing statistics...")
+        
+        def poll():
+            # Tk is not thread-safe: only the mainloop touches widgets
+            if worker.is_alive():
+                self.root.after(100, poll)
+            elif "error" in result:
+                self.status_label.config(text="Statistics error")
+                messagebox.showerror("Statistics Error", "Error computing statistics: {}".format(result["error"]))
+            else:
+                self.status_label.config(text="Ready")
+                self.show_statistics_window(result["summary"])
+        
+        poll()
+    
+    def show_statistics_window(self, summary):
+        """Window listing a CatalogAnalytics summary"""
+        lines = ["Books: {} ({} undated)".format(summary["total"], summary["undated"]),
+                 "Authors: {}".format(summary["authors"]),
+                 "Median year: {}".format(summary["median_year"]),
+                 "Percentiles: " + ", ".join("p{} {}".format(p, year) for p, year in summary["percentiles"].items()),
+                 "", "Books per decade:"]
+        lines += ["  {}s: {}".format(decade, count) for decade, count in summary["decades"].items()]
+        lines += ["", "Category by decade:"]
+        for category, row in summary["category_by_decade"].items():
+            lines.append("  {}: ".format(category) + ", ".join("{}s {}".format(d, c) for d, c in row.items()))
+        lines += ["", "Most prolific authors:"]
+        lines += ["  {} ({})".format(author, count) for author, count in summary["top_authors"]]
+        
+        window = tk.Toplevel(self.root)
+        window.title("Library Statistics")
+        window.geometry("520x520")
+        text = tk.Text(window, font=("Arial", 10), wrap=tk.WORD)
+        text.insert(tk.END, "\n".join(lines))
+        text.config(state=tk.DISABLED)
+        text.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+    
     def save_now(self):
         """Explicitly save current storage to disk"""
         try:
@@ -752,6 +910,16 @@ class ModernLibraryGUI:
             self.status_label.config(text="Save error")
             messagebox.showerror("Save Error", "Error saving: {}".format(e))
     
+    def on_close(self):
+        """Flush pending storage writes, then close the window"""
+        try:
+            if hasattr(self.storage, "flush"):
+                self.storage.flush()
+            # Lets the next start skip re-tokenizing the catalog
+            self.book_manager.save_search_index()
+        finally:
+            self.root.destroy()
+    
     def show_context_menu(self, event):
         """Show context menu on right-click"""
         item = self.tree.selection()
@@ -12,13 +12,19 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 from frontend.gui import ModernLibraryGUI
 from backend.book_manager import BookManager
 from storage.storage import BookStorage
+from storage.sqlite_storage import SQLiteBookStorage
 
 
 def main():
     """Initialize and run Saksham's Reading Room application"""
     
-    # Initialize storage
-    storage = BookStorage("media.json")
+    # Initialize storage (use the SQLite database once the library has been migrated)
+    if os.path.exists(os.path.join(os.path.dirname(os.path.abspath(__file__)), "media.db")):
+        storage = SQLiteBookStorage("media.db")
+    else:
+        # Column snapshot is memory-mapped, so startup skips parsing media.json;
+        # edits are coalesced into one write per half second
+        storage = BookStorage("media.json", columnar=True, max_delay=0.5, column_store=True)
     storage.load_data()
     
     # Initialize book manager with storage
@@ -229,11 +229,9 @@ class SimpleLibraryGUI:
             ))
         
         # Update info
+        stats = self.manager.get_statistics()
         self.info_label.config(text="Total Books: {} | Novels: {} | Philosophy: {} | Poetry: {}".format(
-            len(books),
-            len([b for b in books if b.get("category") == "Novel"]),
-            len([b for b in books if b.get("category") == "Philosophy"]),
-            len([b for b in books if b.get("category") == "Poetry"])
+            stats["total"], stats["novels"], stats["philosophy"], stats["poetry"]
         ))
 
 
@@ -0,0 +1,233 @@
+"""
+Compact Catalog Module - Struct-of-arrays book list for large libraries
+
+Instead of one dict per book, titles live in a single UTF-8 heap, years in an
+array('i') (clamped to its range, as the year index does), and authors/categories/dates are dictionary-encoded into
+array('I') ids pointing at one shared (interned) copy of each distinct value.
+Indexing returns a fresh plain dict, so callers that read book["name"] or
+book.get("category") keep working unchanged.
+
+Mutations hold the catalog's lock, and frozen() copies the columns under
+it, so a background save can serialize a consistent copy while the owner
+keeps editing (a heap repack rewrites every title offset at once).
+"""
+import threading
+from array import array
+from collections.abc import MutableSequence
+
+from storage.sqlite_storage import clamped_year
+
+MISSING = 0xFFFFFFFF
+# Name length marking a row stored verbatim in _extra (not column-encodable)
+RAW = 0xFFFFFFFF
+_ENCODED = ("author", "date", "category")
+_FIELDS = frozenset(("name",) + _ENCODED)
+
+
+class _Dictionary:
+    """Value <-> id mapping; one shared object per distinct value"""
+
+    __slots__ = ("values", "ids")
+
+    def __init__(self):
+        self.values = []
+        self.ids = {}
+
+    def encode(self, value):
+        # Key on the type too, so "1949" and 1949 stay distinct
+        key = (value.__class__, value)
+        value_id = self.ids.get(key)
+        if value_id is None:
+            value_id = self.ids[key] = len(self.values)
+            self.values.append(value)
+        return value_id
+
+
+class CompactCatalog(MutableSequence):
+    """List-like catalog that stores books column-wise"""
+
+    def __init__(self, books=()):
+        self._heap = bytearray()
+        self._name_start = array("Q")
+        self._name_len = array("I")
+        self.years = array("i")
+        self._ids = {field: array("I") for field in _ENCODED}
+        self._dicts = {field: _Dictionary() for field in _ENCODED}
+        # Per-row overflow: None, a dict of extra keys, or the whole book for RAW rows
+        self._extra = []
+        self._garbage = 0
+        self._lock = threading.RLock()
+        for book in books:
+            self.append(book)
+
+    def __len__(self):
+        return len(self._name_len)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        name_len = self._name_len[index]
+        if name_len == RAW:
+            return dict(self._extra[index])
+        start = self._name_start[index]
+        book = {"name": self._heap[start:start + name_len].decode("utf-8")}
+        for field in _ENCODED:
+            value_id = self._ids[field][index]
+            if value_id != MISSING:
+                book[field] = self._dicts[field].values[value_id]
+        extra = self._extra[index]
+        if extra:
+            book.update(extra)
+        return book
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __setitem__(self, index, book):
+        if isinstance(index, slice):
+            raise TypeError("CompactCatalog does not support slice assignment")
+        if index < 0:
+            index += len(self)
+        with self._lock:
+            # Release first: a heap repack must not drop the bytes about to be added
+            self._release(index)
+            row = self._encode(book)
+            self._name_start[index], self._name_len[index], self.years[index] = row[:3]
+            for field, value_id in zip(_ENCODED, row[3:6]):
+                self._ids[field][index] = value_id
+            self._extra[index] = row[6]
+
+    def __delitem__(self, index):
+        if isinstance(index, slice):
+            for i in sorted(range(*index.indices(len(self))), reverse=True):
+                del self[i]
+            return
+        if index < 0:
+            index += len(self)
+        with self._lock:
+            self._release(index)
+            for column in self._columns():
+                del column[index]
+
+    def insert(self, index, book):
+        with self._lock:
+            # Encode the whole row first; a column refusing its value leaves no partial row
+            row = self._encode(book)
+            size = len(self)
+            if index < 0:
+                index = max(0, index + size)
+            try:
+                for column, value in zip(self._columns(), row):
+                    column.insert(index, value)
+            except (OverflowError, TypeError):
+                for column in self._columns():
+                    if len(column) > size:
+                        del column[min(index, size)]
+                raise
+
+    def append(self, book):
+        with self._lock:
+            start, name_len, year, author_id, date_id, category_id, extra = self._encode(book)
+            size = len(self)
+            try:
+                self._name_start.append(start)
+                self._name_len.append(name_len)
+                self.years.append(year)
+                self._ids["author"].append(author_id)
+                self._ids["date"].append(date_id)
+                self._ids["category"].append(category_id)
+                self._extra.append(extra)
+            except (OverflowError, TypeError):
+                for column in self._columns():
+                    del column[size:]
+                raise
+
+    def frozen(self):
+        """A consistent copy for reading on another thread while this catalog keeps changing
+
+        The columns and heap are copied (the value dictionaries, which only
+        ever grow, are shared); the copy must not be mutated.
+        """
+        copy = CompactCatalog.__new__(CompactCatalog)
+        with self._lock:
+            copy._heap = bytes(self._heap)
+            copy._name_start = array("Q", self._name_start)
+            copy._name_len = array("I", self._name_len)
+            copy.years = array("i", self.years)
+            copy._ids = {field: array("I", column) for field, column in self._ids.items()}
+            copy._extra = list(self._extra)
+        copy._dicts = self._dicts
+        copy._garbage = 0
+        copy._lock = threading.RLock()
+        return copy
+
+    def column(self, field):
+        """Every row's value of field ("author", "date" or "category"; None where missing), without building dicts"""
+        values = self._dicts[field].values
+        column = [values[value_id] if value_id != MISSING else None for value_id in self._ids[field]]
+        for index, name_len in enumerate(self._name_len):
+            if name_len == RAW:
+                column[index] = self._extra[index].get(field)
+        return column
+
+    def __eq__(self, other):
+        try:
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        except TypeError:
+            return NotImplemented
+
+    def nbytes(self):
+        """Approximate bytes held by the columns and heap (excludes shared dictionary values)"""
+        total = len(self._heap) + 8 * len(self._extra)
+        for column in (self._name_start, self._name_len, self.years) + tuple(self._ids.values()):
+            total += column.itemsize * len(column)
+        return total
+
+    def _columns(self):
+        return (self._name_start, self._name_len, self.years,
+                self._ids["author"], self._ids["date"], self._ids["category"], self._extra)
+
+    def _encode(self, book):
+        """Turn a book dict into one value per column"""
+        if not isinstance(book, dict):
+            raise TypeError("CompactCatalog stores book dicts, got {!r}".format(type(book).__name__))
+        name = book.get("name")
+        try:
+            if not isinstance(name, str):
+                raise TypeError(name)
+            ids = [self._dicts[field].encode(book[field]) if field in book else MISSING
+                   for field in _ENCODED]
+        except TypeError:
+            # Non-string title or unhashable value: keep the row verbatim
+            return (0, RAW, clamped_year(book), MISSING, MISSING, MISSING, dict(book))
+        encoded = name.encode("utf-8")
+        start = len(self._heap)
+        self._heap += encoded
+        extra = None
+        if not book.keys() <= _FIELDS:
+            extra = {k: v for k, v in book.items() if k not in _FIELDS}
+        return (start, len(encoded), clamped_year(book), ids[0], ids[1], ids[2], extra)
+
+    def _release(self, index):
+        """Account for a title's heap bytes becoming garbage; repack when it dominates"""
+        name_len = self._name_len[index]
+        if name_len != RAW:
+            self._garbage += name_len
+        if self._garbage > 1024 * 1024 and self._garbage * 2 > len(self._heap):
+            self._repack(skip=index)
+
+    def _repack(self, skip):
+        """Rebuild the heap without unreferenced title bytes (skip is about to go away)"""
+        heap = bytearray()
+        for i in range(len(self)):
+            name_len = self._name_len[i]
+            if name_len == RAW or i == skip:
+                continue
+            start = self._name_start[i]
+            self._name_start[i] = len(heap)
+            heap += self._heap[start:start + name_len]
+        self._heap = heap
+        self._garbage = 0
@@ -0,0 +1,150 @@
+"""
+Export Module - Streaming writers for CSV, JSONL and pretty JSON
+Books are encoded one at a time and written in buffered chunks, so exporting
+a catalog of any size never holds more than one chunk of output in memory
+"""
+import csv
+import gzip
+import io
+import json
+import os
+import zlib
+
+from storage.sqlite_storage import BOOK_FIELDS
+
+FORMATS = ("csv", "jsonl", "json")
+# Encoded text gathered before each write
+BUFFER_SIZE = 256 * 1024
+
+_SCALARS = (str, int, float, bool, type(None))
+_encode = json.JSONEncoder(ensure_ascii=False).encode
+
+
+def format_for(path):
+    """Export format implied by a file name ("catalog.jsonl.gz" -> "jsonl"), or None"""
+    name = path.lower()
+    if name.endswith(".gz"):
+        name = name[:-3]
+    ext = os.path.splitext(name)[1].lstrip(".")
+    return ext if ext in FORMATS else None
+
+
+def pretty_record(book):
+    """book as an element of an indent=4 JSON array, byte-identical to json.dumps(books, indent=4)"""
+    if type(book) is dict and book and all(type(key) is str and type(value) in _SCALARS
+                                           for key, value in book.items()):
+        # Flat records (every book the library writes) skip the pure-Python indenting encoder
+        return "    {\n" + ",\n".join("        " + _encode(key) + ": " + _encode(value)
+                                     for key, value in book.items()) + "\n    }"
+    return "    " + json.dumps(book, indent=4, ensure_ascii=False).replace("\n", "\n    ")
+
+
+def iter_json(books):
+    """Text pieces of books as a pretty-printed JSON array (the media.json layout)"""
+    first = True
+    for book in books:
+        yield ("[\n" if first else ",\n") + pretty_record(book)
+        first = False
+    yield "[]" if first else "\n]"
+
+
+def iter_jsonl(books):
+    """Text pieces of books as one compact JSON object per line"""
+    for book in books:
+        yield json.dumps(book, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+def iter_csv(books, fields=BOOK_FIELDS):
+    """Text pieces of books as CSV with a header row; keys outside fields are left out"""
+    line = io.StringIO()
+    writer = csv.DictWriter(line, fields, extrasaction="ignore", lineterminator="\n")
+    writer.writeheader()
+    for book in books:
+        writer.writerow(book)
+        if line.tell() >= BUFFER_SIZE:
+            yield line.getvalue()
+            line.seek(0)
+            line.truncate()
+    yield line.getvalue()
+
+
+def iter_export(books, fmt, fields=BOOK_FIELDS):
+    """Text pieces of books in fmt ("csv", "jsonl" or "json")"""
+    if fmt == "csv":
+        return iter_csv(books, fields)
+    if fmt == "jsonl":
+        return iter_jsonl(books)
+    if fmt == "json":
+        return iter_json(books)
+    raise ValueError("export format must be one of {}".format(FORMATS))
+
+
+def iter_chunks(pieces, size=BUFFER_SIZE):
+    """UTF-8 chunks of about size bytes joined from text pieces"""
+    buffered = []
+    length = 0
+    for piece in pieces:
+        buffered.append(piece)
+        length += len(piece)
+        if length >= size:
+            yield "".join(buffered).encode("utf-8")
+            buffered = []
+            length = 0
+    if buffered:
+        yield "".join(buffered).encode("utf-8")
+
+
+class _Counted:
+    """Iterate books while counting them"""
+
+    def __init__(self, books):
+        self.books = books
+        self.count = 0
+
+    def __iter__(self):
+        for book in self.books:
+            self.count += 1
+            yield book
+
+
+def write_chunks(path, chunks, compress=False, fsync=False):
+    """Write byte chunks to path atomically (temp file + rename); returns their CRC-32
+
+    compress=True gzips the output. A failed write leaves any existing file
+    untouched and raises OSError.
+    """
+    tmp_path = path + ".tmp"
+    crc = 0
+    try:
+        with open(tmp_path, 'wb') as raw:
+            # mtime=0 keeps the gzip header, and so the file, reproducible
+            f = gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6, mtime=0) if compress else raw
+            for chunk in chunks:
+                crc = zlib.crc32(chunk, crc)
+                f.write(chunk)
+            if compress:
+                f.close()
+            if fsync:
+                raw.flush()
+                os.fsync(raw.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return crc
+
+
+def export_books(books, path, fmt=None, compress=None, fields=BOOK_FIELDS):
+    """Stream books (any iterable) to path; returns the number written
+
+    fmt defaults to the file extension and compress to whether path ends in
+    ".gz". Raises ValueError for an unknown format and OSError if the file
+    cannot be written.
+    """
+    fmt = fmt or format_for(path)
+    if compress is None:
+        compress = path.lower().endswith(".gz")
+    counted = _Counted(books)
+    write_chunks(path, iter_chunks(iter_export(counted, fmt, fields)), compress)
+    return counted.count
@@ -0,0 +1,172 @@
+"""
+JSON Stream Module - Incremental reader for a top-level JSON array
+Yields one element at a time so huge media.json files load in bounded memory
+"""
+import codecs
+import json
+import re
+import zlib
+
+CHUNK_SIZE = 256 * 1024
+
+# Characters the resync scanner cares about outside / inside a string
+_STRUCTURAL = re.compile(r'["\[\]{},]')
+_STRING_SPECIAL = re.compile(r'["\\]')
+_SEPARATORS = re.compile(r'[\s,]*')
+_WHITESPACE = re.compile(r'\s*')
+_OPENER = {"]": "[", "}": "{"}
+
+_decoder = json.JSONDecoder()
+
+
+class MalformedRecord(ValueError):
+    """A record that could not be parsed; offset is its byte position in the file"""
+
+    def __init__(self, offset, message):
+        super().__init__("byte {}: {}".format(offset, message))
+        self.offset = offset
+
+
+def _scan_element(text, start):
+    """Return the end of the element starting at start, or None if text ends first
+
+    Only used to step over records json cannot decode: it tracks strings and
+    a stack of open brackets to find where the broken record stops. A closer
+    that does not match the innermost opener closes back to its own opener
+    (or, with none open, the whole element), so a mismatch like {"x": [1,2}
+    ends the element there instead of swallowing the records after it.
+    """
+    stack = []
+    pos = start
+    while True:
+        m = _STRUCTURAL.search(text, pos)
+        if m is None:
+            return None
+        ch = m.group()
+        if ch == '"':
+            pos = m.end()
+            while True:
+                s = _STRING_SPECIAL.search(text, pos)
+                if s is None:
+                    return None
+                if s.group() == "\\":
+                    pos = s.end() + 1
+                    continue
+                pos = s.end()
+                break
+            if not stack:
+                return pos
+        elif ch in "[{":
+            stack.append(ch)
+            pos = m.end()
+        elif ch in "]}":
+            if not stack:
+                # Closing bracket of the outer array ends a scalar element
+                return m.start()
+            opener = _OPENER[ch]
+            if opener in stack:
+                del stack[len(stack) - 1 - stack[::-1].index(opener):]
+            else:
+                del stack[:]
+            pos = m.end()
+            if not stack:
+                return pos
+        else:
+            if not stack:
+                return m.start()
+            pos = m.end()
+
+
+class JSONArrayReader:
+    """Iterate the elements of a top-level JSON array read from a binary file
+
+    Records are decoded one at a time with JSONDecoder.raw_decode over a sliding
+    text window, so memory stays proportional to one chunk plus one record.
+    Records that fail to decode are passed to on_error(MalformedRecord) and
+    skipped. crc holds the CRC-32 of every byte read so far.
+    """
+
+    def __init__(self, f, on_error=None, chunk_size=CHUNK_SIZE):
+        self.f = f
+        self.on_error = on_error
+        self.chunk_size = chunk_size
+        self.crc = 0
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._text = ""
+        # File byte offset of self._text[0]
+        self._base = 0
+        self._eof = False
+
+    def __iter__(self):
+        self._fill(0)
+        pos = _WHITESPACE.match(self._text, 0).end()
+        while pos >= len(self._text) and self._fill(pos):
+            pos = _WHITESPACE.match(self._text, 0).end()
+        if self._text[pos:pos + 1] != "[":
+            raise ValueError("media file does not contain a JSON array")
+        pos += 1
+        while True:
+            pos = _SEPARATORS.match(self._text, pos).end()
+            if pos >= len(self._text):
+                if self._fill(pos):
+                    pos = 0
+                    continue
+                self._report(pos, "unexpected end of file (missing ']')")
+                return
+            if self._text[pos] == "]":
+                self._drain()
+                return
+            try:
+                record, end = _decoder.raw_decode(self._text, pos)
+            except ValueError as e:
+                end = _scan_element(self._text, pos)
+                if end is None:
+                    # Record runs past the window: read more and retry
+                    if self._fill(pos):
+                        pos = 0
+                        continue
+                    self._report(pos, "unterminated record at end of file")
+                    return
+                self._report(pos, getattr(e, "msg", str(e)) if end > pos else "unexpected {!r}".format(self._text[pos]))
+                pos = max(end, pos + 1)
+                continue
+            if end >= len(self._text) and not self._eof:
+                # A number cut off by the chunk boundary would decode short
+                if self._fill(pos):
+                    pos = 0
+                    continue
+            yield record
+            pos = end
+
+    def _report(self, pos, message):
+        """Hand a malformed record to the error callback"""
+        if self.on_error is not None:
+            offset = self._base + len(self._text[:pos].encode("utf-8"))
+            self.on_error(MalformedRecord(offset, message))
+
+    def _fill(self, keep_from):
+        """Drop text before keep_from and read one more chunk; False at end of file"""
+        if self._eof:
+            return False
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            # Positions into the window stay valid when nothing more arrives
+            self._eof = True
+            self._text += self._utf8.decode(b"", final=True)
+            return False
+        consumed = self._text[:keep_from]
+        if consumed:
+            self._base += len(consumed.encode("utf-8"))
+        self.crc = zlib.crc32(chunk, self.crc)
+        self._text = self._text[keep_from:] + self._utf8.decode(chunk)
+        return True
+
+    def _drain(self):
+        """Read the rest of the file so crc covers all of it"""
+        while self._fill(len(self._text)):
+            pass
+
+
+def iter_json_array(f, on_error=None):
+    """Yield the elements of the JSON array in binary file f one at a time"""
+    return iter(JSONArrayReader(f, on_error))
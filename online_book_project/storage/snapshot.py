@@ -0,0 +1,204 @@
+"""
+Snapshot Module - Memory-mapped columnar copy of media.json for instant startup
+
+Layout (native byte order, every section 8-byte aligned):
+    header      magic, byte-order mark, row count, source file identity (size,
+                mtime_ns, inode, crc), section offsets
+    year        int32[n]     parsed publication year (0 if invalid)
+    name        uint64[n+1]  offsets of each title in the string heap
+    author      uint32[n]    ids into the author dictionary
+    category    uint32[n]    ids into the category dictionary
+    date        uint32[n]    ids into the date dictionary (raw values keep str/int)
+    dictionaries            for each of author/category/date: uint64[k+1] heap offsets
+    heap                    UTF-8 strings; dictionary entries are JSON-encoded
+"""
+import json
+import mmap
+import os
+import struct
+from array import array
+
+from storage.sqlite_storage import year_of
+
+MAGIC = b"BKCOL001"
+BYTE_ORDER_MARK = 0x01020304
+MISSING = 0xFFFFFFFF
+SNAPSHOT_FIELDS = frozenset(("name", "author", "date", "category"))
+
+# magic, bom, rows, source size, mtime_ns, inode, crc, 9 section offsets
+_HEADER = struct.Struct("=8sIQQQQI9Q4x")
+_ENCODED = ("author", "category", "date")
+
+
+def _pad(buf):
+    """Pad a bytearray to the next 8-byte boundary"""
+    buf.extend(b"\0" * (-len(buf) % 8))
+
+
+def source_identity(source_path):
+    """(size, mtime_ns, inode) of the JSON file a snapshot was built from"""
+    st = os.stat(source_path)
+    return st.st_size, st.st_mtime_ns, st.st_ino
+
+
+def write_snapshot(path, books, source_identity, source_crc):
+    """Write books as a columnar snapshot of a JSON file with the given identity
+
+    Returns False (and writes nothing) if a book cannot be represented exactly,
+    e.g. it carries extra keys; the JSON file stays the source of truth.
+    """
+    n = len(books)
+    years = array("i")
+    name_offsets = array("Q", [0])
+    heap = bytearray()
+    ids = {field: array("I") for field in _ENCODED}
+    # (type, value) -> id, so "1949" and 1949 get separate entries
+    dictionaries = {field: {} for field in _ENCODED}
+    for book in books:
+        if not isinstance(book, dict) or not isinstance(book.get("name"), str) \
+                or not book.keys() <= SNAPSHOT_FIELDS:
+            return False
+        year = year_of(book)
+        if not -2 ** 31 <= year < 2 ** 31:
+            return False
+        years.append(year)
+        heap += book["name"].encode("utf-8")
+        name_offsets.append(len(heap))
+        for field in _ENCODED:
+            if field not in book:
+                ids[field].append(MISSING)
+                continue
+            value = book[field]
+            key = (value.__class__, value)
+            dictionary = dictionaries[field]
+            try:
+                value_id = dictionary.get(key)
+            except TypeError:
+                # Unhashable value such as a list
+                return False
+            if value_id is None:
+                value_id = dictionary[key] = len(dictionary)
+            ids[field].append(value_id)
+
+    dict_offsets = {}
+    for field in _ENCODED:
+        offsets = array("Q", [len(heap)])
+        for _, value in dictionaries[field]:
+            heap += json.dumps(value, ensure_ascii=False).encode("utf-8")
+            offsets.append(len(heap))
+        dict_offsets[field] = offsets
+
+    body = bytearray()
+    sections = []
+    for column in (years, name_offsets, ids["author"], ids["category"], ids["date"],
+                   dict_offsets["author"], dict_offsets["category"], dict_offsets["date"]):
+        sections.append(_HEADER.size + len(body))
+        body += column.tobytes()
+        _pad(body)
+    sections.append(_HEADER.size + len(body))
+    body += heap
+
+    header = _HEADER.pack(MAGIC, BYTE_ORDER_MARK, n, *source_identity, source_crc, *sections)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(body)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return True
+
+
+class MappedCatalog:
+    """Read-only, list-like view of a snapshot file served straight from mmap
+
+    Opening only maps the file; each row access decodes a fresh book dict and
+    nothing per row is kept. Column accessors (years, category_ids) read
+    without building dicts.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            fields = _HEADER.unpack_from(self._mm, 0)
+        except struct.error:
+            self._mm.close()
+            raise ValueError("truncated snapshot")
+        magic, bom, n = fields[:3]
+        if magic != MAGIC or bom != BYTE_ORDER_MARK:
+            self._mm.close()
+            raise ValueError("not a snapshot for this platform")
+        self.source_identity = tuple(fields[3:6])
+        self.source_crc = fields[6]
+        self._n = n
+        view = memoryview(self._mm)
+        s = fields[7:]
+        self.years = view[s[0]:s[1]].cast("i")[:n]
+        self._name_offsets = view[s[1]:s[2]].cast("Q")[:n + 1]
+        self._ids = {
+            "author": view[s[2]:s[3]].cast("I")[:n],
+            "category": view[s[3]:s[4]].cast("I")[:n],
+            "date": view[s[4]:s[5]].cast("I")[:n],
+        }
+        self.category_ids = self._ids["category"]
+        self._dict_offsets = {
+            "author": view[s[5]:s[6]].cast("Q"),
+            "category": view[s[6]:s[7]].cast("Q"),
+            "date": view[s[7]:s[8]].cast("Q"),
+        }
+        self._heap = s[8]
+        self._values = {field: {} for field in _ENCODED}
+
+    def __len__(self):
+        return self._n
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._n))]
+        if index < 0:
+            index += self._n
+        if not 0 <= index < self._n:
+            raise IndexError("catalog index out of range")
+        return self._build(index)
+
+    def __iter__(self):
+        for i in range(self._n):
+            yield self[i]
+
+    def __eq__(self, other):
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    def category_value(self, category_id):
+        """Decode one category dictionary id (None for a missing category)"""
+        return self._value("category", category_id)
+
+    def close(self):
+        """Release the mapping (rows already returned stay usable)"""
+        for column in (self.years, self._name_offsets, self.category_ids,
+                       *self._ids.values(), *self._dict_offsets.values()):
+            column.release()
+        self._mm.close()
+
+    def _string(self, start, end):
+        """Decode a heap slice"""
+        return self._mm[self._heap + start:self._heap + end].decode("utf-8")
+
+    def _value(self, field, value_id):
+        """Decode (and cache) a dictionary entry"""
+        if value_id == MISSING:
+            return None
+        cache = self._values[field]
+        if value_id not in cache:
+            offsets = self._dict_offsets[field]
+            cache[value_id] = json.loads(self._string(offsets[value_id], offsets[value_id + 1]))
+        return cache[value_id]
+
+    def _build(self, index):
+        """Materialize the dict for one row"""
+        book = {"name": self._string(self._name_offsets[index], self._name_offsets[index + 1])}
+        for field in ("author", "date", "category"):
+            value_id = self._ids[field][index]
+            if value_id != MISSING:
+                book[field] = self._value(field, value_id)
+        return book
@@ -0,0 +1,412 @@
+"""
+SQLite Storage Module - Indexed persistence for large libraries
+Drop-in replacement for BookStorage backed by the stdlib sqlite3 module
+"""
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+
+BOOK_FIELDS = ("name", "author", "date", "category")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS books (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    author TEXT,
+    date,
+    category TEXT,
+    year INTEGER NOT NULL DEFAULT 0,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_books_name ON books(name);
+CREATE INDEX IF NOT EXISTS idx_books_author ON books(author);
+CREATE INDEX IF NOT EXISTS idx_books_category ON books(category);
+CREATE INDEX IF NOT EXISTS idx_books_year ON books(year);
+"""
+
+
+def year_of(book):
+    """Parse a book's year the same way BookManager.sort_by_date does (0 if invalid)"""
+    try:
+        return int(book.get("date") or 0)
+    except Exception:
+        return 0
+
+
+# Largest year magnitude kept by the int32 year columns and the packed year index keys
+YEAR_LIMIT = (1 << 31) - 1
+
+
+def clamped_year(book):
+    """year_of(book), clamped to +-YEAR_LIMIT (dates like "20000000000" stay sortable)"""
+    return max(-YEAR_LIMIT, min(year_of(book), YEAR_LIMIT))
+
+
+def _to_row(book):
+    """Flatten a book dict into a books table row"""
+    extra = {k: v for k, v in book.items() if k not in BOOK_FIELDS}
+    return (book["name"], book.get("author"), book.get("date"), book.get("category"),
+            year_of(book), json.dumps(extra, ensure_ascii=False) if extra else None)
+
+
+def _to_book(row):
+    """Rebuild a book dict from a (name, author, date, category, extra) row"""
+    book = {"name": row[0], "author": row[1], "date": row[2]}
+    if row[3] is not None:
+        book["category"] = row[3]
+    if row[4]:
+        book.update(json.loads(row[4]))
+    return book
+
+
+class SQLiteBookStorage:
+    """Handle loading and saving book data to an indexed SQLite database"""
+
+    def __init__(self, data_file="media.db"):
+        """Initialize storage with path to database file"""
+        # Resolve relative paths to project root so reads/writes are consistent
+        if not os.path.isabs(data_file):
+            project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+            self.data_file = os.path.join(project_root, data_file)
+        else:
+            self.data_file = data_file
+        self.conn = None
+        # Materialized lazily by get_books(); ids run parallel to books
+        self.books = None
+        self._ids = None
+        self._needs_snapshot = False
+        self._data_version = None
+        # Bumped whenever the cached list is replaced, so indexes know to rebuild
+        self.generation = 0
+        # True inside batch(): mutations share one transaction
+        self._in_batch = False
+
+    def load_data(self, force=False):
+        """Open the database; rows are read lazily on first access
+
+        Cached rows are kept unless another connection changed the database
+        (PRAGMA data_version) or force=True.
+        """
+        existed = os.path.exists(self.data_file)
+        try:
+            if self.conn is not None and not force and not self._needs_snapshot:
+                version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+                if version == self._data_version:
+                    return existed
+            if self.conn is None:
+                self.conn = sqlite3.connect(self.data_file, check_same_thread=False)
+                # Python-side lowercasing keeps search semantics identical to str.lower()
+                self.conn.create_function("py_lower", 1, lambda s: s.lower() if s is not None else None)
+                self.conn.executescript(_SCHEMA)
+            self._data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+            self.generation += 1
+            self.books = None
+            self._ids = None
+            self._needs_snapshot = False
+            return existed
+        except Exception as e:
+            print(f"Error loading data: {e}")
+            self.books = []
+            self._ids = []
+            return False
+
+    def save_data(self):
+        """Commit pending changes; a list given to set_books() replaces the table"""
+        try:
+            self._connect()
+            books = self.books
+            if books is not None and (self._needs_snapshot or len(books) != len(self._ids)):
+                with self._transaction():
+                    self.conn.execute("DELETE FROM books")
+                    self.conn.executemany(
+                        "INSERT INTO books (name, author, date, category, year, extra) VALUES (?, ?, ?, ?, ?, ?)",
+                        (_to_row(b) for b in books))
+                self.books = None
+                self._ids = None
+                self._needs_snapshot = False
+            else:
+                self.conn.commit()
+            return True
+        except Exception as e:
+            print(f"Error saving data: {e}")
+            return False
+
+    def flush(self):
+        """Mutations are committed as they happen; kept for BookStorage parity"""
+        return self.save_data()
+
+    def state_token(self):
+        """(mtime_ns, size, inode) of the database while nothing is pending, else None"""
+        if self._needs_snapshot or self._in_batch or (self.conn is not None and self.conn.in_transaction):
+            return None
+        try:
+            st = os.stat(self.data_file)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size, st.st_ino
+
+    def get_books(self):
+        """Return all books (materialized from the database on first call)"""
+        if self.books is None:
+            self._connect()
+            rows = self.conn.execute(
+                "SELECT id, name, author, date, category, extra FROM books ORDER BY id").fetchall()
+            self._ids = [r[0] for r in rows]
+            self.books = [_to_book(r[1:]) for r in rows]
+        return self.books
+
+    def set_books(self, books):
+        """Update books list (written to the database by save_data)"""
+        self.get_books()
+        self.books = books
+        self.generation += 1
+        self._needs_snapshot = True
+
+    def append_book(self, book):
+        """Insert a book and persist the change"""
+        self.get_books()
+        try:
+            with self._transaction():
+                cur = self.conn.execute(
+                    "INSERT INTO books (name, author, date, category, year, extra) VALUES (?, ?, ?, ?, ?, ?)",
+                    _to_row(book))
+        except Exception as e:
+            print(f"Error saving data: {e}")
+            return False
+        self.books.append(book)
+        self._ids.append(cur.lastrowid)
+        return True
+
+    def replace_at(self, index, book):
+        """Replace the book at index and persist the change"""
+        self.get_books()
+        try:
+            with self._transaction():
+                self.conn.execute(
+                    "UPDATE books SET name = ?, author = ?, date = ?, category = ?, year = ?, extra = ? WHERE id = ?",
+                    _to_row(book) + (self._ids[index],))
+        except Exception as e:
+            print(f"Error saving data: {e}")
+            return False
+        self.books[index] = book
+        return True
+
+    def remove_at(self, index):
+        """Remove the book at index and persist the change"""
+        self.get_books()
+        try:
+            with self._transaction():
+                self.conn.execute("DELETE FROM books WHERE id = ?", (self._ids[index],))
+        except Exception as e:
+            print(f"Error saving data: {e}")
+            return False
+        del self.books[index]
+        del self._ids[index]
+        return True
+
+    def swap_remove(self, index):
+        """Remove the book at index by moving the last row into its slot (keeps id order)"""
+        self.get_books()
+        last = len(self.books) - 1
+        if index < 0 or index > last:
+            raise IndexError(index)
+        try:
+            with self._transaction():
+                self.conn.execute("DELETE FROM books WHERE id = ?", (self._ids[index],))
+                if index != last:
+                    self.conn.execute("UPDATE books SET id = ? WHERE id = ?", (self._ids[index], self._ids[last]))
+        except Exception as e:
+            print(f"Error saving data: {e}")
+            return False
+        if index != last:
+            self.books[index] = self.books[last]
+        self.books.pop()
+        self._ids.pop()
+        return True
+
+    @contextmanager
+    def batch(self):
+        """Group mutations into one transaction, committed when the block ends
+
+        If the block raises, or the commit fails, the transaction is rolled back
+        and the cached rows are dropped (re-read on next access); a failed
+        commit raises OSError. Nested batches join the outermost one.
+        """
+        if self._in_batch:
+            yield
+            return
+        self.get_books()
+        self._in_batch = True
+        try:
+            yield
+        except BaseException:
+            self._abort_batch()
+            raise
+        finally:
+            self._in_batch = False
+        if not self.save_data():
+            self._abort_batch()
+            raise OSError("could not commit batch")
+
+    def select_books(self, name=None, category=None, text=None, descending=None,
+                     year_from=None, year_to=None, limit=None, order_by=None, offset=0):
+        """Run a filtered/sorted query in SQL using the column indexes
+
+        name is an exact match, category an exact match, text a case-insensitive
+        substring of the name; year_from/year_to bound the parsed year
+        (inclusive); descending=True/False orders by year, or order_by takes
+        "year", "-year", "name" or "-name"; limit/offset page the rows.
+        """
+        return list(self.iter_select(name, category, text, descending, year_from, year_to,
+                                     limit, order_by, offset))
+
+    def iter_select(self, name=None, category=None, text=None, descending=None,
+                    year_from=None, year_to=None, limit=None, order_by=None, offset=0):
+        """select_books() as a generator, fetching rows from the cursor as they are consumed"""
+        self._connect()
+        clauses, params = self._filters(name, category, text, year_from, year_to)
+        sql = "SELECT name, author, date, category, extra FROM books"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        if order_by is None and descending is not None:
+            order_by = "-year" if descending else "year"
+        if order_by in ("name", "-name"):
+            sql += " ORDER BY py_lower(name) {}, id".format("DESC" if order_by == "-name" else "ASC")
+        elif order_by in ("year", "-year"):
+            # id as tiebreaker keeps the stable order of Python's sorted()
+            sql += " ORDER BY year {}, id".format("DESC" if order_by == "-year" else "ASC")
+        else:
+            sql += " ORDER BY id"
+        if limit is not None or offset:
+            sql += " LIMIT ? OFFSET ?"
+            params.extend((-1 if limit is None else limit, offset))
+        for row in self.conn.execute(sql, params):
+            yield _to_book(row)
+
+    def page_books(self, category=None, text=None, year_from=None, year_to=None, order_by=None,
+                   after=None, size=200):
+        """Up to size books following the keyset after, and the keyset to continue from
+
+        Filters and order_by are those of select_books. A keyset is (sort
+        value, id) of the last row handed out, the sort value being the
+        lowercased title, the year, or None for catalog order; the returned
+        one is None once the rows run out. Each page is one LIMIT query
+        seeking past the keyset, so it never reads the rows before it.
+        """
+        self._connect()
+        clauses, params = self._filters(None, category, text, year_from, year_to)
+        column = {"name": "py_lower(name)", "year": "year"}.get((order_by or "").lstrip("-"))
+        direction = "DESC" if order_by and order_by.startswith("-") else "ASC"
+        if after is not None:
+            value, last_id = after
+            if column is None:
+                clauses.append("id > ?")
+                params.append(last_id)
+            else:
+                # Ties are in id order whichever way the sort value runs
+                beyond = "<" if direction == "DESC" else ">"
+                clauses.append("({0} {1} ? OR ({0} = ? AND id > ?))".format(column, beyond))
+                params.extend((value, value, last_id))
+        sql = "SELECT id, {}, name, author, date, category, extra FROM books".format(column or "NULL")
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        if column is None:
+            sql += " ORDER BY id"
+        else:
+            sql += " ORDER BY {} {}, id".format(column, direction)
+        sql += " LIMIT ?"
+        params.append(size + 1)
+        rows = self.conn.execute(sql, params).fetchall()
+        books = [_to_book(row[2:]) for row in rows[:size]]
+        if len(rows) <= size:
+            return books, None
+        return books, (rows[size - 1][1], rows[size - 1][0])
+
+    def export_books(self, path, fmt=None, compress=None, fields=BOOK_FIELDS):
+        """Stream the catalog to a CSV, JSONL or JSON file (see storage.export); returns the number written"""
+        # Imported here: storage.export itself imports this module
+        from storage.export import export_books
+        if self.books is not None and self._needs_snapshot:
+            # set_books() was not saved yet, so the table is stale
+            return export_books(self.books, path, fmt, compress, fields)
+        return export_books(self.iter_select(), path, fmt, compress, fields)
+
+    def count_books(self, category=None):
+        """Count books, optionally within one category"""
+        self._connect()
+        if category is None:
+            return self.conn.execute("SELECT COUNT(*) FROM books").fetchone()[0]
+        return self.conn.execute("SELECT COUNT(*) FROM books WHERE category = ?", (category,)).fetchone()[0]
+
+    def count_by_category(self):
+        """{category: number of books} for every category present"""
+        self._connect()
+        return dict(self.conn.execute(
+            "SELECT category, COUNT(*) FROM books WHERE category IS NOT NULL GROUP BY category"))
+
+    def import_json(self, json_file):
+        """One-shot migration: replace the table with the books in a media.json file"""
+        with open(json_file, 'r', encoding='utf-8') as f:
+            books = json.load(f)
+        self.set_books(books)
+        return self.save_data()
+
+    def close(self):
+        """Close the database connection"""
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    @staticmethod
+    def _filters(name, category, text, year_from, year_to):
+        """(WHERE clauses, parameters) for the select_books filters"""
+        clauses, params = [], []
+        if name is not None:
+            clauses.append("name = ?")
+            params.append(name)
+        if category is not None:
+            clauses.append("category = ?")
+            params.append(category)
+        if text:
+            clauses.append("instr(py_lower(name), ?) > 0")
+            params.append(text.lower())
+        if year_from is not None:
+            clauses.append("year >= ?")
+            params.append(year_from)
+        if year_to is not None:
+            clauses.append("year <= ?")
+            params.append(year_to)
+        return clauses, params
+
+    def _abort_batch(self):
+        """Roll back the batch transaction and forget rows cached from it"""
+        self.conn.rollback()
+        self.books = None
+        self._ids = None
+        self._needs_snapshot = False
+        self.generation += 1
+
+    @contextmanager
+    def _transaction(self):
+        """Commit a mutation's statements at once, or leave them to the enclosing batch"""
+        if self._in_batch:
+            yield
+        else:
+            with self.conn:
+                yield
+
+    def _connect(self):
+        """Open the connection on first use"""
+        if self.conn is None:
+            self.load_data()
+
+
+def migrate_json_to_sqlite(json_file, db_file):
+    """Create (or overwrite) db_file with the contents of json_file"""
+    storage = SQLiteBookStorage(db_file)
+    storage.load_data()
+    ok = storage.import_json(json_file)
+    count = storage.count_books()
+    storage.close()
+    return count if ok else None
@@ -0,0 +1,75 @@
+"""
+Export the library, or any query over it, to CSV, JSONL or pretty JSON
+
+    python tools/export_catalog.py out.csv [--data media.json] [--category Novel] [--order-by=-year]
+    python tools/export_catalog.py out.jsonl.gz --search war --year-from 1800 --year-to 1900
+
+Books are streamed through a generator and written in buffered chunks, so
+memory stays flat however large the catalog is. The format comes from the
+file extension unless --format is given; a ".gz" suffix (or --gzip)
+compresses the output. Without filters or ordering the data file is
+streamed as is, without loading it.
+"""
+import argparse
+import os
+import sys
+import time
+
+# Make sure project root is importable
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, '..'))
+sys.path.insert(0, PROJECT_ROOT)
+
+from backend.book_manager import BookManager
+from backend.query import ORDERINGS
+from storage.export import FORMATS, format_for
+from storage.sqlite_storage import BOOK_FIELDS, SQLiteBookStorage
+from storage.storage import BookStorage
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the library to CSV, JSONL or JSON")
+    parser.add_argument("output", help="file to write (.csv, .jsonl or .json, optionally + .gz)")
+    parser.add_argument("--data", default=os.path.join(PROJECT_ROOT, "media.json"),
+                        help="library to export (media.json, or a .db SQLite file)")
+    parser.add_argument("--format", choices=FORMATS, help="default: from the output file extension")
+    parser.add_argument("--gzip", action="store_true", help="compress even without a .gz suffix")
+    parser.add_argument("--category")
+    parser.add_argument("--search", help="substring of the title")
+    parser.add_argument("--year-from", type=int)
+    parser.add_argument("--year-to", type=int)
+    parser.add_argument("--order-by", choices=[o for o in ORDERINGS if o])
+    parser.add_argument("--fields", default=",".join(BOOK_FIELDS), help="CSV columns, comma separated")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or format_for(args.output)
+    if fmt is None:
+        parser.error("cannot tell the format from {}; pass --format".format(args.output))
+    compress = args.gzip or args.output.lower().endswith(".gz")
+    fields = [field.strip() for field in args.fields.split(",") if field.strip()]
+    year_range = None
+    if args.year_from is not None or args.year_to is not None:
+        year_range = (args.year_from, args.year_to)
+    filtered = args.category or args.search or year_range or args.order_by
+
+    storage = SQLiteBookStorage(args.data) if args.data.endswith(".db") else BookStorage(args.data)
+    started = time.time()
+    try:
+        if filtered:
+            storage.load_data()
+            count = BookManager(storage).export(args.output, fmt, compress, fields, args.category,
+                                                args.search, year_range, args.order_by)
+        else:
+            count = storage.export_books(args.output, fmt, compress, fields)
+    except OSError as e:
+        print(f"Export failed: {e}")
+        return 1
+    elapsed = time.time() - started
+    size = os.path.getsize(args.output)
+    print(f"Exported {count} books to {args.output} ({fmt}{', gzip' if compress else ''}, {size} bytes)"
+          f" in {elapsed:.1f}s ({count / elapsed if elapsed else count:.0f} books/sec)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,226 @@
+"""
+Bulk import of a CSV or JSONL catalog into the library
+
+    python tools/import_catalog.py catalog.csv [--data media.json] [--workers 4]
+
+The input is streamed in chunks. Parsing (JSONL), validation and
+normalization run in a process pool with a bounded number of chunks in
+flight, so memory stays flat however large the file is; results are merged
+in input order and persisted with a single atomic write (one BookManager
+batch). Prints rows/sec, rejected rows with their reasons, and peak memory.
+CSV rows are split by the csv module in this process (quoted fields may
+span lines, so a CSV file cannot be cut into chunks blindly) and only the
+normalization is fanned out.
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; peak memory is then not reported
+    resource = None
+
+# Make sure project root is importable
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, '..'))
+sys.path.insert(0, PROJECT_ROOT)
+
+from backend.book_manager import BookManager
+from storage.sqlite_storage import SQLiteBookStorage, year_of
+from storage.storage import BookStorage
+
+# Spellings seen in other systems -> the library's categories
+CATEGORIES = {
+    "novel": "Novel", "novels": "Novel", "fiction": "Novel",
+    "philosophy": "Philosophy",
+    "poetry": "Poetry", "poem": "Poetry", "poems": "Poetry", "verse": "Poetry",
+}
+# A whole four-digit year inside free text ("May 5, 1999")
+_YEAR = re.compile(r"(?<!\d)-?\d{4}(?!\d)")
+
+
+def normalize_record(record):
+    """(book, None) for an importable record, else (None, reason)"""
+    if not isinstance(record, dict):
+        return None, "not an object"
+    book = {}
+    for field, value in record.items():
+        if field is None:
+            # csv puts surplus columns under None
+            continue
+        if isinstance(value, str):
+            value = " ".join(value.split())
+            if not value:
+                continue
+        elif value is None:
+            continue
+        book[str(field).strip().lower()] = value
+    # Other systems call the title "title"
+    if "name" not in book and "title" in book:
+        book["name"] = book.pop("title")
+    for field in ("name", "author"):
+        if not isinstance(book.get(field), str):
+            return None, "missing " + field
+    date = book.get("date", book.pop("year", None))
+    if date is None:
+        return None, "missing date"
+    # A plain number is parsed like everywhere else in the library; otherwise look for a year in the text
+    year = year_of({"date": date}) if not isinstance(date, bool) else 0
+    if not year:
+        match = _YEAR.search(str(date))
+        if match is None:
+            return None, "no year in date {!r}".format(date)
+        year = int(match.group())
+    book["date"] = str(year)
+    category = book.get("category")
+    if isinstance(category, str):
+        book["category"] = CATEGORIES.get(category.lower(), category[:1].upper() + category[1:])
+    # Library field order first, anything else the source carried after
+    ordered = {field: book.pop(field) for field in ("name", "author", "date", "category") if field in book}
+    ordered.update(book)
+    return ordered, None
+
+
+def normalize_chunk(chunk, parse_json):
+    """Normalize [(row number, record or JSON text)] -> (row numbers, books, [(row number, reason)])"""
+    numbers, books, rejects = [], [], []
+    for row, record in chunk:
+        if parse_json:
+            try:
+                record = json.loads(record)
+            except ValueError as e:
+                rejects.append((row, "invalid JSON: {}".format(e)))
+                continue
+        book, reason = normalize_record(record)
+        if book is None:
+            rejects.append((row, reason))
+        else:
+            numbers.append(row)
+            books.append(book)
+    return numbers, books, rejects
+
+
+def read_chunks(path, fmt, chunk_size):
+    """Yield lists of (row number, record) from a CSV (dicts) or JSONL (raw lines) file"""
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        chunk = []
+        for row in _rows(f, fmt):
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def _rows(f, fmt):
+    """(row number, record) pairs; a CSV row is numbered by the line it ends on"""
+    if fmt == "csv":
+        reader = csv.DictReader(f)
+        for record in reader:
+            yield reader.line_num, record
+    else:
+        for number, line in enumerate(f, 1):
+            if line.strip():
+                yield number, line
+
+
+def peak_memory_mb():
+    """Peak resident memory of this process and its finished workers, in MB (None if unknown)"""
+    if resource is None:
+        return None
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    workers = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # Linux reports KB, macOS bytes
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return max(own, workers) / scale
+
+
+def import_catalog(path, manager, fmt=None, chunk_size=5000, workers=None, max_in_flight=None,
+                   allow_duplicate=True):
+    """Stream path into manager with one persist; returns a report dict"""
+    fmt = fmt or ("csv" if path.lower().endswith(".csv") else "jsonl")
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or 2 * workers
+    parse_json = fmt != "csv"
+    started = time.time()
+    rows = imported = 0
+    rejects = []
+    with ProcessPoolExecutor(max_workers=workers) as pool, manager.batch():
+        pending = deque()
+
+        def merge_oldest():
+            nonlocal imported
+            numbers, books, bad = pending.popleft().result()
+            rejects.extend(bad)
+            for number, entry in zip(numbers, manager.add_books(books, allow_duplicate)):
+                if entry["ok"]:
+                    imported += 1
+                else:
+                    rejects.append((number, entry["error"]))
+
+        for chunk in read_chunks(path, fmt, chunk_size):
+            rows += len(chunk)
+            if len(pending) >= max_in_flight:
+                merge_oldest()
+            pending.append(pool.submit(normalize_chunk, chunk, parse_json))
+        while pending:
+            merge_oldest()
+    elapsed = time.time() - started
+    return {
+        "rows": rows,
+        "imported": imported,
+        "rejected": len(rejects),
+        "rejects": sorted(rejects, key=lambda reject: reject[0]),
+        "reasons": Counter(reason for _, reason in rejects),
+        "seconds": elapsed,
+        "rows_per_second": rows / elapsed if elapsed else float(rows),
+        "peak_memory_mb": peak_memory_mb(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import a CSV or JSONL catalog into the library")
+    parser.add_argument("catalog", help="CSV (with a header row) or JSONL file")
+    parser.add_argument("--data", default=os.path.join(PROJECT_ROOT, "media.json"),
+                        help="library to import into (media.json, or a .db SQLite file)")
+    parser.add_argument("--format", choices=("csv", "jsonl"), help="default: from the file extension")
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-in-flight", type=int, default=None, help="chunks queued at once (default 2 x workers)")
+    parser.add_argument("--skip-duplicates", action="store_true", help="reject titles already in the library")
+    parser.add_argument("--show-rejects", type=int, default=20, help="rejected rows to list")
+    args = parser.parse_args(argv)
+
+    storage = SQLiteBookStorage(args.data) if args.data.endswith(".db") else BookStorage(args.data)
+    storage.load_data()
+    manager = BookManager(storage)
+    print(f"Importing {args.catalog} -> {args.data}")
+    try:
+        report = import_catalog(args.catalog, manager, args.format, args.chunk_size, args.workers,
+                                args.max_in_flight, allow_duplicate=not args.skip_duplicates)
+    except OSError as e:
+        print(f"Import failed, library left unchanged: {e}")
+        return 1
+
+    print(f"Read {report['rows']} rows in {report['seconds']:.1f}s ({report['rows_per_second']:.0f} rows/sec)")
+    print(f"Imported {report['imported']}, rejected {report['rejected']}")
+    for reason, count in report["reasons"].most_common():
+        print(f"  {count} x {reason}")
+    for row, reason in report["rejects"][:args.show_rejects]:
+        print(f"  row {row}: {reason}")
+    if report["peak_memory_mb"] is not None:
+        print(f"Peak memory: {report['peak_memory_mb']:.0f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,6 @@
 import sys
 import os
 import time
-import json
 
 # Make sure project root is importable
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -38,13 +37,14 @@ added = manager.add_book(test_book)
 storage.save_data()
 print(f"Add returned: {added}")
 
-# Read file to confirm
-with open(media_path, 'r', encoding='utf-8') as f:
-    data = json.load(f)
-
-found = any(b.get('name') == book_name for b in data)
+# Read file to confirm (streamed, so this works on catalogs of any size)
+found = False
+count = 0
+for b in storage.iter_books():
+    found = found or b.get('name') == book_name
+    count += 1
 print(f"Book present after add: {found}")
-print(f"Count after add: {len(data)}")
+print(f"Count after add: {count}")
 
 # Allow a short pause for GUI reactions
 time.sleep(1)
@@ -55,11 +55,12 @@ deleted = manager.delete_book(book_name)
 storage.save_data()
 print(f"Delete returned: {deleted}")
 
-with open(media_path, 'r', encoding='utf-8') as f:
-    data_after = json.load(f)
-
-found_after = any(b.get('name') == book_name for b in data_after)
+found_after = False
+count_after = 0
+for b in storage.iter_books():
+    found_after = found_after or b.get('name') == book_name
+    count_after += 1
 print(f"Book present after delete: {found_after}")
-print(f"Count after delete: {len(data_after)}")
+print(f"Count after delete: {count_after}")
 
 print("Live add/delete test completed.")
@@ -0,0 +1,19 @@
+import sys
+import os
+
+# Make sure project root is importable
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, '..'))
+sys.path.insert(0, PROJECT_ROOT)
+
+from storage.sqlite_storage import migrate_json_to_sqlite
+
+json_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(PROJECT_ROOT, 'media.json')
+db_path = sys.argv[2] if len(sys.argv) > 2 else os.path.join(PROJECT_ROOT, 'media.db')
+
+print(f"Migrating {json_path} -> {db_path}")
+count = migrate_json_to_sqlite(json_path, db_path)
+if count is None:
+    print("Migration failed.")
+    sys.exit(1)
+print(f"Migrated {count} books. main.py will now use {db_path}.")
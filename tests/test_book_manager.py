@@ -1,4 +1,5 @@
 import json
+import math
 import os
 import sys
 import pytest
@@ -8,6 +9,7 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'online_book_pr
 
 from storage.storage import BookStorage
 from backend.book_manager import BookManager
+from backend.parallel import All, Any, Contains, Equals, Matches, Not, Predicate, Where, YearBetween
 
 
 class TestBookManagerAddAndList:
@@ -45,3 +47,1199 @@ class TestBookManagerAddAndList:
         assert added_book["author"] == "Kent Beck"
         assert added_book["date"] == "2003"
         print("[PASSED] test_book_manager.py - All book manager tests completed successfully ✅")
+
+
+def _sample_books():
+    return [
+        {"name": "Alpha", "author": "A", "date": "2001", "category": "Novel"},
+        {"name": "Beta", "author": "B", "date": "1999", "category": "Poetry"},
+        {"name": "Alpha", "author": "C", "date": "2010", "category": "Novel"},
+        {"name": "Gamma", "author": "D", "date": "1850", "category": "Philosophy"},
+        {"name": "Delta", "author": "E", "date": "1975", "category": "Novel"},
+    ]
+
+
+class TestBookManagerNameIndex:
+    """Backend BookManager Test: Verify the name index stays consistent with storage"""
+    
+    def _assert_index_matches(self, manager):
+        books = manager.storage.get_books()
+        for pos, book in enumerate(books):
+            assert pos in manager._names.positions(book["name"])
+        assert sum(len(manager._names.positions(b["name"])) for b in {b["name"]: b for b in books}.values()) == len(books)
+    
+    def test_find_update_delete_through_index(self, tmp_path):
+        """Test find/update/delete use the index and keep it in step after swap-removes"""
+        print("\n[RUNNING] test_book_manager.py - Testing BookManager name index")
+        storage = BookStorage(str(tmp_path / "media.json"))
+        storage.set_books(_sample_books())
+        storage.save_data()
+        manager = BookManager(storage)
+        
+        assert manager.find_book("Alpha")["author"] == "A"
+        assert manager.find_book("Missing") is None
+        assert manager.delete_book("Beta")
+        self._assert_index_matches(manager)
+        assert manager.find_book("Delta")["author"] == "E"
+        
+        # Rename drops the second copy of the old title
+        assert manager.update_book("Alpha", {"name": "Omega", "author": "Z", "date": "2020", "category": "Novel"})
+        self._assert_index_matches(manager)
+        assert not manager.has_book("Alpha")
+        assert manager.find_book("Omega")["author"] == "Z"
+        assert sorted(b["name"] for b in manager.get_all_books()) == ["Delta", "Gamma", "Omega"]
+        
+        # Reloading storage from disk rebuilds the index and yields the same order
+        reloaded = BookStorage(str(tmp_path / "media.json"))
+        reloaded.load_data()
+        assert reloaded.get_books() == storage.get_books()
+        print("[PASSED] test_book_manager.py - Name index tests completed successfully ✅")
+    
+    def test_add_book_rejects_duplicate_when_asked(self, tmp_path):
+        """Test allow_duplicate=False refuses an existing title"""
+        storage = BookStorage(str(tmp_path / "media.json"))
+        storage.set_books(_sample_books())
+        manager = BookManager(storage)
+        book = {"name": "Gamma", "author": "X", "date": "2000", "category": "Novel"}
+        assert not manager.add_book(book, allow_duplicate=False)
+        assert manager.add_book(book)
+        assert len(manager.get_all_books()) == 6
+        self._assert_index_matches(manager)
+    
+    def test_journal_replay_matches_swap_removes(self, tmp_path):
+        """Test journaled swap-removes replay to the same list order"""
+        fname = str(tmp_path / "media.json")
+        storage = BookStorage(fname, journal=True)
+        storage.set_books(_sample_books())
+        storage.save_data()
+        manager = BookManager(storage)
+        assert manager.delete_book("Alpha")
+        assert manager.update_book("Gamma", {"name": "Gamma", "author": "G", "date": "1851", "category": "Philosophy"})
+        
+        replayed = BookStorage(fname, journal=True)
+        replayed.load_data()
+        assert replayed.get_books() == storage.get_books()
+    
+    def test_index_rebuilds_after_external_reload(self, tmp_path):
+        """Test the index follows storage when the file changes underneath"""
+        fname = str(tmp_path / "media.json")
+        storage = BookStorage(fname)
+        storage.set_books(_sample_books())
+        storage.save_data()
+        manager = BookManager(storage)
+        assert manager.has_book("Beta")
+        
+        with open(fname, "w") as f:
+            json.dump([{"name": "Only", "author": "O", "date": "2000", "category": "Novel"}], f)
+        storage.load_data(force=True)
+        assert not manager.has_book("Beta")
+        assert manager.find_book("Only")["author"] == "O"
+
+
+class TestBookManagerSubstringSearch:
+    """Backend BookManager Test: Verify indexed search_by_name matches a plain scan"""
+    
+    def _scan(self, manager, term):
+        term = term.lower()
+        return [b for b in manager.get_all_books() if term in b["name"].lower()]
+    
+    def test_search_matches_scan_through_mutations(self, tmp_path):
+        """Test search results equal the substring scan before and after add/update/delete"""
+        print("\n[RUNNING] test_book_manager.py - Testing indexed substring search")
+        storage = BookStorage(str(tmp_path / "media.json"))
+        storage.set_books(_sample_books() + [
+            {"name": "The Alphabet of İstanbul", "author": "F", "date": "1990", "category": "Novel"},
+            {"name": "A", "author": "G", "date": "1991", "category": "Novel"},
+        ])
+        manager = BookManager(storage)
+        terms = ["al", "ALPHA", "pha", "a", "lph", "İst", "i̇st", "the alpha", "zzz", "e"]
+        
+        def check():
+            for term in terms:
+                assert list(manager.search_by_name(term)) == self._scan(manager, term), term
+        
+        check()
+        manager.add_book({"name": "Alphaville", "author": "H", "date": "1965", "category": "Novel"})
+        check()
+        manager.delete_book("Alpha")
+        check()
+        manager.update_book("Gamma", {"name": "Gamma Alphanumeric", "author": "D", "date": "1850"})
+        check()
+        manager.delete_book("A")
+        check()
+        assert list(manager.search_by_name("")) == manager.get_all_books()
+        print("[PASSED] test_book_manager.py - Indexed search tests completed successfully ✅")
+    
+    def test_swap_removes_on_large_postings_stay_fast(self):
+        """Test swap-removes from postings holding nearly every title use a binary search"""
+        import time
+        from backend.indexes import TrigramIndex
+        books = [{"name": "Title {}".format(i)} for i in range(300000)]
+        index = TrigramIndex()
+        index.rebuild(books)
+        assert len(index.search("t")) == len(index.search("tit")) == len(books)
+        started = time.perf_counter()
+        for pos in range(0, 2000, 4):
+            # delete_book's swap-remove: the victim, then the last book moved into its slot
+            last = len(books) - 1
+            index.remove(pos, books[pos])
+            index.remove(last, books[last])
+            books[pos] = books.pop()
+            index.add(pos, books[pos])
+        elapsed = time.perf_counter() - started
+        assert elapsed < 1.0, elapsed
+        for term in ("t", "tit", "e 2", "9"):
+            expected = [pos for pos, book in enumerate(books) if term in book["name"].lower()]
+            assert index.search(term) == expected, term
+            assert index.search(term, 10) == expected[:10], term
+    
+    def test_limited_short_search_stops_early(self):
+        """Test a limited 1-2 letter search returns the first matches without caching a partial posting"""
+        books = [{"name": "x" * (i % 7) + "Book {}".format(i)} for i in range(50000)]
+        from backend.indexes import TrigramIndex
+        index = TrigramIndex()
+        index.rebuild(books)
+        expected = [pos for pos, book in enumerate(books) if "xx" in book["name"].lower()]
+        assert index.search("xx", 25) == expected[:25]
+        assert "xx" not in index._short
+        assert index.search("xx") == expected
+        assert index.search("xx", 25) == expected[:25]
+
+
+class TestBookManagerCategoryIndex:
+    """Backend BookManager Test: Verify category filters and live statistics"""
+    
+    def test_statistics_and_filters_follow_mutations(self, tmp_path):
+        """Test counters and category filters stay exact across add/update/delete"""
+        print("\n[RUNNING] test_book_manager.py - Testing category index and statistics")
+        storage = BookStorage(str(tmp_path / "media.json"))
+        storage.set_books(_sample_books() + [{"name": "Untagged", "author": "U", "date": "2000"}])
+        manager = BookManager(storage)
+        
+        def check():
+            books = manager.get_all_books()
+            stats = manager.get_statistics()
+            expected = {}
+            for b in books:
+                if b.get("category") is not None:
+                    expected[b["category"]] = expected.get(b["category"], 0) + 1
+            assert stats["total"] == len(books)
+            assert stats["categories"] == expected
+            assert stats["novels"] == expected.get("Novel", 0)
+            for category in list(expected) + ["Missing"]:
+                assert list(manager.filter_by_category(category)) == [b for b in books if b.get("category") == category]
+        
+        check()
+        manager.add_book({"name": "Cosmos", "author": "Sagan", "date": "1980", "category": "Science"})
+        check()
+        assert manager.get_statistics()["categories"]["Science"] == 1
+        manager.update_book("Beta", {"name": "Beta", "author": "B", "date": "1999", "category": "Science"})
+        check()
+        manager.delete_book("Alpha")
+        manager.delete_book("Untagged")
+        check()
+        assert manager.get_statistics()["poetry"] == 0
+        print("[PASSED] test_book_manager.py - Category index tests completed successfully ✅")
+
+
+class TestBookManagerYearIndex:
+    """Backend BookManager Test: Verify year ordering, ranges and top-k from the year index"""
+    
+    def _year(self, book):
+        try:
+            return int(book.get("date") or 0)
+        except Exception:
+            return 0
+    
+    def test_year_queries_match_full_sort(self, tmp_path):
+        """Test sort_by_date, books_between, newest and oldest against a plain sort"""
+        print("\n[RUNNING] test_book_manager.py - Testing year index queries")
+        storage = BookStorage(str(tmp_path / "media.json"))
+        storage.set_books(_sample_books() + [
+            {"name": "Undated", "author": "U", "date": "n/a", "category": "Novel"},
+            {"name": "Same Year", "author": "S", "date": 2001, "category": "Novel"},
+            {"name": "Old", "author": "O", "date": "-300", "category": "Philosophy"},
+        ])
+        manager = BookManager(storage)
+        
+        def check():
+            books = manager.get_all_books()
+            for descending in (True, False):
+                expected = sorted(books, key=self._year, reverse=descending)
+                assert list(manager.sort_by_date(descending)) == expected
+            assert list(manager.newest(3)) == sorted(books, key=self._year, reverse=True)[:3]
+            assert list(manager.oldest(2)) == sorted(books, key=self._year)[:2]
+            assert list(manager.books_between(1900, 2005)) == sorted(
+                [b for b in books if 1900 <= self._year(b) <= 2005], key=self._year)
+        
+        check()
+        manager.add_book({"name": "Fresh", "author": "F", "date": "2024", "category": "Novel"})
+        check()
+        manager.delete_book("Beta")
+        manager.update_book("Gamma", {"name": "Gamma", "author": "D", "date": "2001"})
+        check()
+        assert [b["name"] for b in manager.books_between(2001, 2001)] == \
+            [b["name"] for b in manager.get_all_books() if self._year(b) == 2001]
+        assert manager.newest(100) == manager.sort_by_date(True)
+        print("[PASSED] test_book_manager.py - Year index tests completed successfully ✅")
+
+
+class TestBookManagerQuery:
+    """Backend BookManager Test: Verify the query planner against chained scans"""
+    
+    def _year(self, book):
+        try:
+            return int(book.get("date") or 0)
+        except Exception:
+            return 0
+    
+    def _expected(self, books, category=None, text=None, year_range=None, order_by=None, limit=None, offset=0):
+        rows = [b for b in books
+                if (category is None or b.get("category") == category)
+                and (not text or text.lower() in b["name"].lower())
+                and (year_range is None or ((year_range[0] is None or year_range[0] <= self._year(b))
+                                            and (year_range[1] is None or self._year(b) <= year_range[1])))]
+        if order_by in ("year", "-year"):
+            rows = sorted(rows, key=self._year, reverse=order_by == "-year")
+        elif order_by in ("name", "-name"):
+            rows = sorted(rows, key=lambda b: b["name"].lower(), reverse=order_by == "-name")
+        return rows[offset:] if limit is None else rows[offset:offset + limit]
+    
+    def test_query_combinations_match_scans(self, tmp_path):
+        """Test every combination of filters, orderings and paging"""
+        print("\n[RUNNING] test_book_manager.py - Testing BookManager.query planner")
+        books = []
+        for i in range(60):
+            books.append({"name": "{} Volume {}".format(["Alpha", "beta", "Gamma"][i % 3], i),
+                          "author": "Author {}".format(i % 7), "date": str(1900 + (i * 7) % 50),
+                          "category": ["Novel", "Poetry", "Philosophy", "Science"][i % 4]})
+        storage = BookStorage(str(tmp_path / "media.json"))
+        storage.set_books(books)
+        manager = BookManager(storage)
+        
+        for category in (None, "Poetry", "Missing"):
+            for text in (None, "alpha", "volume 1", "a"):
+                for year_range in (None, (1910, 1930), (None, 1920), (1940, None), (None, None)):
+                    for order_by in (None, "year", "-year", "name", "-name"):
+                        for limit, offset in ((None, 0), (5, 0), (5, 3), (None, 10)):
+                            args = dict(category=category, text=text, year_range=year_range,
+                                        order_by=order_by, limit=limit, offset=offset)
+                            assert list(manager.query(**args)) == self._expected(manager.get_all_books(), **args), args
+        
+        assert list(manager.query(category="All")) == manager.get_all_books()
+        assert manager.books_between(None, 1905) == manager.query(year_range=(None, 1905), order_by="year")
+        assert manager.explain(year_range=(1948, None)).estimate == len(manager.books_between(1948, None)) > 0
+        manager.delete_book("Alpha Volume 3")
+        manager.add_book({"name": "Alpha Omega", "author": "X", "date": "1915", "category": "Poetry"})
+        args = dict(category="Poetry", text="alpha", order_by="-year")
+        assert list(manager.query(**args)) == self._expected(manager.get_all_books(), **args)
+        print("[PASSED] test_book_manager.py - Query planner tests completed successfully ✅")
+    
+    def test_planner_picks_most_selective_index(self, tmp_path):
+        """Test the plan follows the narrowest index"""
+        books = [{"name": "Book {}".format(i), "author": "A", "date": str(1800 + i),
+                  "category": "Rare" if i == 5 else "Novel"} for i in range(200)]
+        storage = BookStorage(str(tmp_path / "media.json"))
+        storage.set_books(books)
+        manager = BookManager(storage)
+        assert manager.explain(category="Rare", text="book").source == "category"
+        assert manager.explain(category="Novel", year_range=(1810, 1812)).source == "year"
+        assert manager.explain(text="book 19", category="Novel").source == "text"
+        assert manager.explain(order_by="-year").source == "year-order"
+        assert manager.explain(category="Novel", order_by="year", limit=10).source == "year-order"
+        assert manager.explain().source == "scan"
+        with pytest.raises(ValueError):
+            manager.query(order_by="author")
+
+
+class TestBookManagerLazyIndexes:
+    """Backend BookManager Test: Verify indexes are only built by the calls that need them"""
+    
+    def _built(self, manager):
+        return {index for index in manager._lazy if index in manager._live}
+    
+    def test_indexes_are_built_on_first_use(self, tmp_path):
+        """Test a plain page builds nothing and each query builds only its own index"""
+        print("\n[RUNNING] test_book_manager.py - Testing lazy index builds")
+        storage = BookStorage(str(tmp_path / "media.json"))
+        storage.set_books(_sample_books())
+        manager = BookManager(storage)
+        assert len(manager.page({}, size=2)[0]) == 2
+        assert self._built(manager) == set()
+        
+        # Mutations before a build are picked up when the index is built
+        manager.add_book({"name": "Epsilon", "author": "F", "date": "1960", "category": "Poetry"})
+        assert self._built(manager) == set()
+        assert [b["name"] for b in manager.filter_by_category("Poetry")] == \
+            [b["name"] for b in manager.get_all_books() if b.get("category") == "Poetry"]
+        assert self._built(manager) == {manager._categories}
+        manager.page({"year_range": (1900, None)}, size=2)
+        assert self._built(manager) == {manager._categories, manager._years}
+        
+        # Built indexes follow later mutations; the rest stay unbuilt
+        assert manager.delete_book("Epsilon")
+        assert manager._names in self._built(manager)
+        assert [b["name"] for b in manager.filter_by_category("Poetry")] == \
+            [b["name"] for b in manager.get_all_books() if b.get("category") == "Poetry"]
+        assert manager._trigrams not in self._built(manager)
+        
+        # A reload empties them again
+        storage.set_books(_sample_books()[:2])
+        assert manager.get_statistics()["total"] == 2
+        assert self._built(manager) == {manager._categories}
+        print("[PASSED] test_book_manager.py - Lazy index tests completed successfully ✅")
+
+
+class TestBookManagerResultCache:
+    """Backend BookManager Test: Verify versioned result caching"""
+    
+    def test_repeated_views_hit_cache_and_mutations_invalidate(self, tmp_path):
+        """Test cached results are reused, and never served after a change"""
+        print("\n[RUNNING] test_book_manager.py - Testing the versioned result cache")
+        fname = str(tmp_path / "media.json")
+        storage = BookStorage(fname)
+        storage.set_books(_sample_books())
+        storage.save_data()
+        manager = BookManager(storage)
+        
+        novels = manager.filter_by_category("Novel")
+        assert manager.filter_by_category("Novel") == novels
+        assert manager.cache_stats()["hits"] == 1
+        
+        # Every caller shares the cached result, which cannot be edited
+        assert manager.filter_by_category("Novel") is novels
+        with pytest.raises(AttributeError):
+            novels.clear()
+        
+        # The whole catalog comes back as an uncached tuple copy, never the live list
+        everything = manager.filter_by_category("All")
+        assert isinstance(everything, tuple) and everything == tuple(storage.get_books())
+        assert isinstance(manager.search_by_name(""), tuple)
+        assert manager.cache_stats()["size"] == 1
+        manager.add_book({"name": "Zeta", "author": "Z", "date": "1970", "category": "Poetry"})
+        assert "Zeta" not in [b["name"] for b in everything]
+        manager.undo()
+        
+        version = manager.version
+        manager.add_book({"name": "Epsilon", "author": "F", "date": "1960", "category": "Novel"})
+        assert manager.version > version
+        assert [b["name"] for b in manager.filter_by_category("Novel")] == ["Alpha", "Alpha", "Delta", "Epsilon"]
+        manager.delete_book("Alpha")
+        assert "Alpha" not in [b["name"] for b in manager.filter_by_category("Novel")]
+        assert manager.search_by_name("eps")[0]["name"] == "Epsilon"
+        
+        # A reload from disk also invalidates
+        with open(fname, "w") as f:
+            json.dump([{"name": "Only", "author": "O", "date": "2000", "category": "Novel"}], f)
+        storage.load_data(force=True)
+        assert [b["name"] for b in manager.filter_by_category("Novel")] == ["Only"]
+        print("[PASSED] test_book_manager.py - Result cache tests completed successfully ✅")
+    
+    def test_cache_is_bounded(self, tmp_path):
+        """Test the LRU evicts once full and counts evictions"""
+        storage = BookStorage(str(tmp_path / "media.json"))
+        storage.set_books(_sample_books())
+        manager = BookManager(storage, cache_size=2)
+        manager.newest(1)
+        manager.newest(2)
+        manager.newest(3)
+        stats = manager.cache_stats()
+        assert stats["size"] == 2
+        assert stats["evictions"] == 1
+        assert stats["misses"] == 3
+        manager.newest(3)
+        assert manager.cache_stats()["hits"] == 1
+
+
+class TestBookManagerBulkOperations:
+    """Backend BookManager Test: Verify bulk APIs persist once and fail atomically"""
+    
+    def _storage(self, tmp_path, **kwargs):
+        storage = BookStorage(str(tmp_path / "media.json"), **kwargs)
+        storage.set_books(_sample_books())
+        storage.save_data()
+        return storage
+    
+    def _count_saves(self, storage, monkeypatch):
+        calls = []
+        real_save = storage.save_data
+        def counting_save():
+            calls.append(1)
+            return real_save()
+        monkeypatch.setattr(storage, "save_data", counting_save)
+        return calls
+    
+    def test_bulk_apis_write_once_and_report(self, tmp_path, monkeypatch):
+        """Test add_books/update_books/delete_books each persist once with a per-record report"""
+        print("\n[RUNNING] test_book_manager.py - Testing bulk add/update/delete")
+        storage = self._storage(tmp_path)
+        manager = BookManager(storage)
+        saves = self._count_saves(storage, monkeypatch)
+        
+        new_books = [{"name": "Bulk {}".format(i), "author": "B", "date": "2000", "category": "Novel"} for i in range(500)]
+        report = manager.add_books(new_books + [{"name": "No Author", "date": "2000"}, "junk"])
+        assert len(saves) == 1
+        assert sum(r["ok"] for r in report) == 500
+        assert report[500] == {"name": "No Author", "ok": False, "error": "missing author"}
+        assert report[501]["error"] == "not a book record"
+        
+        report = manager.add_books([{"name": "Gamma", "author": "X", "date": "1"}], allow_duplicate=False)
+        assert report[0]["error"] == "duplicate title"
+        
+        report = manager.update_books({"Bulk 1": {"name": "Bulk One", "author": "B", "date": "2001"},
+                                       "Nope": {"name": "Nope", "author": "N", "date": "1"}})
+        assert [r["ok"] for r in report] == [True, False]
+        report = manager.delete_books(["Bulk {}".format(i) for i in range(2, 500)] + ["Nope"])
+        assert report[-1] == {"name": "Nope", "ok": False, "error": "not found"}
+        # The rejected duplicate changed nothing, so it wrote nothing
+        assert len(saves) == 3
+        
+        reloaded = BookStorage(str(tmp_path / "media.json"))
+        reloaded.load_data()
+        assert sorted(b["name"] for b in reloaded.get_books()) == \
+            sorted(["Alpha", "Beta", "Alpha", "Gamma", "Delta", "Bulk 0", "Bulk One"])
+        print("[PASSED] test_book_manager.py - Bulk operation tests completed successfully ✅")
+    
+    def test_failed_batch_leaves_memory_and_file_untouched(self, tmp_path):
+        """Test an exception inside batch() undoes every change"""
+        storage = self._storage(tmp_path)
+        manager = BookManager(storage)
+        fname = str(tmp_path / "media.json")
+        with open(fname, "rb") as f:
+            before_file = f.read()
+        before = list(manager.get_all_books())
+        
+        with pytest.raises(RuntimeError):
+            with manager.batch():
+                manager.add_book({"name": "Temp", "author": "T", "date": "1"})
+                manager.delete_book("Alpha")
+                manager.update_book("Gamma", {"name": "Renamed", "author": "D", "date": "2"})
+                raise RuntimeError("abort")
+        
+        assert list(manager.get_all_books()) == before
+        assert manager.find_book("Alpha")["author"] == "A"
+        assert not manager.has_book("Temp")
+        assert [b["name"] for b in manager.search_by_name("gam")] == ["Gamma"]
+        with open(fname, "rb") as f:
+            assert f.read() == before_file
+    
+    def test_failed_write_rolls_back_batch(self, tmp_path, monkeypatch):
+        """Test a batch whose final write fails raises and restores memory"""
+        storage = self._storage(tmp_path)
+        manager = BookManager(storage)
+        before = list(manager.get_all_books())
+        monkeypatch.setattr(storage, "save_data", lambda: False)
+        with pytest.raises(OSError):
+            manager.add_books([{"name": "Lost", "author": "L", "date": "1"}])
+        assert list(manager.get_all_books()) == before
+        assert not manager.has_book("Lost")
+    
+    def test_failed_single_write_changes_nothing(self, tmp_path, monkeypatch):
+        """Test add/update/delete return False and leave memory, indexes and undo alone when the write fails"""
+        storage = self._storage(tmp_path)
+        manager = BookManager(storage)
+        before = list(manager.get_all_books())
+        assert manager.has_book("Alpha")
+        monkeypatch.setattr(storage, "save_data", lambda: False)
+        assert not manager.add_book({"name": "Lost", "author": "L", "date": "1"})
+        assert not manager.update_book("Alpha", {"name": "Renamed", "author": "A", "date": "1"})
+        assert not manager.delete_book("Alpha")
+        assert list(manager.get_all_books()) == before
+        assert manager.has_book("Alpha") and not manager.has_book("Lost") and not manager.has_book("Renamed")
+        assert not manager.undo()
+    
+    def test_journal_batch_is_one_record(self, tmp_path):
+        """Test a journaled batch appends one line that replays to the same list"""
+        storage = self._storage(tmp_path, journal=True)
+        manager = BookManager(storage)
+        manager.add_books([{"name": "J{}".format(i), "author": "J", "date": "1999"} for i in range(20)])
+        manager.delete_books(["Alpha", "J3"])
+        with open(storage.journal_file, "rb") as f:
+            assert len(f.readlines()) == 3
+        replayed = BookStorage(str(tmp_path / "media.json"), journal=True)
+        replayed.load_data()
+        assert replayed.get_books() == storage.get_books()
+
+
+class TestBookManagerPagination:
+    """Backend BookManager Test: Verify cursor pagination"""
+    
+    def _walk(self, manager, query, size):
+        rows, cursor = manager.page(query, size=size)
+        while cursor is not None:
+            more, cursor = manager.page(query, cursor, size=size)
+            assert more
+            rows += more
+        return rows
+    
+    def test_pages_concatenate_to_query_results(self, tmp_path):
+        """Test walking every page yields exactly query() for each ordering and filter"""
+        print("\n[RUNNING] test_book_manager.py - Testing cursor pagination")
+        books = [{"name": "{} Title {}".format(["Red", "green", "Blue"][i % 3], i % 11), "author": "A",
+                  "date": str(1950 + i % 9), "category": ["Novel", "Poetry"][i % 2]} for i in range(80)]
+        storage = BookStorage(str(tmp_path / "media.json"))
+        storage.set_books(books)
+        manager = BookManager(storage)
+        for query in ({}, {"category": "Poetry"}, {"text": "title 1"}, {"year_range": (1952, 1955)},
+                      {"order_by": "year"}, {"order_by": "-year"}, {"order_by": "name"},
+                      {"order_by": "-name", "category": "Novel"}, {"order_by": "-year", "text": "red"}):
+            for size in (1, 7, 80, 200):
+                query_args = dict(query)
+                assert self._walk(manager, query, size) == list(manager.query(**query_args)), (query, size)
+        print("[PASSED] test_book_manager.py - Pagination tests completed successfully ✅")
+    
+    def test_pages_reuse_the_cached_filter_result(self, tmp_path):
+        """Test later pages of a filtered query slice the cached positions instead of rerunning it"""
+        books = [{"name": "Book {:02d}".format(i), "author": "A", "date": str(2000 + i % 5),
+                  "category": ["Novel", "Poetry"][i % 2]} for i in range(40)]
+        storage = BookStorage(str(tmp_path / "media.json"))
+        storage.set_books(books)
+        manager = BookManager(storage)
+        for query, count in (({"category": "Poetry"}, 20), ({"text": "book", "order_by": "-name"}, 40)):
+            misses = manager.cache_stats()["misses"]
+            assert len(self._walk(manager, query, 3)) == count
+            assert manager.cache_stats()["misses"] == misses + 1
+        manager.add_book({"name": "Book 99", "author": "A", "date": "2001", "category": "Poetry"})
+        assert self._walk(manager, {"category": "Poetry"}, 3)[-1]["name"] == "Book 99"
+    
+    def test_short_search_pages_scan_only_what_they_show(self, tmp_path, monkeypatch):
+        """Test paging a one-letter search never builds its full posting yet matches query()"""
+        import backend.indexes as indexes
+        monkeypatch.setattr(indexes, "SCAN_BLOCK", 16)
+        books = [{"name": "Book {}".format(i), "author": "A", "date": "2000", "category": "Novel"}
+                 for i in range(200)]
+        storage = BookStorage(str(tmp_path / "media.json"))
+        storage.set_books(books)
+        manager = BookManager(storage)
+        rows, cursor = manager.page({"text": "7"}, size=5)
+        assert [b["name"] for b in rows] == ["Book 7", "Book 17", "Book 27", "Book 37", "Book 47"]
+        assert "7" not in manager._trigrams._short
+        rows += self._walk(manager, {"text": "7"}, 5)[5:]
+        assert rows == list(manager.query(text="7"))
+    
+    def test_cursor_survives_inserts(self, tmp_path):
+        """Test books added mid-walk neither shift nor repeat rows already returned"""
+        books = [{"name": "Book {:02d}".format(i), "author": "A", "date": str(2000 + i % 5), "category": "Novel"}
+                 for i in range(30)]
+        storage = BookStorage(str(tmp_path / "media.json"))
+        storage.set_books(list(books))
+        manager = BookManager(storage)
+        for query in ({}, {"order_by": "year"}, {"order_by": "-year"}, {"order_by": "name"}):
+            first, cursor = manager.page(query, size=10)
+            manager.add_book({"name": "Book 00 bis", "author": "N", "date": "2002", "category": "Novel"})
+            rest = []
+            while cursor is not None:
+                more, cursor = manager.page(query, cursor, size=10)
+                rest += more
+            seen = [b["name"] for b in first + rest]
+            assert len(seen) == len(set(seen))
+            # Every original book is returned exactly once
+            for book in books:
+                assert seen.count(book["name"]) == 1
+            manager.delete_book("Book 00 bis")
+    
+    def test_cursor_is_tied_to_its_query(self, tmp_path):
+        """Test a cursor from one query is rejected by another"""
+        storage = BookStorage(str(tmp_path / "media.json"))
+        storage.set_books(_sample_books())
+        manager = BookManager(storage)
+        _, cursor = manager.page({"order_by": "year"}, size=2)
+        with pytest.raises(ValueError):
+            manager.page({"order_by": "name"}, cursor, size=2)
+        with pytest.raises(ValueError):
+            manager.page({}, "not-a-cursor", size=2)
+        with pytest.raises(TypeError):
+            manager.page({"author": "A"})
+
+
+class TestBookManagerFuzzySearch:
+    """Backend BookManager Test: Verify typo-tolerant search"""
+    
+    def _distance(self, a, b):
+        previous = list(range(len(b) + 1))
+        for i, ca in enumerate(a, 1):
+            current = [i]
+            for j, cb in enumerate(b, 1):
+                current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+            previous = current
+        return previous[-1]
+    
+    def _expected(self, books, term, max_distance, limit):
+        ranked = []
+        for pos, book in enumerate(books):
+            distance = min(self._distance(term.lower(), str(book.get(field, "")).lower())
+                           for field in ("name", "author"))
+            if distance <= max_distance:
+                ranked.append((distance, pos))
+        return [books[pos] for _, pos in sorted(ranked)[:limit]]
+    
+    def test_fuzzy_search_matches_brute_force(self, tmp_path):
+        """Test ranked fuzzy results equal a full edit-distance scan, across mutations"""
+        print("\n[RUNNING] test_book_manager.py - Testing fuzzy search")
+        storage = BookStorage(str(tmp_path / "media.json"))
+        storage.set_books([
+            {"name": "Pride and Prejudice", "author": "Jane Austen", "date": "1813", "category": "Novel"},
+            {"name": "Pride and Prejudise", "author": "J. Austen", "date": "1813", "category": "Novel"},
+            {"name": "Emma", "author": "Jane Austen", "date": "1815", "category": "Novel"},
+            {"name": "Gemma", "author": "Someone", "date": "2001", "category": "Novel"},
+            {"name": "The Republic", "author": "Plato", "date": "-375", "category": "Philosophy"},
+            {"name": "Leaves of Grass", "author": "Walt Whitman", "date": "1855", "category": "Poetry"},
+        ])
+        manager = BookManager(storage)
+        queries = [("pride and prejduice", 2), ("EMA", 1), ("jane austin", 2), ("plato", 0),
+                   ("teh republic", 2), ("leaves of grass", 3), ("zzzz", 2)]
+        
+        def check():
+            for term, max_distance in queries:
+                expected = self._expected(manager.get_all_books(), term, max_distance, 20)
+                assert list(manager.fuzzy_search(term, max_distance)) == expected, term
+        
+        check()
+        assert manager.fuzzy_search("pride and prejduice")[0]["name"] == "Pride and Prejudice"
+        manager.delete_book("Pride and Prejudice")
+        manager.add_book({"name": "Teh Republic", "author": "Plato", "date": "2000", "category": "Philosophy"})
+        manager.update_book("Emma", {"name": "Emma", "author": "Jane Austin", "date": "1815"})
+        check()
+        assert len(manager.fuzzy_search("emma", 2, limit=1)) == 1
+        assert manager.fuzzy_search("") == ()
+        print("[PASSED] test_book_manager.py - Fuzzy search tests completed successfully ✅")
+
+    
+    def test_fuzzy_search_stops_early_but_stays_exact(self, tmp_path, monkeypatch):
+        """Test a limited fuzzy search stops once its top results are settled and still matches brute force"""
+        import backend.fuzzy as fuzzy
+        storage = BookStorage(str(tmp_path / "media.json"))
+        storage.set_books([{"name": "Untitled", "author": "Author {}".format(i % 300),
+                            "date": "2000", "category": "Novel"} for i in range(1500)])
+        manager = BookManager(storage)
+        checked = []
+        real = fuzzy.levenshtein
+        monkeypatch.setattr(fuzzy, "levenshtein", lambda a, b, k: checked.append(b) or real(a, b, k))
+        # Five books are exact matches, so no other author can reach the top three
+        assert [b["author"] for b in manager.fuzzy_search("Author 12", 2, limit=3)] == ["Author 12"] * 3
+        assert checked == ["author 12"]
+        for term in ("Author 12", "auhtor 77", "athor 2"):
+            for limit in (5, 8, 40):
+                expected = self._expected(manager.get_all_books(), term, 2, limit)
+                assert list(manager.fuzzy_search(term, 2, limit=limit)) == expected, (term, limit)
+
+class TestBookManagerFullTextSearch:
+    """Backend BookManager Test: Verify BM25 full-text search and its saved index"""
+    
+    def _expected(self, books, query, limit):
+        from backend.fulltext import tokenize
+        docs = [[term for field in ("name", "author", "category") if isinstance(book.get(field), str)
+                 for term in tokenize(book[field])] for book in books]
+        average = sum(map(len, docs)) / len(docs)
+        ranked = []
+        for pos, doc in enumerate(docs):
+            score = 0.0
+            for term in set(tokenize(query)):
+                df = sum(1 for other in docs if term in other)
+                tf = doc.count(term)
+                if tf:
+                    idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+                    score += idf * tf * 2.2 / (tf + 1.2 * (0.25 + 0.75 * len(doc) / average))
+            if score:
+                ranked.append((-score, pos))
+        return [books[pos] for _, pos in sorted(ranked)[:limit]]
+    
+    def test_ranking_matches_brute_force(self, tmp_path):
+        """Test BM25 results equal a direct computation, across mutations"""
+        print("\n[RUNNING] test_book_manager.py - Testing full-text search")
+        storage = BookStorage(str(tmp_path / "media.json"), journal=True)
+        storage.set_books([
+            {"name": "War and Peace", "author": "Leo Tolstoy", "date": "1869", "category": "Novel"},
+            {"name": "Peace of Mind", "author": "Joshua Liebman", "date": "1946", "category": "Philosophy"},
+            {"name": "The Art of War", "author": "Sun Tzu", "date": "-500", "category": "Philosophy"},
+            {"name": "Les Misérables", "author": "Victor Hugo", "date": "1862", "category": "Novel"},
+            {"name": "War, war, war", "author": "Anon", "date": "2000", "category": "Poetry"},
+        ])
+        storage.save_data()
+        manager = BookManager(storage)
+        queries = ["war", "peace war", "MISERABLES", "novel tolstoy", "hugo's", "nothing here"]
+        
+        def check():
+            for query in queries:
+                expected = self._expected(manager.get_all_books(), query, 3)
+                assert list(manager.full_text_search(query, 3)) == expected, query
+        
+        check()
+        assert manager.full_text_search("miserables")[0]["author"] == "Victor Hugo"
+        manager.delete_book("War and Peace")
+        manager.add_book({"name": "Peace Talks", "author": "Jim Butcher", "date": "2020", "category": "Novel"})
+        manager.update_book("The Art of War", {"name": "The Art of Peace", "author": "Morihei Ueshiba",
+                                               "date": "1992", "category": "Philosophy"})
+        check()
+        assert manager.full_text_search("") == ()
+        print("[PASSED] test_book_manager.py - Full-text search tests completed successfully ✅")
+    
+    def test_huge_term_frequency_is_clamped(self):
+        """Test build and add both cap a term's frequency at 65535 instead of overflowing"""
+        from backend.fulltext import FullTextIndex
+        books = [{"name": "la " * 70000}, {"name": "la di da"}]
+        index = FullTextIndex()
+        index.build(books)
+        index.add(2, {"name": "la " * 70000})
+        assert index._postings["la"][1].tolist() == [0xFFFF, 1, 0xFFFF]
+        assert index.search("la", 3)[0] in (0, 2)
+    
+    def test_edits_keep_postings_sorted(self):
+        """Test swap-removes and adds leave every posting sorted and equal to a fresh build"""
+        from backend.fulltext import FullTextIndex
+        books = [{"name": "Book {}".format(i % 7), "author": "Author", "category": "Novel"} for i in range(40)]
+        index = FullTextIndex()
+        index.build(books)
+        for pos in (3, 0, 17, 5):
+            last = len(books) - 1
+            index.remove(pos, books[pos])
+            if pos != last:
+                index.remove(last, books[last])
+                index.add(pos, books[last])
+            books[pos] = books[last]
+            books.pop()
+        index.add(len(books), {"name": "Book Extra", "author": "Author", "category": "Poetry"})
+        books.append({"name": "Book Extra", "author": "Author", "category": "Poetry"})
+        fresh = FullTextIndex()
+        fresh.build(books)
+        assert {term: (p.tolist(), f.tolist()) for term, (p, f) in index._postings.items()} == \
+            {term: (p.tolist(), f.tolist()) for term, (p, f) in fresh._postings.items()}
+        assert index.search("book novel", 40) == fresh.search("book novel", 40)
+    
+    def test_saved_index_is_reused_until_catalog_changes(self, tmp_path, monkeypatch):
+        """Test the index file is loaded on a fresh start and ignored once stale"""
+        print("\n[RUNNING] test_book_manager.py - Testing saved full-text index")
+        from backend.fulltext import FullTextIndex
+        fname = str(tmp_path / "media.json")
+        storage = BookStorage(fname, journal=True)
+        storage.set_books(_sample_books())
+        storage.save_data()
+        expected = BookManager(storage).full_text_search("alpha")
+        assert os.path.exists(fname + ".fts")
+        
+        builds = []
+        original = FullTextIndex.build
+        monkeypatch.setattr(FullTextIndex, "build", lambda self, books: builds.append(1) or original(self, books))
+        storage = BookStorage(fname, journal=True)
+        storage.load_data()
+        manager = BookManager(storage)
+        assert manager.full_text_search("alpha") == expected
+        assert builds == []
+        
+        manager.add_book({"name": "Alpha Omega", "author": "Z", "date": "2001", "category": "Novel"})
+        assert manager.save_search_index()
+        storage = BookStorage(fname, journal=True)
+        storage.load_data()
+        assert len(BookManager(storage).full_text_search("alpha")) == len(expected) + 1
+        assert builds == []
+        
+        # Changed behind the index's back: the file no longer matches and is rebuilt
+        other = BookStorage(fname, journal=True)
+        other.load_data()
+        other.append_book({"name": "Alpha Beta", "author": "Y", "date": "2002", "category": "Novel"})
+        storage = BookStorage(fname, journal=True)
+        storage.load_data()
+        assert len(BookManager(storage).full_text_search("alpha")) == len(expected) + 2
+        assert builds == [1]
+        print("[PASSED] test_book_manager.py - Saved full-text index tests completed successfully ✅")
+
+
+class TestBookManagerAnalytics:
+    """Backend BookManager Test: Verify catalog analytics on both column backends"""
+    
+    @pytest.fixture(params=["numpy", "array"])
+    def backend(self, request, monkeypatch):
+        from backend import analytics
+        if request.param == "numpy":
+            pytest.importorskip("numpy")
+        else:
+            monkeypatch.setattr(analytics, "np", None)
+        return request.param
+    
+    def test_aggregates_match_plain_counting(self, tmp_path, backend):
+        """Test histograms, cross-tabs, percentiles and top authors against direct counts"""
+        print("\n[RUNNING] test_book_manager.py - Testing analytics ({})".format(backend))
+        storage = BookStorage(str(tmp_path / "media.json"))
+        books = _sample_books() + [
+            {"name": "Epsilon", "author": "A", "date": "2005", "category": "Poetry"},
+            {"name": "Zeta", "author": "D", "date": "-375", "category": "Philosophy"},
+            {"name": "Eta", "author": "A", "date": "unknown", "category": "Novel"},
+            {"name": "Theta", "author": "B", "date": "1999"},
+        ]
+        storage.set_books(books)
+        manager = BookManager(storage)
+        stats = manager.analytics().summary(top=2)
+        
+        dated = sorted(int(b["date"]) for b in books if b["date"].lstrip("-").isdigit())
+        assert stats["total"] == 9 and stats["undated"] == 1
+        assert stats["decades"] == {-380: 1, 1850: 1, 1970: 1, 1990: 2, 2000: 2, 2010: 1}
+        assert stats["category_by_decade"] == {
+            "Novel": {1970: 1, 2000: 1, 2010: 1},
+            "Poetry": {1990: 1, 2000: 1},
+            "Philosophy": {-380: 1, 1850: 1},
+        }
+        assert stats["median_year"] == dated[3]
+        assert stats["percentiles"][10] == dated[0] and stats["percentiles"][90] == dated[-1]
+        assert stats["top_authors"] == [("A", 3), ("B", 2)]
+        assert manager.analytics().books_per_author() == {"A": 3, "B": 2, "C": 1, "D": 2, "E": 1}
+        
+        # Reused until the catalog changes
+        assert manager.analytics() is manager.analytics()
+        snapshot = manager.analytics()
+        manager.add_book({"name": "Iota", "author": "E", "date": "1975", "category": "Novel"})
+        assert manager.analytics() is not snapshot
+        assert manager.analytics().decade_histogram()[1970] == 2
+        assert snapshot.decade_histogram()[1970] == 1
+        print("[PASSED] test_book_manager.py - Analytics tests completed successfully ✅")
+    
+    def test_column_store_snapshot_reads_columns(self, tmp_path, backend, monkeypatch):
+        """Test a CompactCatalog is snapshotted and aggregated without decoding any book"""
+        from storage.compact import CompactCatalog
+        books = _sample_books() + [
+            {"name": "Epsilon", "author": "A", "date": "2005", "category": "Poetry"},
+            {"name": 7, "author": "D", "date": "1851", "category": "Philosophy"},
+            {"name": "Theta", "author": ["B", "C"], "date": "1999"},
+        ]
+        plain = BookStorage(str(tmp_path / "list.json"))
+        plain.set_books(books)
+        expected = BookManager(plain).analytics().summary()
+        storage = BookStorage(str(tmp_path / "media.json"), column_store=True)
+        storage.set_books(CompactCatalog(books))
+        manager = BookManager(storage)
+        assert manager.get_statistics()["total"] == len(books)
+        
+        decode = CompactCatalog.__getitem__
+        decoding = {"allowed": False}
+        
+        def guarded(self, index):
+            assert decoding["allowed"], "analytics decoded a book"
+            return decode(self, index)
+        
+        monkeypatch.setattr(CompactCatalog, "__getitem__", guarded)
+        snapshot = manager.analytics()
+        decoding["allowed"] = True
+        manager.add_book({"name": "Iota", "author": "E", "date": "1975", "category": "Novel"})
+        decoding["allowed"] = False
+        assert snapshot.summary() == expected
+
+
+class TestBookManagerDuplicates:
+    """Backend BookManager Test: Verify MinHash/LSH near-duplicate detection"""
+    
+    def _catalog(self):
+        return [
+            {"name": "The Republic", "author": "Plato", "date": "-375", "category": "Philosophy"},
+            {"name": "War and Peace", "author": "Leo Tolstoy", "date": "1869", "category": "Novel"},
+            {"name": "Republic, The", "author": "plato", "date": "1900", "category": "Philosophy"},
+            {"name": "Leaves of Grass", "author": "Walt Whitman", "date": "1855", "category": "Poetry"},
+            {"name": "War & Peace", "author": "Leo Tolstoy", "date": "2005", "category": "Novel"},
+            {"name": "The Odyssey", "author": "Homer", "date": "-700", "category": "Poetry"},
+        ]
+    
+    def test_find_duplicates_reports_reordered_titles(self, tmp_path):
+        """Test pairs found through LSH buckets are exactly the similar pairs"""
+        print("\n[RUNNING] test_book_manager.py - Testing duplicate detection")
+        from backend.duplicates import jaccard, shingles
+        storage = BookStorage(str(tmp_path / "media.json"))
+        storage.set_books(self._catalog())
+        manager = BookManager(storage)
+        
+        report = manager.find_duplicates()
+        pairs = [(entry["book"]["name"], entry["duplicate"]["name"]) for entry in report]
+        assert pairs == [("The Republic", "Republic, The"), ("War and Peace", "War & Peace")]
+        assert report[0]["similarity"] == 1.0
+        books = manager.get_all_books()
+        expected = [(a["name"], b["name"]) for i, a in enumerate(books) for b in books[i + 1:]
+                    if jaccard(shingles(a), shingles(b)) >= 0.8]
+        assert sorted(pairs) == sorted(expected)
+        
+        # Buckets follow mutations
+        manager.delete_book("Republic, The")
+        manager.add_book({"name": "Odyssey, The", "author": "Homer", "date": "1990", "category": "Poetry"})
+        names = {(entry["book"]["name"], entry["duplicate"]["name"]) for entry in manager.find_duplicates()}
+        assert names == {("War and Peace", "War & Peace"), ("The Odyssey", "Odyssey, The")}
+        print("[PASSED] test_book_manager.py - Duplicate detection tests completed successfully ✅")
+    
+    def test_add_checks_warn_on_likely_duplicates(self, tmp_path, capsys):
+        """Test add_book warns and add_books reports near-duplicates, still adding them"""
+        print("\n[RUNNING] test_book_manager.py - Testing duplicate warnings on add")
+        storage = BookStorage(str(tmp_path / "media.json"))
+        storage.set_books(self._catalog())
+        manager = BookManager(storage)
+        
+        similar = manager.similar_books({"name": "republic (the)", "author": "PLATO", "date": "1"})
+        assert [book["date"] for book, _ in similar] == ["-375", "1900"]
+        assert manager.similar_books({"name": "Brand New", "author": "Nobody", "date": "1"}) == []
+        
+        assert manager.add_book({"name": "Leaves of Grass.", "author": "Walt Whitman", "date": "1892"},
+                                warn_similar=True)
+        assert "looks like a duplicate of 'Leaves of Grass'" in capsys.readouterr().out
+        report = manager.add_books([
+            {"name": "Odyssey", "author": "Homer", "date": "1900"},
+            {"name": "Fresh Title", "author": "Someone", "date": "2020"},
+            {"name": "Fresh title!", "author": "someone", "date": "2021"},
+        ], warn_similar=True)
+        assert [entry["similar"] for entry in report] == [["The Odyssey"], [], ["Fresh Title"]]
+        assert all(entry["ok"] for entry in report)
+        assert len(manager.get_all_books()) == 10
+        print("[PASSED] test_book_manager.py - Duplicate warning tests completed successfully ✅")
+
+
+class TestBookManagerUndo:
+    """Backend BookManager Test: Verify undo/redo, snapshots and versioned views"""
+    
+    def _state(self, manager):
+        return [dict(book) for book in manager.get_all_books()]
+    
+    def test_undo_redo_round_trips_every_mutation(self, tmp_path):
+        """Test each mutation call or batch is one undo step, persisted to the journal"""
+        print("\n[RUNNING] test_book_manager.py - Testing undo/redo")
+        fname = str(tmp_path / "media.json")
+        storage = BookStorage(fname, journal=True)
+        storage.set_books(_sample_books())
+        storage.save_data()
+        manager = BookManager(storage)
+        assert not manager.undo() and not manager.redo()
+        
+        states = [self._state(manager)]
+        manager.add_book({"name": "Epsilon", "author": "F", "date": "2020", "category": "Poetry"})
+        states.append(self._state(manager))
+        manager.delete_book("Alpha")
+        states.append(self._state(manager))
+        manager.update_book("Beta", {"name": "Beta II", "author": "B", "date": "2000", "category": "Poetry"})
+        states.append(self._state(manager))
+        with manager.batch():
+            manager.add_books([{"name": "Zeta", "author": "G", "date": "1900"}])
+            manager.delete_book("Gamma")
+        states.append(self._state(manager))
+        # A call that changes nothing records no step
+        assert not manager.delete_book("Missing")
+        
+        for expected in reversed(states[:-1]):
+            assert manager.undo()
+            assert self._state(manager) == expected
+            assert list(manager.search_by_name("a")) == [b for b in expected if "a" in b["name"].lower()]
+        assert not manager.undo()
+        for expected in states[1:]:
+            assert manager.redo()
+            assert self._state(manager) == expected
+        assert not manager.redo()
+        
+        manager.undo()
+        reopened = BookStorage(fname, journal=True)
+        reopened.load_data()
+        assert reopened.get_books() == states[-2]
+        # A new mutation drops the redo history
+        manager.add_book({"name": "Eta", "author": "H", "date": "2001"})
+        assert not manager.redo()
+        print("[PASSED] test_book_manager.py - Undo/redo tests completed successfully ✅")
+    
+    def test_undo_steps_hold_only_their_edits(self, tmp_path):
+        """Test undo records per-edit deltas and never copies the catalog unless a view is taken"""
+        books = [{"name": "Book {}".format(i), "author": "A", "date": str(1900 + i % 100)} for i in range(5000)]
+        storage = BookStorage(str(tmp_path / "media.json"))
+        storage.set_books(list(books))
+        manager = BookManager(storage)
+        manager.delete_book("Book 10")
+        manager.update_book("Book 20", {"name": "Book 20b", "author": "B", "date": "2000"})
+        manager.add_book({"name": "Book new", "author": "C", "date": "2001"})
+        after = self._state(manager)
+        assert [[op for op, *_ in step] for step in manager._undo] == [["remove"], ["replace"], ["append"]]
+        assert not manager._versions.built
+        
+        states = []
+        while manager.undo():
+            states.append(self._state(manager))
+        assert states[-1] == books
+        while manager.redo():
+            pass
+        assert self._state(manager) == after
+        assert not manager._versions.built
+    
+    def test_snapshots_and_views_share_structure(self, tmp_path):
+        """Test named snapshots restore the catalog and old views never change"""
+        print("\n[RUNNING] test_book_manager.py - Testing snapshots and views")
+        storage = BookStorage(str(tmp_path / "media.json"))
+        storage.set_books([{"name": "Book {}".format(i), "author": "A", "date": str(1900 + i % 100)}
+                           for i in range(2000)])
+        manager = BookManager(storage)
+        manager.snapshot("start")
+        view = manager.view()
+        before = list(view)
+        
+        manager.delete_book("Book 7")
+        manager.update_book("Book 1500", {"name": "Book 1500b", "author": "B", "date": "2000"})
+        assert list(view) == before
+        assert len(manager.view()) == 1999 and manager.view()[7]["name"] == "Book 1999"
+        
+        assert manager.restore("start")
+        assert manager.get_all_books() == before
+        assert manager.view() is view
+        assert not manager.restore("missing")
+        # Restoring is itself undoable
+        assert manager.undo()
+        assert manager.find_book("Book 1500b") is not None and not manager.has_book("Book 7")
+        print("[PASSED] test_book_manager.py - Snapshot tests completed successfully ✅")
+
+
+class TestBookManagerAuthorIndex:
+    """Backend BookManager Test: Verify author listings and prefix lookups"""
+    
+    def test_author_queries_follow_renames_and_edits(self, tmp_path):
+        """Test books_by_author and authors_with_prefix against scans through mutations"""
+        print("\n[RUNNING] test_book_manager.py - Testing author index")
+        storage = BookStorage(str(tmp_path / "media.json"))
+        storage.set_books([
+            {"name": "Emma", "author": "Jane Austen", "date": "1815"},
+            {"name": "Persuasion", "author": "jane  austen", "date": "1817"},
+            {"name": "Jane Eyre", "author": "Charlotte Bronte", "date": "1847"},
+            {"name": "Wuthering Heights", "author": "Emily Bronte", "date": "1847"},
+            {"name": "Middlemarch", "author": "George Eliot", "date": "1871"},
+            {"name": "Mansfield Park", "author": "Jane Austen", "date": "1814"},
+            {"name": "Untitled", "author": None, "date": "2000"},
+        ])
+        manager = BookManager(storage)
+        
+        def by_author(name):
+            key = " ".join(name.casefold().split())
+            return [b for b in manager.get_all_books()
+                    if isinstance(b.get("author"), str) and " ".join(b["author"].casefold().split()) == key]
+        
+        assert [b["name"] for b in manager.books_by_author("JANE AUSTEN")] == ["Emma", "Persuasion", "Mansfield Park"]
+        assert manager.authors_with_prefix("") == [("Charlotte Bronte", 1), ("Emily Bronte", 1),
+                                                    ("George Eliot", 1), ("Jane Austen", 3)]
+        assert manager.authors_with_prefix("e") == [("Emily Bronte", 1)]
+        assert manager.authors_with_prefix("c", limit=0) == []
+        
+        manager.update_book("Emma", {"name": "Emma (annotated)", "author": "Emily Bronte", "date": "1815"})
+        manager.delete_book("Middlemarch")
+        manager.add_book({"name": "Silas Marner", "author": "george eliot", "date": "1861"})
+        manager.update_book("Wuthering Heights", {"name": "Wuthering Heights", "author": "E. Bronte", "date": "1847"})
+        for name in ("Jane Austen", "Emily Bronte", "george eliot", "E. Bronte", "Nobody"):
+            assert list(manager.books_by_author(name)) == by_author(name), name
+        assert manager.authors_with_prefix("e") == [("E. Bronte", 1), ("Emily Bronte", 1)]
+        assert manager.authors_with_prefix("GEO") == [("george eliot", 1)]
+        assert manager.authors_with_prefix("jane", 5) == [("Jane Austen", 2)]
+        print("[PASSED] test_book_manager.py - Author index tests completed successfully ✅")
+
+
+class TestBookManagerAutocomplete:
+    """Backend BookManager Test: Verify trie-backed search box completions"""
+    
+    def test_suggestions_follow_mutations(self, tmp_path):
+        """Test completions are ranked by book count and track adds, renames and deletes"""
+        print("\n[RUNNING] test_book_manager.py - Testing autocomplete")
+        storage = BookStorage(str(tmp_path / "media.json"))
+        storage.set_books([
+            {"name": "Dune", "author": "Frank Herbert", "date": "1965"},
+            {"name": "Dune", "author": "Frank Herbert", "date": "1990"},
+            {"name": "Dune Messiah", "author": "Frank Herbert", "date": "1969"},
+            {"name": "Dracula", "author": "Bram Stoker", "date": "1897"},
+            {"name": "Frankenstein", "author": "Mary Shelley", "date": "1818"},
+            {"name": "Dubliners", "author": "James Joyce", "date": "1914"},
+        ])
+        manager = BookManager(storage)
+        
+        assert manager.suggest("du") == [("Dune", "title", 2), ("Dubliners", "title", 1), ("Dune Messiah", "title", 1)]
+        assert manager.suggest("FRANK") == [("Frank Herbert", "author", 3), ("Frankenstein", "title", 1)]
+        assert manager.suggest("d", limit=2) == [("Dune", "title", 2), ("Dracula", "title", 1)]
+        assert manager.suggest("x") == [] and manager.suggest("") == []
+        
+        manager.update_book("Dracula", {"name": "Dune Encyclopedia", "author": "Willis McNelly", "date": "1984"})
+        manager.delete_book("Dune")
+        manager.add_book({"name": "dune  messiah", "author": "Frank Herbert", "date": "2008"})
+        assert manager.suggest("dune") == [("Dune Messiah", "title", 2), ("Dune Encyclopedia", "title", 1)]
+        assert manager.suggest("dr") == []
+        assert manager.suggest("w") == [("Willis McNelly", "author", 1)]
+        assert manager.suggest("fr")[0] == ("Frank Herbert", "author", 2)
+        print("[PASSED] test_book_manager.py - Autocomplete tests completed successfully ✅")
+
+    
+    def test_tied_spellings_do_not_depend_on_edit_order(self, tmp_path):
+        """Test an incrementally maintained trie and author index show the same spellings as a fresh build"""
+        storage = BookStorage(str(tmp_path / "media.json"))
+        storage.set_books([
+            {"name": "Alpha", "author": "ann ", "date": "1"},
+            {"name": "ALPHA", "author": "Ann", "date": "2"},
+            {"name": "Beta", "author": "Bob", "date": "3"},
+        ])
+        manager = BookManager(storage)
+        assert manager.suggest("a") and manager.authors_with_prefix("a")
+        manager.delete_book("Alpha")
+        manager.add_book({"name": "Alpha", "author": "ann ", "date": "1"})
+        manager.update_book("Beta", {"name": "alpha", "author": "ANN", "date": "3"})
+        manager.delete_book("alpha")
+        
+        fresh = BookManager(storage)
+        for prefix in ("a", "al", "an"):
+            assert manager.suggest(prefix) == fresh.suggest(prefix), prefix
+        assert manager.authors_with_prefix("a") == fresh.authors_with_prefix("a") == [("Ann", 2)]
+        assert manager.suggest("al")[0] == ("ALPHA", "title", 2)
+
+class TestBookManagerExport:
+    """Backend BookManager Test: Verify query results stream to export files"""
+    
+    def test_export_writes_query_results(self, tmp_path):
+        """Test exports match query() for filters and orderings, and bad formats write nothing"""
+        print("\n[RUNNING] test_book_manager.py - Testing export")
+        storage = BookStorage(str(tmp_path / "media.json"))
+        storage.set_books([{"name": "Book {}".format(i), "author": "A", "date": str(1900 + i * 7 % 100),
+                            "category": "Poetry" if i % 3 else "Novel"} for i in range(60)])
+        manager = BookManager(storage)
+        
+        for query in ({}, {"category": "Poetry"}, {"text": "book 1", "order_by": "-name"},
+                      {"year_range": (1920, 1960), "order_by": "year"}, {"category": "Novel", "order_by": "-year"}):
+            assert list(manager.iter_query(**query)) == list(manager.query(**query))
+            path = str(tmp_path / "out.jsonl")
+            assert manager.export(path, **query) == len(manager.query(**query))
+            with open(path, encoding="utf-8") as f:
+                assert [json.loads(line) for line in f] == list(manager.query(**query))
+        
+        assert manager.export(str(tmp_path / "out.json"), category="All") == 60
+        with open(str(tmp_path / "out.json"), encoding="utf-8") as f:
+            assert json.load(f) == manager.get_all_books()
+        with pytest.raises(ValueError):
+            manager.export(str(tmp_path / "out.txt"))
+        with pytest.raises(ValueError):
+            manager.export(str(tmp_path / "bad.csv"), order_by="author")
+        assert not os.path.exists(str(tmp_path / "out.txt")) and not os.path.exists(str(tmp_path / "bad.csv"))
+        print("[PASSED] test_book_manager.py - Export tests completed successfully ✅")
+
+
+def _long_title(fields):
+    """Module-level so Where can send it to the scan workers"""
+    return len(fields["name"]) > 8
+
+
+class TestBookManagerParallelScan:
+    """Backend BookManager Test: Verify multi-process scans over shared memory"""
+    
+    def test_parallel_scan_matches_in_process_scan(self, tmp_path):
+        """Test worker scans return the in-process results, in order, and follow mutations"""
+        print("\n[RUNNING] test_book_manager.py - Testing parallel scan")
+        books = [{"name": "Book {} Ünïcode".format(i) if i % 5 else "Tome {}".format(i),
+                  "author": "Author {}".format(i % 13), "date": str(1800 + i % 200) if i % 11 else 1850,
+                  "category": ("Novel", "Poetry", None)[i % 3]} for i in range(500)]
+        books[3]["series"] = ["Dune", 2]
+        storage = BookStorage(str(tmp_path / "media.json"))
+        storage.set_books(books)
+        local = BookManager(storage, scan_threshold=10 ** 9)
+        parallel = BookManager(storage, scan_threshold=0, scan_workers=2)
+        parallel._scanner.chunk_rows = 64
+        
+        for predicate in (All(Contains("name", "ünï"), YearBetween(None, 1899)), Matches("author", r"^Author 1[0-2]$"),
+                          Any(Equals("category", None), Not(YearBetween(1850, 1990))), Equals("date", 1850),
+                          Equals("series", ["Dune", 2]), Where(_long_title, "name"), Contains("missing", "x")):
+            expected = local.scan(predicate)
+            assert parallel.scan(predicate) == expected
+            assert parallel.scan(predicate, limit=3) == expected[:3]
+        assert len(local.scan(Equals("date", 1850))) == 46
+        assert local.scan(Contains("name", "tome 1"), limit=2) == [books[10], books[15]]
+        
+        parallel.update_book("Tome 10", {"name": "Brand New", "author": "X", "date": "1700"})
+        parallel.add_book({"name": "Another New", "author": "X", "date": "1701"})
+        assert [b["name"] for b in parallel.scan(YearBetween(1600, 1799))] == ["Brand New", "Another New"]
+        parallel._scanner.close()
+        with pytest.raises(TypeError):
+            Predicate()
+        print("[PASSED] test_book_manager.py - Parallel scan tests completed successfully ✅")
@@ -0,0 +1,76 @@
+import json
+import os
+import sys
+import pytest
+
+# Add online_book_project (and its tools) to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'online_book_project'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'online_book_project', 'tools'))
+
+from storage.storage import BookStorage
+from backend.book_manager import BookManager
+import import_catalog
+
+
+class TestImportCatalog:
+    """Tools Test: Verify the parallel CSV/JSONL import pipeline"""
+    
+    def test_normalize_record(self):
+        """Test trimming, year parsing and category canonicalization"""
+        print("\n[RUNNING] test_import_catalog.py - Testing record normalization")
+        book, reason = import_catalog.normalize_record(
+            {"Title": "  The   Republic ", "Author": "Plato", "Year": " -375", "Category": "philosophy", "isbn": "x"})
+        assert reason is None
+        assert book == {"name": "The Republic", "author": "Plato", "date": "-375", "category": "Philosophy", "isbn": "x"}
+        assert import_catalog.normalize_record({"name": "Poems", "author": "A", "date": 1850,
+                                                "category": "verse"})[0]["category"] == "Poetry"
+        assert import_catalog.normalize_record({"name": "X", "author": " "}) == (None, "missing author")
+        assert import_catalog.normalize_record({"name": "X", "author": "A"}) == (None, "missing date")
+        assert import_catalog.normalize_record({"name": "X", "author": "A", "date": "unknown"})[1] == \
+            "no year in date 'unknown'"
+        for date, year in (("May 5, 1999", "1999"), ("12345", "12345"), ("c. 1850 AD", "1850"), (1851.0, "1851"),
+                           ("1 Jan -0044", "-44")):
+            assert import_catalog.normalize_record({"name": "X", "author": "A", "date": date})[0]["date"] == year
+        for date in ("est. 75", "19999 copies", True):
+            assert import_catalog.normalize_record({"name": "X", "author": "A", "date": date})[1] == \
+                "no year in date {!r}".format(date)
+        print("[PASSED] test_import_catalog.py - Normalization tests completed successfully ✅")
+    
+    @pytest.mark.parametrize("fmt", ["csv", "jsonl"])
+    def test_import_persists_once_and_reports_rejects(self, tmp_path, monkeypatch, fmt):
+        """Test a chunked, multi-process import lands in order with a single write"""
+        print("\n[RUNNING] test_import_catalog.py - Testing {} import".format(fmt))
+        rows = [{"title": "Book {}".format(i), "author": "Author {}".format(i % 7),
+                 "year": "" if i % 10 == 3 else str(1900 + i), "category": "fiction"} for i in range(100)]
+        source = tmp_path / ("catalog." + fmt)
+        if fmt == "csv":
+            lines = ["title,author,year,category"] + [",".join(row.values()) for row in rows]
+            lines.insert(5, '"Quoted, Title","Someone\nElse",1999,Poems')
+        else:
+            lines = [json.dumps(row) for row in rows] + ["{not json", json.dumps({"title": "No Author", "year": "2000"})]
+        source.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        
+        storage = BookStorage(str(tmp_path / "media.json"))
+        storage.set_books([{"name": "Existing", "author": "E", "date": "2000"}])
+        storage.save_data()
+        manager = BookManager(storage)
+        saves = []
+        original = storage.save_data
+        monkeypatch.setattr(storage, "save_data", lambda: saves.append(1) or original())
+        
+        report = import_catalog.import_catalog(str(source), manager, chunk_size=7, workers=2, max_in_flight=2)
+        assert saves == [1]
+        names = [b["name"] for b in BookStorage(str(tmp_path / "media.json")).iter_books()]
+        expected = ["Existing"] + ["Book {}".format(i) for i in range(100) if i % 10 != 3]
+        if fmt == "csv":
+            expected.insert(4, "Quoted, Title")
+            assert report["rows"] == 101 and report["imported"] == 91
+            assert report["reasons"] == {"missing date": 10}
+        else:
+            assert report["rows"] == 102 and report["imported"] == 90
+            assert report["reasons"]["missing date"] == 10 and report["reasons"]["missing author"] == 1
+            assert any(reason.startswith("invalid JSON") for _, reason in report["rejects"])
+        assert names == expected
+        assert manager.find_book("Book 1")["category"] == "Novel"
+        assert report["rows_per_second"] > 0
+        print("[PASSED] test_import_catalog.py - {} import tests completed successfully ✅".format(fmt))
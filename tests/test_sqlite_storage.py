@@ -0,0 +1,198 @@
+import json
+import os
+import sys
+import pytest
+
+# Add online_book_project to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'online_book_project'))
+
+from storage.storage import BookStorage
+from storage.sqlite_storage import SQLiteBookStorage, migrate_json_to_sqlite
+from backend.book_manager import BookManager
+
+
+SAMPLE_BOOKS = [
+    {"name": "Ancient Book", "author": "Unknown", "date": "875", "category": "Novel"},
+    {"name": "Modern Book", "author": "John Doe", "date": "2020", "category": "Philosophy"},
+    {"name": "Victorian Era", "author": "Jane Austen", "date": "1850", "category": "Poetry"},
+    {"name": "Book Without Year", "author": "Anon", "date": "n/a", "category": "Novel"},
+    {"name": "Modern Poems", "author": "Jane Doe", "date": 2020, "category": "Poetry"}
+]
+
+
+class TestSQLiteBookStorage:
+    """Backend Storage Test: Verify SQLiteBookStorage is a drop-in BookStorage replacement"""
+    
+    def test_migration_and_pushdown_match_json_storage(self, tmp_path):
+        """Test that a migrated database answers every BookManager query like the JSON storage"""
+        print("\n[RUNNING] test_sqlite_storage.py - Testing SQLiteBookStorage migration and queries")
+        json_file = str(tmp_path / "media.json")
+        db_file = str(tmp_path / "media.db")
+        with open(json_file, "w", encoding="utf-8") as f:
+            json.dump(SAMPLE_BOOKS, f)
+        assert migrate_json_to_sqlite(json_file, db_file) == len(SAMPLE_BOOKS)
+        
+        json_storage = BookStorage(json_file)
+        json_storage.load_data()
+        sql_storage = SQLiteBookStorage(db_file)
+        sql_storage.load_data()
+        expected, actual = BookManager(json_storage), BookManager(sql_storage)
+        
+        assert actual.get_all_books() == expected.get_all_books()
+        assert actual.filter_by_category("Poetry") == expected.filter_by_category("Poetry")
+        assert actual.search_by_name("MODERN") == expected.search_by_name("MODERN")
+        assert actual.sort_by_date(True) == expected.sort_by_date(True)
+        assert actual.sort_by_date(False) == expected.sort_by_date(False)
+        assert actual.find_book("Victorian Era") == expected.find_book("Victorian Era")
+        assert actual.get_statistics() == expected.get_statistics()
+        assert actual.books_between(1800, 2020) == expected.books_between(1800, 2020)
+        assert actual.newest(2) == expected.newest(2)
+        assert actual.oldest(3) == expected.oldest(3)
+        for args in (dict(category="Poetry", text="modern"), dict(text="BOOK", order_by="-name"),
+                     dict(year_range=(1800, 2100), order_by="-year", limit=2, offset=1)):
+            assert actual.query(**args) == expected.query(**args)
+        print("[PASSED] test_sqlite_storage.py - SQLite storage tests completed successfully ✅")
+    
+    def test_mutations_persist_across_reopen(self, tmp_path):
+        """Test that add/update/delete through BookManager are written to the database"""
+        db_file = str(tmp_path / "media.db")
+        storage = SQLiteBookStorage(db_file)
+        storage.load_data()
+        storage.set_books([dict(b) for b in SAMPLE_BOOKS])
+        assert storage.save_data()
+        
+        manager = BookManager(storage)
+        assert manager.add_book({"name": "New Book", "author": "Test Author", "date": "2024", "category": "Novel"})
+        assert manager.update_book("Modern Book", {"name": "Renamed Book", "author": "John Doe",
+                                                   "date": "2021", "category": "Philosophy"})
+        assert manager.delete_book("Ancient Book")
+        expected = [b["name"] for b in storage.get_books()]
+        storage.close()
+        
+        reopened = SQLiteBookStorage(db_file)
+        reopened.load_data()
+        names = [b["name"] for b in reopened.get_books()]
+        assert names == expected
+        assert sorted(names) == ["Book Without Year", "Modern Poems", "New Book", "Renamed Book", "Victorian Era"]
+        assert BookManager(reopened).find_book("Renamed Book")["date"] == "2021"
+        reopened.close()
+    
+    def test_batch_commits_once_and_rolls_back(self, tmp_path):
+        """Test bulk APIs run in one transaction and a failing batch leaves the table untouched"""
+        db_file = str(tmp_path / "media.db")
+        storage = SQLiteBookStorage(db_file)
+        storage.load_data()
+        storage.set_books([dict(b) for b in SAMPLE_BOOKS])
+        assert storage.save_data()
+        manager = BookManager(storage)
+        
+        report = manager.add_books([{"name": "Bulk {}".format(i), "author": "B", "date": "2000"} for i in range(50)])
+        assert all(r["ok"] for r in report)
+        with pytest.raises(RuntimeError):
+            with manager.batch():
+                manager.delete_books(["Bulk 1", "Modern Book"])
+                raise RuntimeError("abort")
+        assert manager.has_book("Bulk 1") and manager.has_book("Modern Book")
+        storage.close()
+        
+        reopened = SQLiteBookStorage(db_file)
+        reopened.load_data()
+        assert reopened.count_books() == len(SAMPLE_BOOKS) + 50
+        reopened.close()
+    
+    def test_undo_is_written_to_the_database(self, tmp_path):
+        """Test BookManager.undo restores rows through the database"""
+        db_file = str(tmp_path / "media.db")
+        storage = SQLiteBookStorage(db_file)
+        storage.load_data()
+        storage.set_books([dict(b) for b in SAMPLE_BOOKS])
+        assert storage.save_data()
+        manager = BookManager(storage)
+        before = [dict(b) for b in storage.get_books()]
+        
+        assert manager.delete_book("Ancient Book")
+        assert manager.add_book({"name": "New Book", "author": "N", "date": "2024"})
+        assert manager.undo() and manager.undo()
+        storage.close()
+        
+        reopened = SQLiteBookStorage(db_file)
+        reopened.load_data()
+        assert reopened.get_books() == before
+        reopened.close()
+    
+    def test_rejected_row_leaves_manager_untouched(self, tmp_path):
+        """Test a row the database refuses is reported and never reaches the indexes or undo"""
+        storage = SQLiteBookStorage(str(tmp_path / "media.db"))
+        storage.load_data()
+        storage.set_books([dict(b) for b in SAMPLE_BOOKS])
+        assert storage.save_data()
+        manager = BookManager(storage)
+        before = [dict(b) for b in storage.get_books()]
+        
+        assert not manager.add_book({"name": None, "author": "A", "date": "1"})
+        assert not manager.has_book(None)
+        assert not manager.delete_book(None)
+        assert not manager.update_book("Ancient Book", {"name": None, "author": "A", "date": "1"})
+        assert manager.has_book("Ancient Book")
+        assert not manager.undo()
+        report = manager.add_books([{"name": None, "author": "A", "date": "1"},
+                                    {"name": "Kept", "author": "K", "date": "2"}])
+        assert [entry["error"] for entry in report] == ["could not save", None]
+        assert manager.undo()
+        assert storage.get_books() == before
+        storage.close()
+    
+    def test_export_streams_rows_from_the_cursor(self, tmp_path):
+        """Test that SQLite exports match the JSON storage's for the same queries"""
+        json_file = str(tmp_path / "media.json")
+        db_file = str(tmp_path / "media.db")
+        with open(json_file, "w", encoding="utf-8") as f:
+            json.dump(SAMPLE_BOOKS, f)
+        migrate_json_to_sqlite(json_file, db_file)
+        json_storage = BookStorage(json_file)
+        json_storage.load_data()
+        sql_storage = SQLiteBookStorage(db_file)
+        sql_storage.load_data()
+        expected, actual = BookManager(json_storage), BookManager(sql_storage)
+        
+        for query in ({}, {"category": "Poetry", "order_by": "-year"}, {"text": "book", "year_range": (0, 2000)}):
+            assert expected.export(str(tmp_path / "a.jsonl"), **query) == actual.export(str(tmp_path / "b.jsonl"), **query)
+            with open(str(tmp_path / "a.jsonl"), "rb") as a, open(str(tmp_path / "b.jsonl"), "rb") as b:
+                assert a.read() == b.read()
+        assert sql_storage.export_books(str(tmp_path / "all.json")) == len(SAMPLE_BOOKS)
+        with open(str(tmp_path / "all.json"), encoding="utf-8") as f:
+            assert json.load(f) == SAMPLE_BOOKS
+        sql_storage.close()
+    
+    def test_pages_are_limit_queries_matching_json_storage(self, tmp_path):
+        """Test cursor pages come from keyset LIMIT queries and match the JSON storage's pages"""
+        books = [{"name": "{} Title {}".format(["Red", "green", "Blue"][i % 3], i % 11), "author": "A",
+                  "date": str(1950 + i % 9), "category": ["Novel", "Poetry"][i % 2]} for i in range(60)]
+        json_file = str(tmp_path / "media.json")
+        db_file = str(tmp_path / "media.db")
+        with open(json_file, "w", encoding="utf-8") as f:
+            json.dump(books, f)
+        migrate_json_to_sqlite(json_file, db_file)
+        json_storage = BookStorage(json_file)
+        json_storage.load_data()
+        sql_storage = SQLiteBookStorage(db_file)
+        sql_storage.load_data()
+        expected, actual = BookManager(json_storage), BookManager(sql_storage)
+        
+        def walk(manager, query, size):
+            pages = []
+            rows, cursor = manager.page(query, size=size)
+            pages.append(rows)
+            while cursor is not None:
+                rows, cursor = manager.page(query, cursor, size=size)
+                pages.append(rows)
+            return pages
+        
+        for query in ({}, {"category": "Poetry"}, {"text": "title 1"}, {"year_range": (1952, None)},
+                      {"order_by": "year"}, {"order_by": "-year", "text": "red"}, {"order_by": "name"},
+                      {"order_by": "-name", "category": "Novel"}):
+            for size in (1, 7, 60):
+                assert walk(actual, query, size) == walk(expected, query, size), (query, size)
+        # Every page was read with SQL; the catalog was never loaded into memory
+        assert sql_storage.books is None
+        sql_storage.close()
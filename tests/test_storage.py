@@ -49,3 +49,501 @@ class TestBookStorageLoadSave:
         assert len(updated) == 4
         assert updated[3]["name"] == "New Book"
         print("[PASSED] test_storage.py - All storage tests completed successfully ✅")
+
+
+class TestBookStorageJournal:
+    """Backend Storage Test: Verify journaled mutations replay, survive torn writes and compact"""
+    
+    def _make_storage(self, tmp_path, **kwargs):
+        fname = str(tmp_path / "media.json")
+        with open(fname, "w", encoding="utf-8") as f:
+            json.dump([{"name": "Ancient Book", "author": "Unknown", "date": "875", "category": "Novel"}], f)
+        storage = BookStorage(fname, journal=True, **kwargs)
+        storage.load_data()
+        return storage
+    
+    def test_mutations_replay_from_journal(self, tmp_path):
+        """Test that journaled add/replace/remove are replayed over the untouched snapshot"""
+        print("\n[RUNNING] test_storage.py - Testing BookStorage journal replay")
+        storage = self._make_storage(tmp_path)
+        with open(storage.data_file, "rb") as f:
+            snapshot_before = f.read()
+        
+        storage.append_book({"name": "New Book", "author": "Test Author", "date": "2024", "category": "Novel"})
+        storage.replace_at(0, {"name": "Ancient Book", "author": "Homer", "date": "875", "category": "Poetry"})
+        storage.append_book({"name": "Gone Book", "author": "Nobody", "date": "2000", "category": "Novel"})
+        storage.remove_at(2)
+        
+        # The snapshot itself is never rewritten for single mutations
+        with open(storage.data_file, "rb") as f:
+            assert f.read() == snapshot_before
+        
+        reloaded = BookStorage(storage.data_file, journal=True)
+        reloaded.load_data()
+        assert reloaded.get_books() == storage.get_books()
+        assert reloaded.get_books()[0]["author"] == "Homer"
+        assert [b["name"] for b in reloaded.get_books()] == ["Ancient Book", "New Book"]
+        print("[PASSED] test_storage.py - Journal replay test completed successfully ✅")
+    
+    def test_torn_journal_tail_is_ignored(self, tmp_path):
+        """Test that a crash mid-append loses only the partial record"""
+        storage = self._make_storage(tmp_path)
+        storage.append_book({"name": "Kept Book", "author": "A", "date": "2001", "category": "Novel"})
+        with open(storage.journal_file, "ab") as f:
+            f.write(b'0badc0de {"op":"add","book":{"name":"Torn')
+        
+        reloaded = BookStorage(storage.data_file, journal=True)
+        reloaded.load_data()
+        assert [b["name"] for b in reloaded.get_books()] == ["Ancient Book", "Kept Book"]
+        
+        # Appends after recovery land on a clean journal
+        reloaded.append_book({"name": "After Crash", "author": "B", "date": "2002", "category": "Novel"})
+        again = BookStorage(storage.data_file, journal=True)
+        again.load_data()
+        assert [b["name"] for b in again.get_books()] == ["Ancient Book", "Kept Book", "After Crash"]
+    
+    def test_compaction_folds_journal_into_snapshot(self, tmp_path):
+        """Test that passing the record threshold rewrites the snapshot and empties the journal"""
+        storage = self._make_storage(tmp_path, compact_records=3)
+        for i in range(2):
+            storage.append_book({"name": "Book {}".format(i), "author": "A", "date": "2000", "category": "Novel"})
+        with open(storage.journal_file, "rb") as f:
+            old_journal = f.read()
+        storage.append_book({"name": "Book 2", "author": "A", "date": "2000", "category": "Novel"})
+        
+        with open(storage.data_file, "r", encoding="utf-8") as f:
+            assert len(json.load(f)) == 4
+        
+        # Simulate a crash after the snapshot rename but before the journal reset:
+        # the stale journal must not be replayed on top of the new snapshot
+        with open(storage.journal_file, "wb") as f:
+            f.write(old_journal)
+        reloaded = BookStorage(storage.data_file, journal=True)
+        reloaded.load_data()
+        assert len(reloaded.get_books()) == 4
+
+
+class TestBookStorageStreaming:
+    """Backend Storage Test: Verify the streaming loader matches json.load and skips bad records"""
+    
+    def test_stream_matches_json_load_across_chunk_boundaries(self, tmp_path):
+        """Test that tiny read chunks still split records correctly"""
+        from storage.json_stream import JSONArrayReader
+        data = [
+            {"name": "Quote \" and \\ backslash", "author": "Ünïcødé Author", "date": "1999", "category": "Novel"},
+            {"name": "Nested [brackets] {braces}", "author": "A", "date": 2001, "tags": [1, [2, {"x": "]"}]]},
+            "not a book", 42, None
+        ]
+        fname = str(tmp_path / "media.json")
+        with open(fname, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=4, ensure_ascii=False)
+        
+        for chunk_size in (1, 3, 7, 64):
+            with open(fname, "rb") as f:
+                assert list(JSONArrayReader(f, chunk_size=chunk_size)) == data
+    
+    def test_malformed_records_are_skipped_with_offsets(self, tmp_path):
+        """Test that load_data and iter_books keep the good records and report the bad ones"""
+        print("\n[RUNNING] test_storage.py - Testing BookStorage streaming loader")
+        good_1 = b'{"name": "Good One", "author": "A", "date": "2000", "category": "Novel"}'
+        bad = b'{"name": "Broken", "author": , "date": "2001"}'
+        good_2 = b'{"name": "Good Two", "author": "B", "date": "2002", "category": "Poetry"}'
+        content = b"[\n  " + good_1 + b",\n  " + bad + b",\n  " + good_2 + b"\n]\n"
+        fname = str(tmp_path / "media.json")
+        with open(fname, "wb") as f:
+            f.write(content)
+        
+        storage = BookStorage(fname)
+        assert storage.load_data()
+        assert [b["name"] for b in storage.get_books()] == ["Good One", "Good Two"]
+        assert [e.offset for e in storage.skipped_records] == [content.index(bad)]
+        
+        errors = []
+        names = [b["name"] for b in storage.iter_books(on_error=errors.append)]
+        assert names == ["Good One", "Good Two"]
+        assert errors[0].offset == content.index(bad)
+        print("[PASSED] test_storage.py - Streaming loader tests completed successfully ✅")
+    
+    def test_mismatched_brackets_only_skip_the_bad_record(self, tmp_path):
+        """Test that a record closing [ with } does not swallow the records after it"""
+        from storage.json_stream import iter_json_array
+        import io
+        good = [b'{"name": "Good %d", "tags": [1, {"a": 2}]}' % i for i in range(3)]
+        for bad in (b'{"x": [1,2}', b'{"x": {"y": [1}}', b'{"x": 1]'):
+            content = b"[" + good[0] + b", " + bad + b", " + good[1] + b", " + good[2] + b"]"
+            errors = []
+            names = [b["name"] for b in iter_json_array(io.BytesIO(content), errors.append)]
+            assert names == ["Good 0", "Good 1", "Good 2"], bad
+            assert [e.offset for e in errors] == [content.index(bad)]
+
+
+class TestBookStorageColumnarSnapshot:
+    """Backend Storage Test: Verify the memory-mapped column snapshot mirrors media.json"""
+    
+    def test_snapshot_is_mapped_and_invalidated(self, tmp_path):
+        """Test that a second load maps the snapshot and a changed JSON file is re-parsed"""
+        print("\n[RUNNING] test_storage.py - Testing BookStorage columnar snapshot")
+        from storage.snapshot import MappedCatalog
+        data = [
+            {"name": "Ancient Book", "author": "Unknown", "date": "875", "category": "Novel"},
+            {"name": "Modern Book", "author": "John Doe", "date": 2020, "category": "Philosophy"},
+            {"name": "No Category", "author": "Unknown", "date": "n/a"}
+        ]
+        fname = str(tmp_path / "media.json")
+        with open(fname, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        
+        first = BookStorage(fname, columnar=True)
+        assert first.load_data()
+        assert os.path.exists(first.columnar_file)
+        
+        second = BookStorage(fname, columnar=True)
+        assert second.load_data()
+        books = second.get_books()
+        assert isinstance(books, MappedCatalog)
+        assert list(books) == data
+        assert list(books.years) == [875, 2020, 0]
+        
+        # The first mutation turns the mapping into a plain list
+        second.append_book({"name": "New Book", "author": "Test Author", "date": "2024", "category": "Novel"})
+        assert isinstance(second.get_books(), list)
+        
+        # media.json changed on disk, so the old snapshot must not be served
+        third = BookStorage(fname, columnar=True)
+        third.load_data()
+        assert [b["name"] for b in third.get_books()][-1] == "New Book"
+        print("[PASSED] test_storage.py - Columnar snapshot tests completed successfully ✅")
+    
+    def test_journal_replays_over_mapped_snapshot(self, tmp_path):
+        """Test that journaled edits are applied on top of the mapped snapshot"""
+        fname = str(tmp_path / "media.json")
+        with open(fname, "w", encoding="utf-8") as f:
+            json.dump([{"name": "Ancient Book", "author": "Unknown", "date": "875", "category": "Novel"}], f)
+        storage = BookStorage(fname, journal=True, columnar=True)
+        storage.load_data()
+        storage.append_book({"name": "Journaled", "author": "A", "date": "2001", "category": "Poetry"})
+        
+        reloaded = BookStorage(fname, journal=True, columnar=True)
+        reloaded.load_data()
+        assert [b["name"] for b in reloaded.get_books()] == ["Ancient Book", "Journaled"]
+
+    
+    def test_statistics_read_the_category_column(self, tmp_path, monkeypatch):
+        """Test that category counts over a mapped snapshot build no rows and rows are not kept"""
+        from storage.snapshot import MappedCatalog
+        from backend.book_manager import BookManager
+        data = [
+            {"name": "A", "author": "X", "date": "1", "category": "Novel"},
+            {"name": "B", "author": "X", "date": "2", "category": "Poetry"},
+            {"name": "C", "author": "X", "date": "3"},
+            {"name": "D", "author": "X", "date": "4", "category": None},
+            {"name": "E", "author": "X", "date": "5", "category": "Novel"}
+        ]
+        fname = str(tmp_path / "media.json")
+        with open(fname, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        BookStorage(fname, columnar=True).load_data()
+        storage = BookStorage(fname, columnar=True)
+        storage.load_data()
+        books = storage.get_books()
+        assert isinstance(books, MappedCatalog)
+        
+        def no_rows(self, index):
+            raise AssertionError("row decoded")
+        monkeypatch.setattr(MappedCatalog, "_build", no_rows)
+        manager = BookManager(storage)
+        stats = manager.get_statistics()
+        assert stats["total"] == 5 and stats["categories"] == {"Novel": 2, "Poetry": 1}
+        monkeypatch.undo()
+        assert [b["name"] for b in manager.filter_by_category("Novel")] == ["A", "E"]
+        assert [b["name"] for b in manager.filter_by_category(None)] == ["C", "D"]
+        assert books[0] == data[0] and books[0] is not books[0]
+
+class TestBookStorageDebouncedSaves:
+    """Backend Storage Test: Verify bursts of mutations are coalesced into one write"""
+    
+    def test_burst_is_written_once_on_flush(self, tmp_path, monkeypatch):
+        """Test that N mutations cost one atomic write and nothing is lost"""
+        print("\n[RUNNING] test_storage.py - Testing BookStorage debounced persistence")
+        import storage.storage as storage_module
+        writes = []
+        real_write = storage_module._atomic_write
+        monkeypatch.setattr(storage_module, "_atomic_write",
+                            lambda path, data: (writes.append(path), real_write(path, data)))
+        
+        fname = str(tmp_path / "media.json")
+        storage = BookStorage(fname, max_delay=60, max_pending=1000)
+        storage.load_data()
+        for i in range(50):
+            storage.append_book({"name": "Book {}".format(i), "author": "A", "date": "2000", "category": "Novel"})
+        assert writes == []
+        assert storage.dirty
+        
+        # A reload while dirty must not throw away the unsaved edits
+        storage.load_data()
+        assert len(storage.get_books()) == 50
+        
+        assert storage.flush()
+        assert len(writes) == 1
+        assert not storage.dirty
+        with open(fname, "r", encoding="utf-8") as f:
+            assert len(json.load(f)) == 50
+        print("[PASSED] test_storage.py - Debounced persistence tests completed successfully ✅")
+    
+    def test_forced_reload_flushes_and_storage_is_not_pinned(self, tmp_path):
+        """Test load_data(force=True) writes pending edits first and flushed storages can be collected"""
+        import gc
+        import weakref
+        fname = str(tmp_path / "media.json")
+        storage = BookStorage(fname, max_delay=60, max_pending=1000)
+        storage.load_data()
+        storage.append_book({"name": "Pending", "author": "A", "date": "2000", "category": "Novel"})
+        with open(fname, "w", encoding="utf-8") as f:
+            json.dump([{"name": "Outside", "author": "B", "date": "1999"}], f)
+        assert storage.dirty and storage.load_data()
+        assert [b["name"] for b in storage.get_books()] == ["Pending"]
+        
+        assert storage.load_data(force=True)
+        assert not storage.dirty
+        assert [b["name"] for b in storage.get_books()] == ["Pending"]
+        storage.append_book({"name": "Second", "author": "A", "date": "2001", "category": "Novel"})
+        assert storage.close()
+        with open(fname, "r", encoding="utf-8") as f:
+            assert [b["name"] for b in json.load(f)] == ["Pending", "Second"]
+        ref = weakref.ref(storage)
+        del storage
+        gc.collect()
+        assert ref() is None
+    
+    def test_max_pending_and_timer_trigger_writes(self, tmp_path):
+        """Test that max_pending forces a write and the timer flushes the remainder"""
+        import time
+        fname = str(tmp_path / "media.json")
+        storage = BookStorage(fname, max_delay=0.05, max_pending=3)
+        storage.load_data()
+        for i in range(4):
+            storage.append_book({"name": "Book {}".format(i), "author": "A", "date": "2000", "category": "Novel"})
+        with open(fname, "r", encoding="utf-8") as f:
+            assert len(json.load(f)) == 3
+        
+        deadline = time.time() + 5
+        while storage.dirty and time.time() < deadline:
+            time.sleep(0.01)
+        with open(fname, "r", encoding="utf-8") as f:
+            assert len(json.load(f)) == 4
+
+
+class TestBookStorageCompactCatalog:
+    """Backend Storage Test: Verify the column-store catalog behaves like the list of dicts"""
+    
+    def test_frozen_copy_survives_repacks_during_save(self, tmp_path):
+        """Test that a save running on another thread sees every row's own title while the heap is repacked"""
+        import threading
+        from storage.compact import CompactCatalog
+        rows = 20000
+        catalog = CompactCatalog({"name": "Row {:05d} r0 ".format(i) * 5} for i in range(rows))
+        frozen = catalog.frozen()
+        expected = list(frozen)
+        
+        torn = []
+        done = threading.Event()
+        
+        def save_repeatedly():
+            while not done.is_set():
+                for i, book in enumerate(catalog.frozen()):
+                    title = book["name"]
+                    if title != title[:13] * 5 or title[4:9] != "{:05d}".format(i):
+                        torn.append(title)
+        
+        interval = sys.getswitchinterval()
+        # Switch threads often so the saver really runs in the middle of repacks
+        sys.setswitchinterval(1e-6)
+        saver = threading.Thread(target=save_repeatedly)
+        saver.start()
+        try:
+            for round_no in range(1, 4):
+                # Rewriting every title makes garbage dominate the heap and forces a repack; alternating
+                # the order keeps the old heap from lining up with the repacked one
+                order = range(rows) if round_no % 2 else reversed(range(rows))
+                for i in order:
+                    catalog[i] = {"name": "Row {:05d} r{} ".format(i, round_no) * 5}
+        finally:
+            done.set()
+            saver.join()
+            sys.setswitchinterval(interval)
+        assert torn == []
+        assert catalog[7]["name"] == "Row 00007 r3 " * 5
+        assert list(frozen) == expected
+    
+    def test_compact_catalog_round_trips_and_mutates(self, tmp_path):
+        """Test that column-store mode loads, edits and saves exactly what the dict list would"""
+        print("\n[RUNNING] test_storage.py - Testing BookStorage compact catalog")
+        from storage.compact import CompactCatalog
+        from backend.book_manager import BookManager
+        data = [
+            {"name": "Ancient Book", "author": "Unknown", "date": "875", "category": "Novel"},
+            {"name": "Modern Book", "author": "John Doe", "date": 2020, "category": "Philosophy"},
+            {"name": "Extra Keys", "author": "Unknown", "date": "1900", "isbn": "123"},
+            {"name": ["odd", "title"], "author": "Unknown", "date": "1901", "category": "Poetry"}
+        ]
+        fname = str(tmp_path / "media.json")
+        with open(fname, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        
+        storage = BookStorage(fname, column_store=True)
+        storage.load_data()
+        books = storage.get_books()
+        assert isinstance(books, CompactCatalog)
+        assert list(books) == data
+        assert list(books.years) == [875, 2020, 1900, 1901]
+        
+        manager = BookManager(storage)
+        manager.add_book({"name": "New Book", "author": "John Doe", "date": "2024", "category": "Novel"})
+        manager.update_book("Ancient Book", {"name": "Ancient Book", "author": "Homer", "date": "875", "category": "Poetry"})
+        manager.delete_book("Modern Book")
+        assert [b["name"] for b in manager.sort_by_date(True)][:2] == ["New Book", ["odd", "title"]]
+        
+        with open(fname, "r", encoding="utf-8") as f:
+            on_disk = json.load(f)
+        assert on_disk == list(storage.get_books())
+        assert on_disk[0]["author"] == "Homer"
+        print("[PASSED] test_storage.py - Compact catalog tests completed successfully ✅")
+    
+    def test_compact_catalog_clamps_out_of_range_years(self, tmp_path):
+        """Test dates beyond int32 years load and add without corrupting the columns"""
+        from storage.compact import CompactCatalog
+        from backend.book_manager import BookManager
+        data = [
+            {"name": "Far Future", "author": "A", "date": "20000000000", "category": "Novel"},
+            {"name": "Normal", "author": "B", "date": "1999", "category": "Novel"},
+        ]
+        fname = str(tmp_path / "media.json")
+        with open(fname, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        storage = BookStorage(fname, column_store=True)
+        assert storage.load_data()
+        assert isinstance(storage.get_books(), CompactCatalog)
+        assert list(storage.get_books()) == data
+        assert list(storage.get_books().years) == [(1 << 31) - 1, 1999]
+        
+        manager = BookManager(storage)
+        assert manager.add_book({"name": "Deep Past", "author": "C", "date": "-30000000000"})
+        assert [b["name"] for b in manager.sort_by_date(True)] == ["Far Future", "Normal", "Deep Past"]
+        catalog = storage.get_books()
+        assert len({len(column) for column in catalog._columns()}) == 1
+        assert catalog[2]["date"] == "-30000000000"
+        with open(fname, "r", encoding="utf-8") as f:
+            assert len(json.load(f)) == 3
+        
+        # A value no column can hold leaves no partial row behind
+        catalog = CompactCatalog(data)
+        catalog._encode = lambda book: (0, 1, 0, -1, 0, 0, None)
+        with pytest.raises(OverflowError):
+            catalog.append({"name": "x"})
+        assert len({len(column) for column in catalog._columns()}) == 1 and len(catalog) == 2
+
+
+class TestBookStorageChangeDetection:
+    """Backend Storage Test: Verify load_data skips re-reading an unchanged file"""
+    
+    def _write(self, fname, data):
+        with open(fname, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+    
+    def test_reload_is_skipped_until_file_changes(self, tmp_path):
+        """Test that load_data after our own save is free, but outside edits and force=True re-read"""
+        print("\n[RUNNING] test_storage.py - Testing BookStorage change detection")
+        fname = str(tmp_path / "media.json")
+        self._write(fname, [{"name": "Ancient Book", "author": "Unknown", "date": "875", "category": "Novel"}])
+        storage = BookStorage(fname)
+        assert storage.load_data()
+        storage.append_book({"name": "New Book", "author": "Test Author", "date": "2024", "category": "Novel"})
+        
+        books = storage.get_books()
+        assert storage.load_data()
+        assert storage.get_books() is books
+        
+        assert storage.load_data(force=True)
+        assert storage.get_books() is not books
+        assert storage.get_books() == books
+        
+        # Another process rewrites the file (atomic rename -> new inode)
+        other = BookStorage(fname)
+        other.load_data()
+        other.append_book({"name": "From Elsewhere", "author": "B", "date": "2000", "category": "Poetry"})
+        storage.load_data()
+        assert [b["name"] for b in storage.get_books()][-1] == "From Elsewhere"
+        print("[PASSED] test_storage.py - Change detection tests completed successfully ✅")
+    
+    def test_hash_check_catches_same_size_in_place_edit(self, tmp_path):
+        """Test that hash_check notices an edit that keeps size, inode and mtime"""
+        fname = str(tmp_path / "media.json")
+        self._write(fname, [{"name": "Book A", "author": "Unknown", "date": "1875", "category": "Novel"}])
+        storage = BookStorage(fname, hash_check=True)
+        storage.load_data()
+        books = storage.get_books()
+        
+        st = os.stat(fname)
+        with open(fname, "r+b") as f:
+            content = f.read().replace(b"Book A", b"Book B")
+            f.seek(0)
+            f.write(content)
+        os.utime(fname, ns=(st.st_atime_ns, st.st_mtime_ns))
+        
+        storage.load_data()
+        assert storage.get_books() is not books
+        assert storage.get_books()[0]["name"] == "Book B"
+
+
+class TestBookStorageExport:
+    """Backend Storage Test: Verify streamed saves and exports"""
+    
+    def test_streamed_save_matches_json_dumps(self, tmp_path):
+        """Test that save_data still writes exactly json.dumps(books, indent=4)"""
+        print("\n[RUNNING] test_storage.py - Testing streamed save_data")
+        books = [
+            {"name": "Café \"Society\"\nVol. 1", "author": "Ánon", "date": 1999.5},
+            {"name": "Tagged", "author": None, "date": "2001", "tags": ["a", {"b": []}], "meta": {}},
+            {},
+        ]
+        fname = str(tmp_path / "media.json")
+        storage = BookStorage(fname)
+        storage.set_books(books)
+        assert storage.save_data()
+        with open(fname, "rb") as f:
+            assert f.read() == json.dumps(books, indent=4, ensure_ascii=False).encode("utf-8")
+        storage.set_books([])
+        assert storage.save_data()
+        with open(fname, "rb") as f:
+            assert f.read() == b"[]"
+        print("[PASSED] test_storage.py - Streamed save tests completed successfully ✅")
+    
+    def test_export_formats_and_gzip(self, tmp_path):
+        """Test CSV, JSONL and gzipped JSON exports straight from an unloaded data file"""
+        import csv
+        import gzip
+        print("\n[RUNNING] test_storage.py - Testing BookStorage export")
+        books = [{"name": "Book {}".format(i), "author": "Author, {}".format(i), "date": str(1900 + i),
+                  "category": "Novel", "isbn": str(i)} for i in range(50)]
+        fname = str(tmp_path / "media.json")
+        with open(fname, "w", encoding="utf-8") as f:
+            json.dump(books, f)
+        storage = BookStorage(fname)
+        
+        assert storage.export_books(str(tmp_path / "out.csv")) == 50
+        with open(str(tmp_path / "out.csv"), newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        assert rows[7] == {"name": "Book 7", "author": "Author, 7", "date": "1907", "category": "Novel"}
+        
+        assert storage.export_books(str(tmp_path / "out.jsonl")) == 50
+        with open(str(tmp_path / "out.jsonl"), encoding="utf-8") as f:
+            assert [json.loads(line) for line in f] == books
+        
+        assert storage.export_books(str(tmp_path / "out.json.gz")) == 50
+        with gzip.open(str(tmp_path / "out.json.gz"), "rt", encoding="utf-8") as f:
+            assert json.load(f) == books
+        
+        with pytest.raises(ValueError):
+            storage.export_books(str(tmp_path / "out.xml"))
+        assert sorted(os.listdir(str(tmp_path))) == ["media.json", "out.csv", "out.json.gz", "out.jsonl"]
+        print("[PASSED] test_storage.py - Export tests completed successfully ✅")